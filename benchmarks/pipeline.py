@@ -0,0 +1,351 @@
+"""
+Benchmark the phases of datatables draws on a synthetic dataset.
+
+The example ``Album``/``Artist``/``Genre`` models are filled with
+``--rows`` albums in a separate SQLite database, then each scenario (a
+DataTables query string) is sent ``--repeat`` times to the example
+``AlbumViewSet``. For each phase (filter, paginate, serialize, render)
+the latency percentiles, the number of queries and the peak memory are
+reported as JSON. Run from the repository root::
+
+    python benchmarks/pipeline.py --rows 10000 --output before.json
+    python benchmarks/pipeline.py --rows 10000 --compare before.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'example'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'example.settings')
+
+COLUMNS = (
+    '&columns[0][data]=rank&columns[0][searchable]=true'
+    '&columns[0][orderable]=true'
+    '&columns[1][data]=name&columns[1][searchable]=true'
+    '&columns[1][orderable]=true'
+    '&columns[2][data]=year&columns[2][searchable]=true'
+    '&columns[2][orderable]=true'
+    '&columns[3][data]=artist_name&columns[3][name]=artist.name'
+    '&columns[3][searchable]=true&columns[3][orderable]=true'
+    '&columns[4][data]=genres&columns[4][name]=genres.name'
+    '&columns[4][searchable]=true'
+)
+PHASES = ('filter', 'paginate', 'serialize', 'render')
+PERCENTILES = (50, 90, 95, 99)
+WORDS = (
+    'abbey', 'road', 'blue', 'train', 'dark', 'side', 'moon', 'kind', 'of',
+    'the', 'wall', 'night', 'city', 'love', 'supreme', 'white', 'album',
+    'revolver', 'thriller', 'rumours', 'nevermind', 'london', 'calling',
+    'born', 'run', 'highway', 'revisited', 'purple', 'rain', 'sticky',
+)
+GENRES = (
+    'Rock', 'Pop', 'Jazz', 'Blues', 'Soul', 'Funk', 'Folk', 'Country',
+    'Reggae', 'Punk', 'Metal', 'Hip Hop', 'Electronic', 'Classical',
+    'Gospel', 'Disco', 'Grunge', 'Psychedelic', 'Latin', 'World',
+)
+
+
+def get_scenarios(rows):
+    deep = max(0, rows * 9 // 10)
+    return OrderedDict([
+        ('first_page', '&start=0&length=10&order[0][column]=0'),
+        ('global_search', '&start=0&length=10&search[value]=moon'),
+        ('global_regex', (
+            '&start=0&length=10&search[value]=^the (dark|night)'
+            '&search[regex]=true'
+        )),
+        ('column_search', (
+            '&start=0&length=10&columns[3][search][value]=blue'
+            '&columns[4][search][value]=jazz'
+        )),
+        ('multi_order', (
+            '&start=20&length=25&order[0][column]=3&order[0][dir]=desc'
+            '&order[1][column]=2&order[1][dir]=asc'
+        )),
+        ('deep_page', '&start=%d&length=10&order[0][column]=1' % deep),
+        ('all_rows', '&length=-1&order[0][column]=0'),
+    ])
+
+
+def title(rnd):
+    return ' '.join(rnd.choice(WORDS) for i in range(rnd.randint(1, 4)))
+
+
+def populate(rows, seed, batch_size=5000):
+    """
+    Fill the database with ``rows`` albums, one artist per 100 albums and
+    two genres per album.
+    """
+    from albums.models import Album, Artist, Genre
+
+    rnd = random.Random(seed)
+    Genre.objects.bulk_create([Genre(name=name) for name in GENRES])
+    genre_ids = list(Genre.objects.values_list('pk', flat=True))
+    Artist.objects.bulk_create(
+        [
+            Artist(name='the %s' % title(rnd))
+            for i in range(max(10, rows // 100))
+        ],
+        batch_size=batch_size
+    )
+    artist_ids = list(Artist.objects.values_list('pk', flat=True))
+    Through = Album.genres.through
+    for start in range(0, rows, batch_size):
+        Album.objects.bulk_create([
+            Album(
+                name=title(rnd), rank=i + 1, year=rnd.randint(1950, 2020),
+                artist_id=rnd.choice(artist_ids)
+            ) for i in range(start, min(rows, start + batch_size))
+        ])
+    links = []
+    for album_id in Album.objects.values_list('pk', flat=True).iterator():
+        for genre_id in rnd.sample(genre_ids, 2):
+            links.append(Through(album_id=album_id, genre_id=genre_id))
+        if len(links) >= batch_size:
+            Through.objects.bulk_create(links)
+            links = []
+    Through.objects.bulk_create(links)
+
+
+def setup_database(path, rows, seed):
+    from django.core.management import call_command
+    from django.db import connection
+    from albums.models import Album, Artist, Genre
+
+    call_command('migrate', verbosity=0)
+    if Album.objects.count() == rows:
+        return
+    for model in (Album.genres.through, Album, Artist, Genre):
+        model.objects.all().delete()
+    start = time.perf_counter()
+    populate(rows, seed)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    log('populated %s with %d albums in %.1f s' % (
+        path, rows, time.perf_counter() - start
+    ))
+
+
+def run_draw(query, measure_memory=False):
+    """
+    Run one draw of the example album view phase by phase, return a dict
+    mapping the phases to ``(milliseconds, queries, peak bytes)``.
+    """
+    from django.db import connection
+    from rest_framework.response import Response
+    from rest_framework.test import APIRequestFactory
+    from albums.views import AlbumViewSet
+
+    view = AlbumViewSet()
+    view.action_map = {'get': 'list'}
+    view.action = 'list'
+    view.args = ()
+    view.kwargs = {}
+    view.format_kwarg = None
+    view.headers = {}
+    request = view.initialize_request(APIRequestFactory().get(
+        '/api/albums/?format=datatables&draw=1' + COLUMNS + query
+    ))
+    view.request = request
+    view.initial(request)
+
+    state = {}
+    queries = [0]
+
+    def count_queries(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    def filter_phase():
+        state['queryset'] = view.filter_queryset(view.get_queryset())
+
+    def paginate_phase():
+        state['page'] = view.paginate_queryset(state['queryset'])
+
+    def serialize_phase():
+        page = state['page']
+        if page is None:
+            data = view.get_serializer(state['queryset'], many=True).data
+            state['response'] = Response(data)
+        else:
+            data = view.get_serializer(page, many=True).data
+            state['response'] = view.get_paginated_response(data)
+
+    def render_phase():
+        response = view.finalize_response(request, state['response'])
+        response.render()
+        state['size'] = len(response.content)
+
+    result = OrderedDict()
+    for phase, func in zip(PHASES, (
+            filter_phase, paginate_phase, serialize_phase, render_phase
+    )):
+        if measure_memory:
+            tracemalloc.start()
+        queries[0] = 0
+        with connection.execute_wrapper(count_queries):
+            start = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - start) * 1000
+        peak = None
+        if measure_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        result[phase] = (elapsed, queries[0], peak)
+    result['size'] = state['size']
+    return result
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def summarize(timings):
+    summary = OrderedDict(
+        ('p%d' % p, round(percentile(timings, p), 3)) for p in PERCENTILES
+    )
+    summary['mean'] = round(sum(timings) / len(timings), 3)
+    summary['min'] = round(min(timings), 3)
+    summary['max'] = round(max(timings), 3)
+    return summary
+
+
+def bench(query, repeat, warmup):
+    for i in range(warmup):
+        run_draw(query)
+    # memory tracing slows everything down, it has a run of its own
+    traced = run_draw(query, measure_memory=True)
+    runs = [run_draw(query) for i in range(repeat)]
+    phases = OrderedDict()
+    for phase in PHASES:
+        stats = summarize([run[phase][0] for run in runs])
+        stats['queries'] = traced[phase][1]
+        stats['peak_memory_kb'] = round(traced[phase][2] / 1024.0, 1)
+        phases[phase] = stats
+    total = summarize([sum(run[p][0] for p in PHASES) for run in runs])
+    total['queries'] = sum(traced[p][1] for p in PHASES)
+    total['peak_memory_kb'] = max(
+        phases[p]['peak_memory_kb'] for p in PHASES
+    )
+    total['response_bytes'] = traced['size']
+    return OrderedDict([
+        ('query', query), ('phases', phases), ('total', total)
+    ])
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def log(message):
+    sys.stderr.write(message + '\n')
+
+
+def compare(results, baseline):
+    log('%-15s %12s %12s %8s %8s' % (
+        'scenario', 'baseline p50', 'p50', 'ratio', 'queries'
+    ))
+    for name, result in results['scenarios'].items():
+        other = baseline['scenarios'].get(name)
+        if other is None:
+            continue
+        before = other['total']['p50']
+        after = result['total']['p50']
+        log('%-15s %9.2f ms %9.2f ms %7.2fx %3d -> %d' % (
+            name, before, after, before / after if after else 0,
+            other['total']['queries'], result['total']['queries']
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--db', help='SQLite database, reused if it has --rows albums '
+        '(default: in the temporary directory)'
+    )
+    parser.add_argument(
+        '--scenarios', help='comma separated scenarios to run, among: '
+        + ', '.join(get_scenarios(0))
+    )
+    parser.add_argument('--output', help='write the JSON results to a file')
+    parser.add_argument(
+        '--compare', help='JSON results of a previous run to compare with'
+    )
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(
+        tempfile.gettempdir(), 'drf_datatables_bench_%d.sqlite3' % args.rows
+    )
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = path
+
+    import django
+    django.setup()
+    setup_database(path, args.rows, args.seed)
+
+    scenarios = get_scenarios(args.rows)
+    if args.scenarios:
+        names = [name.strip() for name in args.scenarios.split(',')]
+        scenarios = OrderedDict((name, scenarios[name]) for name in names)
+
+    import rest_framework
+    results = OrderedDict([
+        ('meta', OrderedDict([
+            ('commit', get_commit()),
+            ('date', datetime.datetime.now().isoformat()),
+            ('rows', args.rows),
+            ('repeat', args.repeat),
+            ('python', platform.python_version()),
+            ('django', django.get_version()),
+            ('djangorestframework', rest_framework.VERSION),
+            ('sqlite', sqlite3.sqlite_version),
+        ])),
+        ('scenarios', OrderedDict()),
+    ])
+    for name, query in scenarios.items():
+        result = bench(query, args.repeat, args.warmup)
+        results['scenarios'][name] = result
+        total = result['total']
+        log('%-15s p50 %9.2f ms  p95 %9.2f ms  %3d queries  %9.1f KiB' % (
+            name, total['p50'], total['p95'], total['queries'],
+            total['peak_memory_kb']
+        ))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
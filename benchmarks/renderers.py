@@ -0,0 +1,93 @@
+"""
+Compare the renderers on a page of serialized rows.
+
+Run from the repository root::
+
+    python benchmarks/renderers.py --rows 1000 --repeat 50
+"""
+import argparse
+import datetime
+import decimal
+import os
+import statistics
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'example'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'example.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.test import APIRequestFactory  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+
+from rest_framework_datatables.renderers import (  # noqa: E402
+    DatatablesORJSONRenderer, DatatablesRenderer, orjson
+)
+
+
+COLUMNS = (
+    '&columns[0][data]=rank&columns[1][data]=name'
+    '&columns[2][data]=artist_name&columns[3][data]=year'
+)
+
+
+def make_data(rows):
+    return OrderedDict([
+        ('recordsTotal', rows * 10),
+        ('recordsFiltered', rows),
+        ('data', [
+            OrderedDict([
+                ('DT_RowId', 'row_%d' % i),
+                ('DT_RowAttr', {'data-pk': i}),
+                ('rank', i),
+                ('name', u'Album n\xb0%d' % i),
+                ('year', 1960 + i % 50),
+                ('artist_name', 'Artist %d' % (i % 100)),
+                ('price', decimal.Decimal('9.99')),
+                ('released', datetime.date(1960 + i % 50, 1, 1)),
+                ('description', 'lorem ipsum ' * 20),
+                ('genres', 'Rock, Pop'),
+            ]) for i in range(rows)
+        ]),
+    ])
+
+
+def bench(renderer, rows, repeat):
+    view = APIView()
+    request = view.initialize_request(APIRequestFactory().get(
+        '/api/albums/?format=datatables&draw=1' + COLUMNS
+    ))
+    context = {'request': request, 'view': view}
+    timings = []
+    for i in range(repeat):
+        # the renderer prunes the rows in place, render fresh ones
+        data = make_data(rows)
+        start = time.perf_counter()
+        renderer.render(data, 'application/json', context)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print('orjson is not installed, both renderers use the stdlib json')
+    baseline = bench(DatatablesRenderer(), args.rows, args.repeat)
+    fast = bench(DatatablesORJSONRenderer(), args.rows, args.repeat)
+    print('%d rows, median of %d renders' % (args.rows, args.repeat))
+    print('DatatablesRenderer        %8.2f ms' % baseline)
+    print('DatatablesORJSONRenderer  %8.2f ms  (x%.1f)' % (
+        fast, baseline / fast
+    ))
+
+
+if __name__ == '__main__':
+    main()
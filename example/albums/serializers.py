@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework_datatables.serializers import DatatablesFieldsMixin
 
 from .models import Album, Artist
 
@@ -16,7 +17,7 @@ class ArtistSerializer(serializers.ModelSerializer):
         datatables_always_serialize = ('id',)
 
 
-class AlbumSerializer(serializers.ModelSerializer):
+class AlbumSerializer(DatatablesFieldsMixin, serializers.ModelSerializer):
     artist_name = serializers.ReadOnlyField(source='artist.name')
     # DRF-Datatables can deal with nested serializers as well.
     artist = ArtistSerializer()
@@ -43,5 +44,13 @@ class AlbumSerializer(serializers.ModelSerializer):
             'DT_RowId', 'DT_RowAttr', 'rank', 'name',
             'year', 'artist_name', 'genres', 'artist',
         )
+        # Tell DRF-Datatables which model fields and relations the method
+        # fields use, so that they can be loaded in bulk and projected (see
+        # datatables_plan_relations and datatables_project_columns).
+        datatables_field_sources = {
+            'DT_RowId': ('pk',),
+            'DT_RowAttr': ('pk',),
+            'genres': ('genres',),
+        }
 
 
@@ -2,6 +2,7 @@ from django.shortcuts import render
 
 from rest_framework import viewsets
 from rest_framework.response import Response
+from rest_framework_datatables.cache import ExtraJSONCache
 
 from .models import Album, Artist, Genre
 from .serializers import AlbumSerializer, ArtistSerializer
@@ -21,12 +22,18 @@ def get_album_options():
 class AlbumViewSet(viewsets.ModelViewSet):
     queryset = Album.objects.all().order_by('rank')
     serializer_class = AlbumSerializer
+    datatables_plan_relations = True
+    datatables_project_columns = True
 
     def get_options(self):
         return get_album_options()
 
     class Meta:
         datatables_extra_json = ('get_options', )
+        # the options only change with the artists and the genres
+        datatables_extra_json_cache = {
+            'get_options': ExtraJSONCache(timeout=600, models=(Artist, Genre)),
+        }
 
 
 class ArtistViewSet(viewsets.ViewSet):
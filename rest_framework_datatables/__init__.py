@@ -1 +1,6 @@
+import django
+
 __version__ = '0.5.1'
+
+if django.VERSION < (3, 2):  # pragma: no cover
+    default_app_config = 'rest_framework_datatables.apps.DatatablesConfig'
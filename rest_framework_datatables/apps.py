@@ -0,0 +1,16 @@
+from django.apps import AppConfig, apps
+from django.conf import settings
+
+
+class DatatablesConfig(AppConfig):
+    name = 'rest_framework_datatables'
+    verbose_name = 'Django REST framework Datatables'
+
+    def ready(self):
+        # the models listed in the settings are watched by every process,
+        # including those that never build a cache key
+        models = getattr(settings, 'DATATABLES_CACHE_MODELS', ())
+        if models:
+            from .cache import watch_model
+            for label in models:
+                watch_model(apps.get_model(label))
@@ -0,0 +1,255 @@
+from asyncio import iscoroutinefunction
+
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.response import Response
+
+from .context import get_datatables_context
+from .counts import ExactCount, get_count_strategy
+from .filters import DatatablesFilterBackend
+from .pagination import (
+    DatatablesLimitOffsetPagination, DatatablesPageNumberPagination
+)
+from .panes import get_search_panes
+from .query import get_datatables_query
+
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:  # pragma: no cover
+    sync_to_async = None
+
+
+async def acount(queryset, count_strategy=None):
+    """
+    Count ``queryset`` with ``count_strategy`` (exactly by default), with
+    the async ORM if possible.
+    """
+    if count_strategy is None or isinstance(count_strategy, ExactCount):
+        if hasattr(queryset, 'acount'):
+            return await queryset.acount()
+        return await sync_to_async(queryset.count)()
+    return await sync_to_async(count_strategy.count)(queryset)
+
+
+async def alist(queryset):
+    """
+    Evaluate ``queryset``, with the async ORM if possible.
+    """
+    if hasattr(queryset, '__aiter__'):
+        return [obj async for obj in queryset]
+    return await sync_to_async(list)(queryset)
+
+
+class AsyncDatatablesFilterBackend(DatatablesFilterBackend):
+    """
+    Filter backend running the counts of datatables requests with the
+    async ORM when it is used by an async view.
+    """
+    async def afilter_queryset(self, request, queryset, view):
+        if request.accepted_renderer.format != 'datatables':
+            return queryset
+
+        context = get_datatables_context(request)
+        base_queryset = view.get_queryset()
+        context.total_count = await self.aget_total_count(
+            view, base_queryset
+        )
+
+        queryset, filtered = self.search_queryset(request, queryset, view)
+
+        unfiltered = not filtered and self.is_total_count_reusable(
+            view, queryset, base_queryset
+        )
+        if unfiltered:
+            context.filtered_count = context.total_count
+        elif self.is_filtered_count_needed(request, view):
+            context.filtered_count = await acount(
+                queryset, get_count_strategy(view)
+            )
+
+        if get_datatables_query(request).count_only:
+            return queryset.none()
+        if get_search_panes(request, view):
+            context.search_panes = await sync_to_async(
+                self.get_search_pane_options
+            )(request, view, base_queryset, queryset, not unfiltered)
+        return self.order_queryset(request, queryset, view)
+
+    async def aget_total_count(self, view, queryset):
+        if getattr(view, 'datatables_total_count_cache', None) is not None:
+            # the cache backends are synchronous
+            return await sync_to_async(self.get_total_count)(view, queryset)
+        return await acount(queryset, get_count_strategy(view, total=True))
+
+
+class AsyncDatatablesMixin(object):
+    async def aget_count_and_total_count(self, queryset, view, request):
+        context = get_datatables_context(request)
+        if context.filtered_count is None:
+            context.filtered_count = await acount(
+                queryset, get_count_strategy(view)
+            )
+        if context.total_count is None:
+            context.total_count = context.filtered_count
+        return context.filtered_count, context.total_count
+
+
+class AsyncDatatablesPageNumberPagination(AsyncDatatablesMixin,
+                                          DatatablesPageNumberPagination):
+    async def apaginate_queryset(self, queryset, request, view=None):
+        query = get_datatables_query(request)
+        if (
+                request.accepted_renderer.format != 'datatables'
+                or query.length is None or query.length == -1
+        ):
+            return await sync_to_async(self.paginate_queryset)(
+                queryset, request, view
+            )
+        self.count, self.total_count = await self.aget_count_and_total_count(
+            queryset, view, request
+        )
+        self.is_datatable_request = True
+        self.page_size_query_param = 'length'
+        page_size = self.get_page_size(request)
+        if not page_size:  # pragma: no cover
+            return None
+        self.page = self.get_datatables_page(
+            self.plan_queryset(queryset, request, view), request, page_size
+        )
+        self.page.object_list = await alist(self.page.object_list)
+        self.request = request
+        return list(self.page)
+
+
+class AsyncDatatablesLimitOffsetPagination(AsyncDatatablesMixin,
+                                           DatatablesLimitOffsetPagination):
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if (
+                request.accepted_renderer.format != 'datatables'
+                or get_datatables_query(request).length is None
+        ):
+            return await sync_to_async(self.paginate_queryset)(
+                queryset, request, view
+            )
+        self.is_datatable_request = True
+        self.limit_query_param = 'length'
+        self.offset_query_param = 'start'
+        self.count, self.total_count = await self.aget_count_and_total_count(
+            queryset, view, request
+        )
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        if self.count == 0 or self.offset > self.count:
+            return []
+        queryset = self.plan_queryset(queryset, request, view)
+        return await alist(queryset[self.offset:self.offset + self.limit])
+
+
+class AsyncDatatablesListMixin(object):
+    """
+    Mixin for generic views serving the list action from an async view
+    created with ``as_async_view()``, so that the queries of datatables
+    draws run on the async ORM instead of blocking a worker thread.
+
+    Filter backends and paginators providing ``afilter_queryset()`` and
+    ``apaginate_queryset()`` are awaited, the others run in a thread. The
+    ``datatables_extra_json`` methods may be coroutine functions.
+    """
+    @classmethod
+    def as_async_view(cls, **initkwargs):
+        if sync_to_async is None:  # pragma: no cover
+            raise ImproperlyConfigured(
+                'as_async_view() requires asgiref (Django 3.1 or later).'
+            )
+
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            return await self.adispatch(request, *args, **kwargs)
+        view.cls = cls
+        view.initkwargs = initkwargs
+        # like as_view(), rely on the authentication classes for CSRF
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            # authentication, permissions and throttling are synchronous
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() != 'get':
+                raise MethodNotAllowed(request.method)
+            response = await self.alist(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            data = await sync_to_async(self.serialize)(page)
+            response = self.get_paginated_response(data)
+        else:
+            data = await sync_to_async(self.serialize)(queryset)
+            response = Response(data)
+        if request.accepted_renderer.format == 'datatables':
+            await self.aprepare_extra_json(request)
+        return response
+
+    def serialize(self, instances):
+        # related objects and method fields may run queries
+        return self.get_serializer(instances, many=True).data
+
+    async def afilter_queryset(self, queryset):
+        for backend in list(self.filter_backends):
+            backend = backend()
+            if hasattr(backend, 'afilter_queryset'):
+                queryset = await backend.afilter_queryset(
+                    self.request, queryset, self
+                )
+            else:
+                queryset = await sync_to_async(backend.filter_queryset)(
+                    self.request, queryset, self
+                )
+        return queryset
+
+    async def apaginate_queryset(self, queryset):
+        paginator = self.paginator
+        if paginator is None:
+            return None
+        if hasattr(paginator, 'apaginate_queryset'):
+            return await paginator.apaginate_queryset(
+                queryset, self.request, view=self
+            )
+        return await sync_to_async(paginator.paginate_queryset)(
+            queryset, self.request, view=self
+        )
+
+    async def aprepare_extra_json(self, request):
+        """
+        Compute the extra JSON of the renderer, awaiting the coroutine
+        functions and running the others in a thread.
+        """
+        renderer = request.accepted_renderer
+        if not hasattr(renderer, '_get_extra_json_methods'):
+            return
+        extra_json = []
+        for method in renderer._get_extra_json_methods(
+                self, renderer._get_extra_json_funcs(self)
+        ):
+            if iscoroutinefunction(method):
+                extra_json.append(await method())
+            else:
+                extra_json.append(await sync_to_async(method)())
+        get_datatables_context(request).extra_json = extra_json
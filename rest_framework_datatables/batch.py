@@ -0,0 +1,188 @@
+import json
+
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.utils.encoding import force_bytes
+
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+
+from .timing import release_timings
+
+try:
+    from django.utils import six
+
+    string_types = six.string_types
+except ImportError:
+    string_types = (str, )
+
+
+def _flatten(prefix, value, params):
+    # nested objects and arrays, like the ones of the ``ajax.params()``
+    # method of Datatables, in the bracket notation of jQuery.param()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten('%s[%s]' % (prefix, key), item, params)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            _flatten('%s[%d]' % (prefix, i), item, params)
+    elif isinstance(value, bool):
+        params.appendlist(prefix, 'true' if value else 'false')
+    else:
+        params.appendlist(prefix, '' if value is None else str(value))
+
+
+class DatatablesBatchView(APIView):
+    """
+    View serving the draws of several datatables in one request.
+
+    The body of the ``POST`` request is a JSON object mapping table ids to
+    draws: objects with the name of the ``datatables_views`` view to draw
+    (``view``, the table id by default) and its Datatables parameters
+    (``query``, a query string or an object mapping the parameters to
+    their values). A draw can also be given as the query string alone.
+
+    Each draw runs through the view as a ``GET`` request with the
+    ``datatables`` format, authenticated as the batch request, and the
+    response maps the table ids to the rendered draws. Draws that fail
+    are replaced by an object with their ``status`` and their ``error``.
+    They run concurrently on the ``datatables_executor`` of the batch
+    view if it is set.
+    """
+    #: the views that can be drawn, by name.
+    datatables_views = {}
+    #: maximum number of draws of a request.
+    datatables_batch_max_draws = 10
+    #: ``QueryExecutor`` running the draws concurrently, it must not be
+    #: the ``datatables_executor`` of the drawn views.
+    datatables_executor = None
+
+    def post(self, request, *args, **kwargs):
+        draws = self.get_draws(request)
+        executor = self.datatables_executor
+        if executor is not None and not executor.is_available(
+                DEFAULT_DB_ALIAS
+        ):
+            executor = None
+        if executor is not None:
+            futures = [
+                executor.submit(self.draw, request, view, query)
+                for table_id, view, query in draws
+            ]
+            contents = [future.result() for future in futures]
+        else:
+            contents = [
+                self.draw(request, view, query)
+                for table_id, view, query in draws
+            ]
+        # the draws are already encoded, they are not parsed again
+        return HttpResponse(
+            b'{' + b','.join(
+                force_bytes(json.dumps(table_id)) + b':' + content
+                for (table_id, view, query), content in zip(draws, contents)
+            ) + b'}',
+            content_type='application/json'
+        )
+
+    def get_draws(self, request):
+        """
+        Return the ``(table id, view, query string)`` tuples of the draws
+        of ``request``.
+        """
+        if not isinstance(request.data, dict):
+            raise ParseError('Expected an object mapping table ids to draws.')
+        if len(request.data) > self.datatables_batch_max_draws:
+            raise ParseError('At most %d draws are allowed.' % (
+                self.datatables_batch_max_draws
+            ))
+        draws = []
+        for table_id, draw in request.data.items():
+            if isinstance(draw, string_types):
+                draw = {'query': draw}
+            if not isinstance(draw, dict):
+                raise ParseError('Invalid draw for table %s.' % table_id)
+            name = draw.get('view', table_id)
+            if not isinstance(name, string_types):
+                raise ParseError('Invalid view for table %s.' % table_id)
+            view = self.datatables_views.get(name)
+            if view is None:
+                raise ParseError('Unknown view %s.' % name)
+            draws.append(
+                (table_id, view, self.get_query_string(draw.get('query')))
+            )
+        return draws
+
+    def get_query_string(self, query):
+        """
+        Return the query string of the Datatables parameters ``query``,
+        with the ``datatables`` format.
+        """
+        if query is None or isinstance(query, string_types):
+            params = QueryDict(query, mutable=True)
+        elif isinstance(query, dict):
+            params = QueryDict(mutable=True)
+            for key, value in query.items():
+                _flatten(key, value, params)
+        else:
+            raise ParseError('Invalid query parameters.')
+        params['format'] = 'datatables'
+        return params.urlencode()
+
+    def get_draw_request(self, request, query_string):
+        """
+        Return the ``GET`` request of a draw with the parameters of
+        ``query_string``, authenticated as the batch ``request``.
+        """
+        draw_request = HttpRequest()
+        draw_request.method = 'GET'
+        draw_request.path = draw_request.path_info = request.path
+        draw_request.META = dict(
+            request.META, REQUEST_METHOD='GET', QUERY_STRING=query_string
+        )
+        draw_request.META.pop('CONTENT_TYPE', None)
+        draw_request.META.pop('CONTENT_LENGTH', None)
+        draw_request.GET = QueryDict(query_string)
+        draw_request.COOKIES = request.COOKIES
+        for attr in ('session', 'user'):
+            if hasattr(request._request, attr):
+                setattr(draw_request, attr, getattr(request._request, attr))
+        # the view does not authenticate the request again
+        draw_request._force_auth_user = request.user
+        draw_request._force_auth_token = request.auth
+        return draw_request
+
+    def draw(self, request, view, query_string):
+        """
+        Return the encoded response of the draw of ``view`` with the
+        parameters of ``query_string``.
+        """
+        if hasattr(view, 'get_extra_actions'):
+            # viewsets need their actions
+            view = view.as_view({'get': 'list'})
+        else:
+            view = view.as_view()
+        try:
+            return self.render_draw(
+                view(self.get_draw_request(request, query_string))
+            )
+        finally:
+            # the draws running in the threads of the executor do not
+            # finish a request
+            release_timings()
+
+    def render_draw(self, response):
+        """
+        Return the encoded content of the draw ``response``, or an object
+        with its status and error if it failed.
+        """
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code >= 400:
+            return JSONRenderer().render({
+                'status': response.status_code,
+                'error': getattr(response, 'data', None)
+            })
+        if getattr(response, 'streaming', False):
+            return b''.join(response.streaming_content)
+        return response.content
@@ -0,0 +1,95 @@
+import re
+import warnings
+from collections import Counter
+
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_placeholder_list_re = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when the serialization of a datatables page exceeds the query
+    budget of the view.
+    """
+
+
+class QueryBudgetWarning(RuntimeWarning):
+    """
+    Warned when the serialization of a datatables page exceeds the query
+    budget of the view.
+    """
+
+
+def get_query_shape(sql):
+    """
+    Return ``sql`` with its literals replaced by placeholders and its
+    lists of placeholders collapsed, so that queries differing only by
+    their parameters have the same shape.
+    """
+    sql = _literal_re.sub('%s', sql)
+    return _placeholder_list_re.sub('%s', sql)
+
+
+class QueryBudget(object):
+    """
+    Check the queries run while a datatables page is serialized, usually
+    the ones of serializer methods reading relations of each row (N+1
+    queries).
+
+    The budget is exceeded by more than ``max_queries`` queries (no limit
+    if ``None``), or by more than ``max_repeats`` queries of the same
+    shape. Depending on ``action``, a ``QueryBudgetWarning`` is warned
+    (``'warn'``) or ``QueryBudgetExceeded`` is raised (``'raise'``).
+    """
+    def __init__(self, max_queries=None, max_repeats=1, action='warn'):
+        if action not in ('warn', 'raise'):
+            raise ValueError('action must be "warn" or "raise"')
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.action = action
+
+    def get_repeated(self, statements):
+        """
+        Return the ``(shape, count)`` tuples of the query shapes repeated
+        more than ``max_repeats`` times in ``statements``.
+        """
+        shapes = Counter(get_query_shape(sql) for sql in statements)
+        return [
+            (shape, count) for shape, count in shapes.most_common()
+            if count > self.max_repeats
+        ]
+
+    def get_problems(self, statements):
+        problems = []
+        if self.max_queries is not None and len(statements) > self.max_queries:
+            problems.append('%d queries, the budget is %d' % (
+                len(statements), self.max_queries
+            ))
+        for shape, count in self.get_repeated(statements):
+            problems.append('%d queries like: %s' % (count, shape))
+        return problems
+
+    def check(self, view, statements):
+        """
+        Warn or raise if the SQL ``statements`` run while ``view``
+        serialized its page exceed the budget.
+        """
+        problems = self.get_problems(statements)
+        if not problems:
+            return
+        message = '%s ran %d queries while serializing a page: %s' % (
+            view.__class__.__name__, len(statements), '; '.join(problems)
+        )
+        if self.action == 'raise':
+            raise QueryBudgetExceeded(message)
+        warnings.warn(message, QueryBudgetWarning)
+
+
+def check_query_budget(view, timings):
+    """
+    Check the queries of the ``serialize`` phase of ``timings`` against
+    the ``datatables_query_budget`` of ``view``.
+    """
+    budget = getattr(view, 'datatables_query_budget', None)
+    if budget is not None and timings.statements is not None:
+        budget.check(view, timings.get_statements('serialize'))
@@ -0,0 +1,364 @@
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.utils.encoding import force_bytes
+
+from rest_framework.response import Response
+
+from .context import get_datatables_context
+from .counts import ExactCount
+from .panes import get_search_pane_options
+from .query import get_datatables_query, is_datatables_param
+from .utils import queryset_fingerprint, view_name
+
+
+# the (cache alias, key prefix) pairs holding the generations of the
+# watched models, by model label
+_watched_models = {}
+
+_default_caches = [('default', 'drf_datatables')]
+
+
+def _model_label(model):
+    return '%s.%s' % (model._meta.app_label, model._meta.model_name)
+
+
+def _generation_key(key_prefix, model):
+    return '%s:generation:%s' % (key_prefix, _model_label(model))
+
+
+def _new_generation():
+    # a time based value ensures that a generation lost by eviction will
+    # never be reused with stale entries still in the cache.
+    return int(time.time() * 1000)
+
+
+def watch_model(model, cache_alias='default', key_prefix='drf_datatables'):
+    """
+    Register ``model`` for signal based invalidation: saving or deleting
+    an instance of ``model``, or changing its many-to-many relations,
+    bumps its generation in the ``cache_alias`` cache with the
+    ``key_prefix`` prefix. The other models are not watched.
+
+    The caches register the models of the keys they build. Processes
+    saving models without building keys must register them at startup,
+    with the ``DATATABLES_CACHE_MODELS`` setting or by calling this
+    function in the ``ready()`` method of an application config.
+    """
+    if not _watched_models:
+        _connect_receivers()
+    pairs = _watched_models.setdefault(_model_label(model), [])
+    if (cache_alias, key_prefix) not in pairs:
+        pairs.append((cache_alias, key_prefix))
+
+
+def invalidate_model(model):
+    """
+    Invalidate all datatables cache entries depending on ``model``.
+    """
+    pairs = _watched_models.get(_model_label(model)) or _default_caches
+    for cache_alias, key_prefix in list(pairs):
+        cache = caches[cache_alias]
+        key = _generation_key(key_prefix, model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), None)
+
+
+def get_generations(models, cache_alias='default',
+                    key_prefix='drf_datatables'):
+    """
+    Return the current generations of ``models`` as a string suitable for
+    inclusion in a cache key.
+    """
+    for model in models:
+        watch_model(model, cache_alias, key_prefix)
+    cache = caches[cache_alias]
+    keys = [_generation_key(key_prefix, m) for m in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _new_generation(), None)
+            generations[key] = cache.get(key)
+    return '.'.join(str(generations[key]) for key in keys)
+
+
+def _on_change(sender, **kwargs):
+    if _model_label(sender) in _watched_models:
+        invalidate_model(sender)
+
+
+def _on_m2m_change(sender, instance, action, model, **kwargs):
+    if not action.startswith('post_'):
+        return
+    for changed in (instance.__class__, model):
+        if _model_label(changed) in _watched_models:
+            invalidate_model(changed)
+
+
+def _connect_receivers():
+    post_save.connect(
+        _on_change, dispatch_uid='rest_framework_datatables_post_save'
+    )
+    post_delete.connect(
+        _on_change, dispatch_uid='rest_framework_datatables_post_delete'
+    )
+    m2m_changed.connect(
+        _on_m2m_change, dispatch_uid='rest_framework_datatables_m2m_changed'
+    )
+
+
+class TotalCountCache(object):
+    """
+    Cache the unfiltered ``recordsTotal`` count of a datatables view.
+
+    Entries are keyed by view and by the SQL of the base queryset, expire
+    after ``timeout`` seconds and are invalidated as soon as an instance of
+    the queryset model (or of any of the extra ``models``) is saved, deleted
+    or has its many-to-many relations changed.
+    """
+    def __init__(self, timeout=300, cache_alias='default',
+                 key_prefix='drf_datatables', models=()):
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+        self.models = tuple(models)
+        for model in self.models:
+            watch_model(model, cache_alias, key_prefix)
+
+    def get_models(self, queryset):
+        return (queryset.model,) + self.models
+
+    def get_cache_key(self, view, queryset):
+        fingerprint = queryset_fingerprint(queryset)
+        if fingerprint is None:
+            return None
+        models = self.get_models(queryset)
+        return '%s:total:%s:%s:%s' % (
+            self.key_prefix,
+            view_name(view),
+            fingerprint,
+            get_generations(models, self.cache_alias, self.key_prefix)
+        )
+
+    def get_total_count(self, view, queryset, count=None):
+        if count is None:
+            count = ExactCount().count
+        key = self.get_cache_key(view, queryset)
+        if key is None:
+            return 0
+        cache = caches[self.cache_alias]
+        total_count = cache.get(key)
+        if total_count is None:
+            total_count = count(queryset)
+            cache.set(key, total_count, self.timeout)
+        return total_count
+
+
+class SearchPanesCache(object):
+    """
+    Cache the SearchPanes options of a datatables view, see the
+    ``datatables_search_panes_cache`` view option.
+
+    Entries are keyed by view, by the panes and by the SQL of the base and
+    filtered querysets, expire after ``timeout`` seconds and are
+    invalidated as soon as an instance of the queryset model (or of any of
+    the extra ``models``) is saved, deleted or has its many-to-many
+    relations changed.
+    """
+    def __init__(self, timeout=300, cache_alias='default',
+                 key_prefix='drf_datatables', models=()):
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+        self.models = tuple(models)
+        for model in self.models:
+            watch_model(model, cache_alias, key_prefix)
+
+    def get_models(self, queryset):
+        return (queryset.model,) + self.models
+
+    def get_cache_key(self, view, queryset, filtered_queryset, panes,
+                      filtered=True):
+        fingerprints = (
+            queryset_fingerprint(queryset),
+            queryset_fingerprint(filtered_queryset) if filtered else '',
+        )
+        if None in fingerprints:
+            return None
+        normalized = repr((list(panes.items()), fingerprints))
+        models = self.get_models(queryset)
+        return '%s:panes:%s:%s:%s' % (
+            self.key_prefix,
+            view_name(view),
+            hashlib.md5(force_bytes(normalized)).hexdigest(),
+            get_generations(models, self.cache_alias, self.key_prefix)
+        )
+
+    def get_options(self, view, queryset, filtered_queryset, panes,
+                    filtered=True):
+        """
+        Return the SearchPanes options of ``view`` from the cache,
+        computing them with ``get_search_pane_options()`` if needed.
+        """
+        key = self.get_cache_key(
+            view, queryset, filtered_queryset, panes, filtered
+        )
+        if key is None:
+            return get_search_pane_options(
+                queryset, filtered_queryset, panes, filtered
+            )
+        cache = caches[self.cache_alias]
+        options = cache.get(key)
+        if options is None:
+            options = get_search_pane_options(
+                queryset, filtered_queryset, panes, filtered
+            )
+            cache.set(key, options, self.timeout)
+        return options
+
+
+class ExtraJSONCache(object):
+    """
+    Cache the ``(key, value)`` pair returned by a ``datatables_extra_json``
+    view method, see the ``datatables_extra_json_cache`` Meta option.
+
+    Entries are keyed by view, method and view keyword arguments (and by
+    user if ``per_user`` is set), expire after ``timeout`` seconds and are
+    invalidated as soon as an instance of one of the ``models`` is saved,
+    deleted or has its many-to-many relations changed.
+    """
+    def __init__(self, timeout=300, models=(), per_user=False,
+                 cache_alias='default', key_prefix='drf_datatables'):
+        self.timeout = timeout
+        self.models = tuple(models)
+        self.per_user = per_user
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+        for model in self.models:
+            watch_model(model, cache_alias, key_prefix)
+
+    def get_cache_key(self, view, name):
+        scope = None
+        if self.per_user:
+            user = getattr(view.request, 'user', None)
+            if user is not None and user.is_authenticated:
+                scope = user.pk
+        normalized = repr((
+            sorted(getattr(view, 'kwargs', {}).items()), scope
+        ))
+        return '%s:extra:%s:%s:%s:%s' % (
+            self.key_prefix,
+            view_name(view),
+            name,
+            hashlib.md5(force_bytes(normalized)).hexdigest(),
+            get_generations(self.models, self.cache_alias, self.key_prefix)
+        )
+
+    def wrap(self, view, name, method):
+        """
+        Return a function returning the result of ``method``, the ``name``
+        method of ``view``, from the cache when possible.
+        """
+        def cached():
+            cache = caches[self.cache_alias]
+            key = self.get_cache_key(view, name)
+            pair = cache.get(key)
+            if pair is None:
+                pair = method()
+                cache.set(key, pair, self.timeout)
+            return pair
+        return cached
+
+
+class DatatablesCacheMixin(object):
+    """
+    View mixin caching the response data of datatables draws.
+
+    Entries are keyed by view, by the normalized Datatables parameters
+    (``draw`` excepted, the renderer adds the one of each request) and the
+    other query parameters, by the scope returned by
+    ``get_datatables_cache_scope()`` (the user by default) and by the
+    generations of the queryset model and of ``datatables_cache_models``:
+    they expire after ``datatables_cache_timeout`` seconds or as soon as
+    one of these models changes.
+    """
+    datatables_cache_timeout = 60
+    datatables_cache_alias = 'default'
+    datatables_cache_key_prefix = 'drf_datatables'
+    datatables_cache_models = ()
+    #: query parameters that do not change the response, like the one
+    #: jQuery adds to prevent the browser from caching the request.
+    datatables_cache_ignored_params = ('_',)
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'datatables':
+            return super(DatatablesCacheMixin, self).list(
+                request, *args, **kwargs
+            )
+        cache = caches[self.datatables_cache_alias]
+        key = self.get_datatables_cache_key(request)
+        context = get_datatables_context(request)
+        entry = cache.get(key)
+        if entry is not None:
+            (
+                data, context.total_count, context.filtered_count,
+                context.search_panes
+            ) = entry
+            return Response(data)
+        response = super(DatatablesCacheMixin, self).list(
+            request, *args, **kwargs
+        )
+        # streaming responses are not cached
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(
+                key,
+                (
+                    response.data, context.total_count,
+                    context.filtered_count, context.search_panes
+                ),
+                self.datatables_cache_timeout
+            )
+        return response
+
+    def get_datatables_cache_scope(self, request):
+        """
+        Return the part of the cache key identifying who can share the
+        entries: by default, each authenticated user has its own entries
+        and anonymous users share theirs.
+        """
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return 'anonymous'
+        return 'user-%s' % user.pk
+
+    def get_datatables_cache_models(self):
+        return (self.get_queryset().model,) + tuple(
+            self.datatables_cache_models
+        )
+
+    def get_datatables_cache_key(self, request):
+        params = [
+            (key, request.query_params.getlist(key))
+            for key in sorted(request.query_params)
+            if not is_datatables_param(key)
+            and key not in self.datatables_cache_ignored_params
+        ]
+        normalized = repr((
+            get_datatables_query(request).normalize(), params,
+            sorted(self.kwargs.items()),
+        ))
+        models = self.get_datatables_cache_models()
+        return '%s:response:%s:%s:%s:%s' % (
+            self.datatables_cache_key_prefix,
+            view_name(self),
+            self.get_datatables_cache_scope(request),
+            hashlib.md5(force_bytes(normalized)).hexdigest(),
+            get_generations(
+                models, self.datatables_cache_alias,
+                self.datatables_cache_key_prefix
+            )
+        )
@@ -0,0 +1,80 @@
+try:
+    from concurrent.futures import Future
+except ImportError:  # pragma: no cover
+    Future = ()
+
+
+def _resolve(value):
+    if isinstance(value, Future):
+        return value.result()
+    return value
+
+
+class DatatablesContext(object):
+    """
+    Request scoped state shared by the filter backend, the paginators and
+    the renderer, so that each count is computed at most once per request.
+
+    The counts, the SearchPanes options and the extra JSON pairs may be set
+    to futures when they are computed concurrently, reading them waits for
+    the results.
+    """
+    def __init__(self):
+        self.query = None
+        self.total_count = None
+        self.filtered_count = None
+        # (key, value) pairs of the extra JSON, when computed before
+        # rendering by an async view or a concurrent draw
+        self.extra_json = None
+        # SearchPanes options, if the view has search panes
+        self.search_panes = None
+        # DrawTimings of the draw, if the view is timed
+        self.timings = None
+
+    @property
+    def total_count(self):
+        self._total_count = _resolve(self._total_count)
+        return self._total_count
+
+    @total_count.setter
+    def total_count(self, value):
+        self._total_count = value
+
+    @property
+    def filtered_count(self):
+        self._filtered_count = _resolve(self._filtered_count)
+        return self._filtered_count
+
+    @filtered_count.setter
+    def filtered_count(self, value):
+        self._filtered_count = value
+
+    @property
+    def search_panes(self):
+        self._search_panes = _resolve(self._search_panes)
+        return self._search_panes
+
+    @search_panes.setter
+    def search_panes(self, value):
+        self._search_panes = value
+
+    @property
+    def extra_json(self):
+        if self._extra_json is not None:
+            self._extra_json = [_resolve(pair) for pair in self._extra_json]
+        return self._extra_json
+
+    @extra_json.setter
+    def extra_json(self, value):
+        self._extra_json = value
+
+
+def get_datatables_context(request):
+    """
+    Return the datatables context of ``request``, creating it if needed.
+    """
+    context = getattr(request, '_datatables_context', None)
+    if context is None:
+        context = DatatablesContext()
+        request._datatables_context = context
+    return context
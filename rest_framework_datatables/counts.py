@@ -0,0 +1,137 @@
+import json
+
+from django.db import connections, DatabaseError, transaction
+
+
+class BaseCountStrategy(object):
+    """
+    Base class for the strategies used to compute ``recordsTotal`` and
+    ``recordsFiltered``.
+    """
+    #: whether the strategy always returns the exact number of rows
+    exact = True
+
+    def count(self, queryset):  # pragma: no cover
+        raise NotImplementedError(
+            '%s must implement count()' % self.__class__.__name__
+        )
+
+
+class ExactCount(BaseCountStrategy):
+    """
+    Count rows with ``queryset.count()``, this is the default.
+    """
+    def count(self, queryset):
+        return queryset.count()
+
+
+class EstimatedCount(BaseCountStrategy):
+    """
+    Use the query planner estimate instead of counting rows.
+
+    On PostgreSQL the estimate comes from ``pg_class.reltuples`` for
+    unfiltered querysets and from the ``EXPLAIN`` row estimate otherwise.
+    On SQLite unfiltered querysets use the statistics gathered by
+    ``ANALYZE``. In all other cases, and when the estimate is lower than
+    ``threshold``, rows are counted exactly.
+    """
+    exact = False
+
+    def __init__(self, threshold=1000):
+        self.threshold = threshold
+
+    def count(self, queryset):
+        connection = connections[queryset.db]
+        estimate = None
+        try:
+            # a failed query aborts the transaction of the request on
+            # PostgreSQL, the savepoint lets the exact count still run
+            with transaction.atomic(using=queryset.db):
+                if connection.vendor == 'postgresql':
+                    estimate = self.postgresql_estimate(connection, queryset)
+                elif connection.vendor == 'sqlite':
+                    estimate = self.sqlite_estimate(connection, queryset)
+        except DatabaseError:
+            estimate = None
+        if estimate is None or estimate < self.threshold:
+            return queryset.count()
+        return estimate
+
+    def is_unfiltered(self, queryset):
+        query = queryset.query
+        return (
+            not query.where
+            and not query.distinct
+            and query.low_mark == 0
+            and query.high_mark is None
+        )
+
+    def postgresql_estimate(self, connection, queryset):
+        with connection.cursor() as cursor:
+            if self.is_unfiltered(queryset):
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [connection.ops.quote_name(queryset.model._meta.db_table)]
+                )
+            else:
+                sql, params = queryset.order_by().query.sql_with_params()
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        if self.is_unfiltered(queryset):
+            # reltuples is -1 (or 0 on old versions) for tables that were
+            # never vacuumed nor analyzed
+            return int(row[0]) if row[0] > 0 else None
+        plan = row[0]
+        if not isinstance(plan, list):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def sqlite_estimate(self, connection, queryset):
+        if not self.is_unfiltered(queryset):
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return int(row[0].split()[0])
+
+
+class CappedCount(BaseCountStrategy):
+    """
+    Count at most ``cap + 1`` rows through a ``LIMIT``-ed subquery.
+
+    The returned value is exact up to ``cap`` rows and a lower bound above,
+    which lets Datatables know that there are more rows without scanning
+    the whole table.
+    """
+    exact = False
+
+    def __init__(self, cap=10000):
+        self.cap = cap
+
+    def count(self, queryset):
+        return queryset.order_by()[:self.cap + 1].count()
+
+
+DEFAULT_COUNT_STRATEGY = ExactCount()
+
+
+def get_count_strategy(view, total=False):
+    """
+    Return the count strategy of ``view``, the ``total`` flag selects the
+    strategy used for ``recordsTotal``.
+    """
+    strategy = None
+    if total:
+        strategy = getattr(view, 'datatables_total_count_strategy', None)
+    if strategy is None:
+        strategy = getattr(view, 'datatables_count_strategy', None)
+    if strategy is None:
+        strategy = DEFAULT_COUNT_STRATEGY
+    return strategy
@@ -0,0 +1,84 @@
+import threading
+
+from django.db import close_old_connections, connections
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # pragma: no cover
+    # Python 2 without the futures backport
+    ThreadPoolExecutor = None
+try:
+    from contextvars import copy_context
+except ImportError:  # pragma: no cover
+    copy_context = None
+
+
+def _call(func, args):
+    try:
+        return func(*args)
+    finally:
+        # the worker threads have their own database connections, close
+        # them like at the end of a request unless they are persistent
+        close_old_connections()
+
+
+class QueryExecutor(object):
+    """
+    Run the independent queries of a datatables draw concurrently on a
+    bounded pool of ``max_workers`` threads, shared by all the requests
+    of the views using the executor: the total count, the filtered count,
+    the page query and the ``datatables_extra_json`` methods.
+
+    Each worker thread uses its own database connections, so the queries
+    are not run in the transaction of the request, and they do not see
+    the same snapshot of the database.
+    """
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.max_workers)
+        return self._pool
+
+    def submit(self, func, *args):
+        """
+        Schedule ``func(*args)`` and return its future. It runs with the
+        context variables of the caller, like the active language.
+        """
+        if copy_context is not None:
+            return self.pool.submit(copy_context().run, _call, func, args)
+        return self.pool.submit(_call, func, args)  # pragma: no cover
+
+    def is_available(self, using):
+        """
+        Return ``True`` if queries of the database alias ``using`` may run
+        on other connections: not inside a transaction, as the other
+        connections would not see its changes.
+        """
+        return (
+            ThreadPoolExecutor is not None
+            and not connections[using].in_atomic_block
+        )
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait)
+                self._pool = None
+
+
+def get_executor(view, using):
+    """
+    Return the ``datatables_executor`` of ``view`` if the queries of the
+    database alias ``using`` can run concurrently, ``None`` otherwise.
+    """
+    executor = getattr(view, 'datatables_executor', None)
+    if executor is None or not executor.is_available(using):
+        return None
+    return executor
@@ -1,78 +1,300 @@
 import re
-from copy import deepcopy
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import (
+    DecimalField, FloatField, IntegerField, Q
+)
 
-from django.db.models import Q
+try:
+    from django.db.models import Exists, OuterRef
+except ImportError:  # pragma: no cover
+    Exists = OuterRef = None
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:  # pragma: no cover
+    from django.db.models.sql.datastructures import EmptyResultSet
 
 from rest_framework.filters import BaseFilterBackend
 
+from .context import get_datatables_context
+from .counts import get_count_strategy
+from .executor import get_executor
+from .panes import get_search_pane_options, get_search_panes
+from .query import get_datatables_query
+from .timing import timed
+from .utils import (
+    get_column_lookups, get_lookup_fields, get_serializer_class,
+    is_multivalued
+)
+
+
+_number_re = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)$')
+_number_part_re = re.compile(r'^[\d.+-]+$')
+# double-quoted phrases (the closing quote is optional) or words
+_term_re = re.compile(r'"([^"]*)"?|(\S+)')
+
 
 class DatatablesFilterBackend(BaseFilterBackend):
     """
     Filter that works with datatables params.
     """
+    #: lookups comparing the value of the model field, the search value
+    #: is converted to the type of the field first.
+    value_lookups = (
+        'exact', 'iexact', 'gt', 'gte', 'lt', 'lte',
+    )
+    #: fields that cannot match text containing anything but a number.
+    numeric_fields = (IntegerField, FloatField, DecimalField)
+    #: maximum number of terms of a tokenized global search, the next
+    #: ones are ignored.
+    max_search_terms = 8
+    #: maximum length of a term of a tokenized global search, longer terms
+    #: are truncated.
+    max_search_term_length = 64
+    #: separator of the values of the ``in`` lookup.
+    in_separator = ','
+    #: separator of the bounds of the ``range`` lookup.
+    range_separator = ','
+    #: lookups only used by column searches, the global search compares
+    #: their columns with ``exact``.
+    column_search_lookups = ('in', 'range')
+
     def filter_queryset(self, request, queryset, view):
         if request.accepted_renderer.format != 'datatables':
             return queryset
 
-        filtered_count_before = queryset.count()
-        total_count = view.get_queryset().count()
-        # set the queryset count as an attribute of the view for later
-        # TODO: find a better way than this hack
-        setattr(view, '_datatables_total_count', total_count)
+        context = get_datatables_context(request)
+        with timed(request, view, 'parse'):
+            get_datatables_query(request)
+        base_queryset = view.get_queryset()
+        executor = get_executor(view, queryset.db)
+        with timed(request, view, 'total_count'):
+            if executor is not None:
+                # the counts and the extra JSON are computed while the page
+                # is fetched, reading them from the context waits for them.
+                self.submit_extra_json(executor, request, view)
+                total_count = executor.submit(
+                    self.get_total_count, view, base_queryset
+                )
+            else:
+                total_count = self.get_total_count(view, base_queryset)
+        context.total_count = total_count
+
+        with timed(request, view, 'filter'):
+            queryset, filtered = self.search_queryset(request, queryset, view)
+
+        count_strategy = get_count_strategy(view)
+        unfiltered = not filtered and self.is_total_count_reusable(
+            view, queryset, base_queryset
+        )
+        if unfiltered:
+            # nothing was filtered, the total count is the filtered count
+            context.filtered_count = total_count
+        elif self.is_filtered_count_needed(request, view):
+            with timed(request, view, 'filtered_count'):
+                if executor is not None:
+                    context.filtered_count = executor.submit(
+                        count_strategy.count, queryset
+                    )
+                else:
+                    context.filtered_count = count_strategy.count(queryset)
+
+        if get_datatables_query(request).count_only:
+            # only the counts were requested, there is no row to fetch
+            return queryset.none()
+
+        if get_search_panes(request, view):
+            with timed(request, view, 'search_panes'):
+                if executor is not None:
+                    context.search_panes = executor.submit(
+                        self.get_search_pane_options, request, view,
+                        base_queryset, queryset, not unfiltered
+                    )
+                else:
+                    context.search_panes = self.get_search_pane_options(
+                        request, view, base_queryset, queryset,
+                        not unfiltered
+                    )
+
+        with timed(request, view, 'order'):
+            queryset = self.order_queryset(request, queryset, view)
+        return queryset
+
+    def is_filtered_count_needed(self, request, view):
+        """
+        Return ``False`` if the paginator of ``view`` does not use the
+        filtered count, unless the request asks for the counts only.
+        """
+        if get_datatables_query(request).count_only:
+            return True
+        paginator = getattr(view, 'paginator', None)
+        return getattr(paginator, 'datatables_count_filtered', True)
+
+    def get_search_pane_options(self, request, view, base_queryset,
+                                queryset, filtered=True):
+        """
+        Return the SearchPanes options of ``view``, counting the values of
+        each pane in ``base_queryset`` and in the filtered ``queryset``,
+        from the ``datatables_search_panes_cache`` of the view if it is
+        set.
+        """
+        panes = get_search_panes(request, view)
+        panes_cache = getattr(view, 'datatables_search_panes_cache', None)
+        if panes_cache is None:
+            return get_search_pane_options(
+                base_queryset, queryset, panes, filtered
+            )
+        return panes_cache.get_options(
+            view, base_queryset, queryset, panes, filtered
+        )
 
+    def get_search_panes_filters(self, request, queryset, view):
+        """
+        Return the list of ``Q`` objects matching the values selected in
+        each of the SearchPanes of the datatables request, a row must match
+        one of the values of each pane.
+        """
+        selected = get_datatables_query(request).search_panes
+        filters = []
+        for data, name in get_search_panes(request, view).items():
+            values = selected.get(data)
+            if not values:
+                continue
+            fields = get_lookup_fields(queryset.model, name)
+            field = fields[-1] if fields else None
+            values = [
+                self.clean_value(field, v, queryset.db) for v in values
+            ]
+            values = [v for v in values if v is not None]
+            filters.append(
+                self.get_lookup_q(
+                    queryset, view, name, 'in', values, exists=True
+                )
+                if values else Q(pk__in=[])
+            )
+        return filters
+
+    def submit_extra_json(self, executor, request, view):
+        """
+        Compute the ``datatables_extra_json`` of the renderer on
+        ``executor``, one method per task.
+        """
+        renderer = request.accepted_renderer
+        if not hasattr(renderer, '_get_extra_json_calls'):
+            return
+        get_datatables_context(request).extra_json = [
+            executor.submit(call) for call in renderer._get_extra_json_calls(
+                view, renderer._get_extra_json_funcs(view)
+            )
+        ]
+
+    def search_queryset(self, request, queryset, view):
+        """
+        Apply the global and column searches of the datatables request to
+        ``queryset``. Return the filtered queryset and whether it was
+        filtered, without running any query.
+        """
         # parse query params
-        getter = request.query_params.get
-        fields = self.get_fields(getter)
-        ordering = self.get_ordering(getter, fields)
-        search_value = getter('search[value]')
-        search_regex = getter('search[regex]') == 'true'
+        query = get_datatables_query(request)
+        fields = self.get_fields(request)
+        search_value = query.search_value
+        search_regex = query.search_regex
 
         # filter queryset
+        searched = False
+        search_engine = getattr(view, 'datatables_search_engine', None)
+        if (
+                search_engine is not None
+                and search_value and search_value != 'false'
+                and not search_regex
+        ):
+            queryset = search_engine.filter_queryset(
+                queryset, search_value, self.get_search_fields(view, fields)
+            )
+            searched = True
+            search_value = None
+
+        lookups = self.get_column_lookups(view)
+        if search_value == 'false' or (
+                search_regex and not self.is_valid_regex(search_value)
+        ):
+            search_value = None
+        terms = []
+        if search_value:
+            terms = [search_value] if search_regex else self.get_search_terms(
+                view, search_value
+            )
+        # each term of the global search must match one of the columns,
+        # the column searches must all match.
+        terms_q = [Q() for term in terms]
+        # the terms are matched by EXISTS subqueries on multi-valued
+        # relations, so that they can match different related rows
+        # without joining the relation once per term.
+        terms_exists = True if len(terms) > 1 else None
+        searchable = False
         q = Q()
         for f in fields:
-            if not f['searchable']:
+            if not f.searchable:
                 continue
-            if search_value and search_value != 'false':
-                if search_regex:
-                    if self.is_valid_regex(search_value):
-                        # iterate through the list created from the 'name'
-                        # param and create a string of 'ior' Q() objects.
-                        for x in f['name']:
-                            q |= Q(**{'%s__iregex' % x: search_value})
-                else:
-                    # same as above.
-                    for x in f['name']:
-                        q |= Q(**{'%s__icontains' % x: search_value})
-            f_search_value = f.get('search_value')
-            f_search_regex = f.get('search_regex') == 'true'
+            searchable = True
+            lookup = 'iregex' if search_regex else lookups.get(
+                f.data, 'icontains'
+            )
+            if lookup in self.column_search_lookups:
+                lookup = 'exact'
+            for i, term in enumerate(terms):
+                column_q = self.get_column_q(
+                    queryset, view, f, lookup, term, terms_exists
+                )
+                if column_q is not None:
+                    terms_q[i] |= column_q
+            f_search_value = f.search_value
+            f_search_regex = f.search_regex
             if f_search_value:
                 if f_search_regex:
-                    if self.is_valid_regex(f_search_value):
-                        # create a temporary q variable to hold the Q()
-                        # objects adhering to the field's name criteria.
-                        temp_q = Q()
-                        for x in f['name']:
-                            temp_q |= Q(**{'%s__iregex' % x: f_search_value})
-                        # Use deepcopy() to transfer them to the global Q()
-                        # object. Deepcopy() necessary, since the var will be
-                        # reinstantiated next iteration.
-                        q = q & deepcopy(temp_q)
+                    if not self.is_valid_regex(f_search_value):
+                        continue
+                    lookup = 'iregex'
                 else:
-                    temp_q = Q()
-                    for x in f['name']:
-                        temp_q |= Q(**{'%s__icontains' % x: f_search_value})
-                    q = q & deepcopy(temp_q)
-
-        if q:
-            queryset = queryset.filter(q).distinct()
-            filtered_count = queryset.count()
-        else:
-            filtered_count = filtered_count_before
-        # set the queryset count as an attribute of the view for later
-        # TODO: maybe find a better way than this hack ?
-        setattr(view, '_datatables_filtered_count', filtered_count)
-
-        # order queryset
+                    lookup = lookups.get(f.data, 'icontains')
+                column_q = self.get_column_q(
+                    queryset, view, f, lookup, f_search_value
+                )
+                # a value that cannot match the column matches no row
+                q &= column_q if column_q is not None else Q(pk__in=[])
+        filters = [q] if q else []
+        if searchable:
+            filters.extend(
+                term_q if term_q else Q(pk__in=[]) for term_q in terms_q
+            )
+        filters.extend(self.get_search_panes_filters(request, queryset, view))
+        if filters or searched:
+            # a single filter() call joins each relation once
+            filter_q = Q()
+            for f_q in filters:
+                filter_q &= f_q
+            if filter_q:
+                queryset = queryset.filter(filter_q)
+            if not self.use_exists(view):
+                queryset = queryset.distinct()
+            return queryset, True
+        return queryset, False
+
+    def is_total_count_reusable(self, view, queryset, base_queryset):
+        """
+        Return ``True`` if the total count can be used as the filtered
+        count of the unsearched ``queryset``.
+        """
+        return (
+            get_count_strategy(view) is get_count_strategy(view, total=True)
+            and self.is_same_query(queryset, base_queryset)
+        )
+
+    def order_queryset(self, request, queryset, view):
+        """
+        Apply the ordering of the datatables request to ``queryset``.
+        """
+        ordering = self.get_ordering(request, self.get_fields(request))
         if len(ordering):
             if hasattr(view, 'datatables_additional_order_by'):
                 additional = view.datatables_additional_order_by
@@ -86,62 +308,192 @@ class DatatablesFilterBackend(BaseFilterBackend):
             queryset = queryset.order_by(*ordering)
         return queryset
 
-    def get_fields(self, getter):
-        fields = []
-        i = 0
-        while True:
-            col = 'columns[%d][%s]'
-            data = getter(col % (i, 'data'))
-            # break out only when there are no more
-            # fields to get.
-            if data is None:
+    def get_search_fields(self, view, fields):
+        search_fields = getattr(view, 'datatables_search_fields', None)
+        if search_fields is not None:
+            return list(search_fields)
+        return [
+            name for f in fields if f.searchable for name in f.name
+        ]
+
+    def use_exists(self, view):
+        return getattr(view, 'datatables_exists_subqueries', False)
+
+    def get_search_terms(self, view, search_value):
+        """
+        Return the terms of the global search: the whole search value,
+        or, if the view sets ``datatables_tokenize_search``, the words and
+        double-quoted phrases it contains, capped in number and length.
+        """
+        if not getattr(view, 'datatables_tokenize_search', False):
+            return [search_value]
+        terms = []
+        seen = set()
+        for phrase, word in _term_re.findall(search_value):
+            term = (phrase or word).strip()
+            term = term[:self.max_search_term_length].rstrip()
+            if not term or term.lower() in seen:
+                continue
+            seen.add(term.lower())
+            terms.append(term)
+            if len(terms) == self.max_search_terms:
                 break
-            name = getter(col % (i, 'name'))
-            if not name:
-                name = data
-            search_col = col % (i, 'search')
-            # to be able to search across multiple fields (e.g. to search
-            # through concatenated names), we create a list of the name field,
-            # replacing dot notation with double-underscores and splitting
-            # along the commas.
-            field = {
-                'name': [
-                    n.lstrip() for n in name.replace('.', '__').split(',')
-                ],
-                'data': data,
-                'searchable': getter(col % (i, 'searchable')) == 'true',
-                'orderable': getter(col % (i, 'orderable')) == 'true',
-                'search_value': getter('%s[%s]' % (search_col, 'value')),
-                'search_regex': getter('%s[%s]' % (search_col, 'regex')),
-            }
-            fields.append(field)
-            i += 1
-        return fields
-
-    def get_ordering(self, getter, fields):
+        return terms
+
+    def get_column_lookups(self, view):
+        return get_column_lookups(get_serializer_class(view))
+
+    def get_column_q(self, queryset, view, column, lookup, value,
+                     exists=None):
+        """
+        Return the ``Q`` object matching ``value`` with ``lookup`` in any of
+        the lookup paths of ``column``, or ``None`` if it cannot match.
+        """
+        q = None
+        for name in column.name:
+            name_q = self.get_search_q(
+                queryset, view, name, lookup, value, exists
+            )
+            if name_q is not None:
+                q = name_q if q is None else q | name_q
+        return q
+
+    def get_search_q(self, queryset, view, name, lookup, value,
+                     exists=None):
+        """
+        Return the ``Q`` object matching ``value`` with ``lookup`` in the
+        lookup path ``name``, or ``None`` if the type of the model field
+        cannot match ``value``. See ``get_lookup_q()`` for ``exists``.
+        """
+        fields = get_lookup_fields(queryset.model, name)
+        field = fields[-1] if fields else None
+        if lookup == 'numeric':
+            if not _number_re.match(value.strip()):
+                return None
+            lookup = 'exact'
+        if lookup == 'in':
+            values = [
+                self.clean_value(field, v.strip(), queryset.db)
+                for v in value.split(self.in_separator)
+            ]
+            values = [v for v in values if v is not None]
+            if not values:
+                return None
+            return self.get_lookup_q(
+                queryset, view, name, lookup, values, exists
+            )
+        if lookup == 'range':
+            low, _, high = value.partition(self.range_separator)
+            low = self.clean_value(field, low.strip(), queryset.db)
+            high = self.clean_value(field, high.strip(), queryset.db)
+            if low is None and high is None:
+                return None
+            if high is None:
+                return self.get_lookup_q(
+                    queryset, view, name, 'gte', low, exists
+                )
+            if low is None:
+                return self.get_lookup_q(
+                    queryset, view, name, 'lte', high, exists
+                )
+            return self.get_lookup_q(
+                queryset, view, name, lookup, (low, high), exists
+            )
+        if lookup in self.value_lookups:
+            value = self.clean_value(field, value.strip(), queryset.db)
+            if value is None:
+                return None
+        elif (
+                lookup not in ('regex', 'iregex')
+                and isinstance(field, self.numeric_fields)
+                and not _number_part_re.match(value.strip())
+        ):
+            # a number cast to text only contains digits, signs and dots
+            return None
+        return self.get_lookup_q(
+            queryset, view, name, lookup, value, exists
+        )
+
+    def clean_value(self, field, value, using='default'):
+        """
+        Return ``value`` converted to the type of the model ``field``, or
+        ``None`` if it is empty or invalid, like an integer that the
+        ``using`` database cannot hold.
+        """
+        if value == '':
+            return None
+        if field is None:
+            return value
+        try:
+            value = field.to_python(value)
+        except (ValidationError, ValueError, TypeError):
+            return None
+        if isinstance(field, IntegerField) and value is not None:
+            low, high = connections[using].ops.integer_field_range(
+                field.get_internal_type()
+            )
+            # the widest database integers have 64 bits
+            low = -2 ** 63 if low is None else low
+            high = 2 ** 63 - 1 if high is None else high
+            if not low <= value <= high:
+                return None
+        return value
+
+    def get_lookup_q(self, queryset, view, name, lookup, value,
+                     exists=None):
+        """
+        Return the ``Q`` object matching ``value`` with ``lookup`` in the
+        lookup path ``name``, as an ``EXISTS`` subquery if the path is
+        multi-valued and ``exists`` is set (by default if the view sets
+        ``datatables_exists_subqueries``).
+        """
+        if exists is None:
+            exists = self.use_exists(view)
+        q = Q(**{'%s__%s' % (name, lookup): value})
+        if (
+                exists and Exists is not None
+                and is_multivalued(queryset.model, name)
+        ):
+            # a correlated subquery does not duplicate rows, so the
+            # queryset does not need to be made distinct.
+            model = queryset.model
+            return Q(Exists(
+                model._base_manager.filter(q, pk=OuterRef('pk'))
+            ))
+        return q
+
+    def get_total_count(self, view, queryset):
+        count_strategy = get_count_strategy(view, total=True)
+        count_cache = getattr(view, 'datatables_total_count_cache', None)
+        if count_cache is None:
+            return count_strategy.count(queryset)
+        return count_cache.get_total_count(
+            view, queryset, count_strategy.count
+        )
+
+    def get_fields(self, request):
+        return get_datatables_query(request).columns
+
+    def get_ordering(self, request, fields):
         ordering = []
-        i = 0
-        while True:
-            col = 'order[%d][%s]'
-            idx = getter(col % (i, 'column'))
-            if idx is None:
-                break
-            try:
-                field = fields[int(idx)]
-            except IndexError:
-                i += 1
+        for idx, dir_ in get_datatables_query(request).order:
+            if idx < 0 or idx >= len(fields):
                 continue
-            if not field['orderable']:
-                i += 1
+            field = fields[idx]
+            if not field.orderable:
                 continue
-            dir_ = getter(col % (i, 'dir'), 'asc')
             ordering.append('%s%s' % (
                 '-' if dir_ == 'desc' else '',
-                field['name'][0]
+                field.name[0]
             ))
-            i += 1
         return ordering
 
+    def is_same_query(self, queryset, other):
+        try:
+            return str(queryset.query) == str(other.query)
+        except EmptyResultSet:
+            return False
+
     def is_valid_regex(cls, regex):
         try:
             re.compile(regex)
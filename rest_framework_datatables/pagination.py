@@ -1,6 +1,9 @@
 from collections import OrderedDict
 
+from django.core.cache import caches
 from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import F, Q
 
 from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
@@ -8,6 +11,14 @@ from rest_framework.pagination import (
     PageNumberPagination, LimitOffsetPagination
 )
 
+from .context import get_datatables_context
+from .planner import plan_queryset
+from .counts import get_count_strategy
+from .executor import get_executor
+from .query import get_datatables_query
+from .timing import timed
+from .utils import get_lookup_fields, queryset_fingerprint, view_name
+
 try:
     from django.utils import six
 
@@ -27,18 +38,40 @@ class DatatablesMixin(object):
             ('data', data)
         ]))
 
-    def get_count_and_total_count(self, queryset, view):
-        if hasattr(view, '_datatables_filtered_count'):
-            count = view._datatables_filtered_count
-            del view._datatables_filtered_count
-        else:  # pragma: no cover
-            count = queryset.count()
-        if hasattr(view, '_datatables_total_count'):
-            total_count = view._datatables_total_count
-            del view._datatables_total_count
-        else:  # pragma: no cover
-            total_count = count
-        return count, total_count
+    def plan_queryset(self, queryset, request, view):
+        """
+        Return the page queryset, with the related objects used by the
+        requested columns loaded in bulk and the selected columns
+        restricted to the serialized ones if the view enables it.
+        """
+        return plan_queryset(queryset, request, view)
+
+    def submit_page(self, queryset, view, offset, limit):
+        """
+        Start fetching the ``limit`` rows of ``queryset`` from ``offset``
+        on the ``datatables_executor`` of ``view``, so that the page query
+        runs while the counts are computed. Return the future, or ``None``
+        if the view does not run the queries of its draws concurrently.
+        """
+        executor = get_executor(view, queryset.db)
+        if executor is None:
+            return None
+        return executor.submit(list, queryset[offset:offset + limit])
+
+    def get_count_and_total_count(self, queryset, view, request=None):
+        if request is None:  # pragma: no cover
+            request = view.request
+        context = get_datatables_context(request)
+        # also the time spent waiting for the counts run concurrently
+        with timed(request, view, 'filtered_count'):
+            if context.filtered_count is None:
+                # the filter backend was not used, count now and remember it
+                context.filtered_count = get_count_strategy(view).count(
+                    queryset
+                )
+            if context.total_count is None:
+                context.total_count = context.filtered_count
+        return context.filtered_count, context.total_count
 
 
 class DatatablesPageNumberPagination(DatatablesMixin, PageNumberPagination):
@@ -49,47 +82,306 @@ class DatatablesPageNumberPagination(DatatablesMixin, PageNumberPagination):
                 DatatablesPageNumberPagination, self
             ).paginate_queryset(queryset, request, view)
 
-        length = request.query_params.get('length')
-
-        if length is None or length == '-1':
+        query = get_datatables_query(request)
+        if query.length is None or query.length == -1:
             return None
-        self.count, self.total_count = self.get_count_and_total_count(
-            queryset, view
-        )
         self.is_datatable_request = True
         self.page_size_query_param = 'length'
         page_size = self.get_page_size(request)
         if not page_size:  # pragma: no cover
             return None
 
+        page_queryset = self.plan_queryset(queryset, request, view)
+        rows = self.submit_page(
+            page_queryset, view,
+            int(query.start / page_size) * page_size, page_size
+        )
+        self.count, self.total_count = self.get_count_and_total_count(
+            queryset, view, request
+        )
+        with timed(request, view, 'page'):
+            self.page = self.get_datatables_page(
+                page_queryset, request, page_size
+            )
+            if rows is not None:
+                self.page.object_list = rows.result()
+            self.request = request
+            return list(self.page)
+
+    def get_datatables_page(self, queryset, request, page_size):
+        """
+        Return the unevaluated Django page of ``queryset`` requested by the
+        ``start`` parameter.
+        """
         paginator = self.django_paginator_class(queryset, page_size)
-        start = int(request.query_params.get('start', 0))
-        page_number = int(start / page_size) + 1
+        # the paginator would otherwise count the queryset again to
+        # validate the page number
+        paginator.count = self.count
+        page_number = int(get_datatables_query(request).start / page_size) + 1
 
         try:
-            self.page = paginator.page(page_number)
+            return paginator.page(page_number)
         except InvalidPage as exc:
             msg = self.invalid_page_message.format(
                 page_number=page_number, message=text_type(exc)
             )
             raise NotFound(msg)
-        self.request = request
-        return list(self.page)
 
 
 class DatatablesLimitOffsetPagination(DatatablesMixin, LimitOffsetPagination):
     def paginate_queryset(self, queryset, request, view=None):
         if request.accepted_renderer.format == 'datatables':
             self.is_datatable_request = True
-            if request.query_params.get('length') is None:
+            if get_datatables_query(request).length is None:
                 return None
             self.limit_query_param = 'length'
             self.offset_query_param = 'start'
+            page_queryset = self.plan_queryset(queryset, request, view)
+            self.limit = self.get_limit(request)
+            rows = None
+            if self.limit is not None:
+                self.offset = self.get_offset(request)
+                rows = self.submit_page(
+                    page_queryset, view, self.offset, self.limit
+                )
             self.count, self.total_count = self.get_count_and_total_count(
-                queryset, view
+                queryset, view, request
             )
-        else:
-            self.is_datatable_request = False
+            if rows is not None:
+                self.request = request
+                if self.count == 0 or self.offset > self.count:
+                    return []
+                with timed(request, view, 'page'):
+                    return rows.result()
+            with timed(request, view, 'page'):
+                return super(
+                    DatatablesLimitOffsetPagination, self
+                ).paginate_queryset(page_queryset, request, view)
+        self.is_datatable_request = False
         return super(
             DatatablesLimitOffsetPagination, self
         ).paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset):
+        if self.is_datatable_request:
+            return self.count
+        return super(DatatablesLimitOffsetPagination, self).get_count(
+            queryset
+        )
+
+
+class DatatablesKeysetPagination(DatatablesLimitOffsetPagination):
+    """
+    Limit/offset pagination that seeks from the boundary of an adjacent
+    page instead of using ``OFFSET`` whenever it can.
+
+    The ordering of the queryset is completed with the primary key to make
+    it unique, and the ordering values of the first and last rows of every
+    page are remembered in the cache. When the client requests the page
+    following or preceding one it already fetched, the page is selected
+    with a ``WHERE`` clause on these values; arbitrary jumps fall back to
+    ``OFFSET``.
+    """
+    keyset_cache_alias = 'default'
+    keyset_cache_timeout = 300
+    keyset_key_prefix = 'drf_datatables'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+                request.accepted_renderer.format != 'datatables'
+                or get_datatables_query(request).length is None
+        ):
+            return super(
+                DatatablesKeysetPagination, self
+            ).paginate_queryset(queryset, request, view)
+
+        self.is_datatable_request = True
+        self.limit_query_param = 'length'
+        self.offset_query_param = 'start'
+        self.count, self.total_count = self.get_count_and_total_count(
+            queryset, view, request
+        )
+        self.limit = self.get_limit(request)
+        if self.limit is None:  # pragma: no cover
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        if self.count == 0 or self.offset > self.count:
+            return []
+
+        queryset = self.plan_queryset(queryset, request, view)
+        with timed(request, view, 'page'):
+            ordering = self.get_keyset_ordering(queryset)
+            if ordering is None:
+                return list(queryset[self.offset:self.offset + self.limit])
+            return self.get_keyset_page(queryset, view, ordering)
+
+    def get_keyset_ordering(self, queryset):
+        """
+        Return the ordering of ``queryset`` completed with the primary key,
+        or ``None`` if it cannot be used to seek.
+        """
+        query = queryset.query
+        if query.order_by:
+            ordering = list(query.order_by)
+        elif query.default_ordering:
+            ordering = list(queryset.model._meta.ordering)
+        else:  # pragma: no cover
+            ordering = []
+        for o in ordering:
+            if not isinstance(o, (str, text_type)) or o == '?':
+                return None
+            name = o.lstrip('-')
+            if name == 'pk' or name in query.annotations:
+                continue
+            fields = get_lookup_fields(queryset.model, name)
+            # ordering by a relation uses the ordering of the related model
+            if fields is None or fields[-1].is_relation:
+                return None
+        pk_names = ('pk', queryset.model._meta.pk.name)
+        if not any(o.lstrip('-') in pk_names for o in ordering):
+            ordering.append('pk')
+        return ordering
+
+    def get_keyset_page(self, queryset, view, ordering):
+        cache = caches[self.keyset_cache_alias]
+        queryset = queryset.order_by(*ordering).annotate(**dict(
+            ('_datatables_key_%d' % i, F(o.lstrip('-')))
+            for i, o in enumerate(ordering)
+        ))
+        prefix = '%s:keyset:%s:%s' % (
+            self.keyset_key_prefix, view_name(view),
+            queryset_fingerprint(queryset)
+        )
+        before_key = '%s:%d' % (prefix, self.offset - 1)
+        after_key = '%s:%d' % (prefix, self.offset + self.limit)
+        boundaries = cache.get_many([before_key, after_key])
+        nulls_largest = connections[queryset.db].features.nulls_order_largest
+
+        if self.offset == 0:
+            rows = list(queryset[:self.limit])
+        elif before_key in boundaries:
+            # paging forward: seek after the last row of the previous page
+            rows = list(queryset.filter(self.get_seek_q(
+                ordering, boundaries[before_key], nulls_largest
+            ))[:self.limit])
+        elif after_key in boundaries:
+            # paging backward: seek before the first row of the next page
+            reverse_ordering = [
+                o[1:] if o.startswith('-') else '-' + o for o in ordering
+            ]
+            rows = list(queryset.filter(self.get_seek_q(
+                reverse_ordering, boundaries[after_key], nulls_largest
+            )).order_by(*reverse_ordering)[:self.limit])
+            rows.reverse()
+        else:
+            rows = list(queryset[self.offset:self.offset + self.limit])
+
+        if rows:
+            new_boundaries = {}
+            for index, row in (
+                    (self.offset, rows[0]),
+                    (self.offset + len(rows) - 1, rows[-1])
+            ):
+                # rows are dicts for values() querysets
+                get = row.get if isinstance(row, dict) else row.__dict__.get
+                new_boundaries['%s:%d' % (prefix, index)] = [
+                    get('_datatables_key_%d' % i)
+                    for i in range(len(ordering))
+                ]
+            cache.set_many(new_boundaries, self.keyset_cache_timeout)
+        return rows
+
+    def get_seek_q(self, ordering, values, nulls_largest=False):
+        """
+        Return the ``Q`` selecting the rows coming after ``values`` in
+        ``ordering``.
+
+        NULL values cannot be compared, they are selected with ``isnull``
+        lookups following the position of NULL in the ordering of the
+        database: after the other values in ascending order if
+        ``nulls_largest`` (PostgreSQL), before them otherwise (SQLite).
+        """
+        q = None
+        equal = Q()
+        for o, value in zip(ordering, values):
+            field = o.lstrip('-')
+            descending = o.startswith('-')
+            nulls_last = nulls_largest != descending
+            if value is None:
+                # NULL is first or last, only the other values may follow
+                after = None if nulls_last else Q(
+                    **{'%s__isnull' % field: False}
+                )
+                equal_q = Q(**{'%s__isnull' % field: True})
+            else:
+                after = Q(**{
+                    '%s__%s' % (field, 'lt' if descending else 'gt'): value
+                })
+                if nulls_last:
+                    after |= Q(**{'%s__isnull' % field: True})
+                equal_q = Q(**{field: value})
+            if after is not None:
+                q = equal & after if q is None else q | (equal & after)
+            equal &= equal_q
+        return Q(pk__in=[]) if q is None else q
+
+
+class DatatablesHasMorePagination(DatatablesLimitOffsetPagination):
+    """
+    Limit/offset pagination that does not count the filtered rows.
+
+    The page is fetched with one more row than requested, which tells
+    whether there is a next page: ``recordsFiltered`` is the number of
+    rows up to the end of the page, plus one if there are more, so that
+    Datatables enables the next page button. The filter backend skips
+    the filtered count, the exact one can be requested separately with
+    the ``count_only`` parameter. ``recordsFiltered`` is exact when the
+    request is not filtered.
+    """
+    datatables_count_filtered = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+                request.accepted_renderer.format != 'datatables'
+                or get_datatables_query(request).length is None
+        ):
+            return super(
+                DatatablesHasMorePagination, self
+            ).paginate_queryset(queryset, request, view)
+
+        self.is_datatable_request = True
+        self.limit_query_param = 'length'
+        self.offset_query_param = 'start'
+        self.limit = self.get_limit(request)
+        if self.limit is None:  # pragma: no cover
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+
+        queryset = self.plan_queryset(queryset, request, view)
+        rows = self.submit_page(queryset, view, self.offset, self.limit + 1)
+        with timed(request, view, 'page'):
+            if rows is None:
+                rows = list(queryset[self.offset:self.offset + self.limit + 1])
+            else:
+                rows = rows.result()
+        self.has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+
+        context = get_datatables_context(request)
+        self.count = context.filtered_count
+        if self.count is None:
+            self.count = self.offset + len(rows) + int(self.has_more)
+        self.total_count = context.total_count
+        if self.total_count is None:
+            self.total_count = self.count
+        return rows
+
+    def get_paginated_response(self, data):
+        response = super(
+            DatatablesHasMorePagination, self
+        ).get_paginated_response(data)
+        if self.is_datatable_request:
+            response.data['hasMore'] = self.has_more
+        return response
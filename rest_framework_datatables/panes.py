@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+from django.db.models import Case, Count, When
+
+from .query import get_datatables_query
+
+
+def get_search_panes(request, view):
+    """
+    Return an ``OrderedDict`` mapping the columns of the SearchPanes of
+    ``view`` (their ``data``) to the lookup paths they count and filter.
+
+    ``datatables_search_panes`` is either such a mapping, or a sequence of
+    columns whose lookup path is the first ``name`` of the requested column
+    with the same ``data``, or the ``data`` itself in dot notation.
+    """
+    panes = getattr(view, 'datatables_search_panes', None)
+    if not panes:
+        return OrderedDict()
+    if hasattr(panes, 'items'):
+        return OrderedDict(panes.items())
+    names = dict(
+        (col.data, col.name[0])
+        for col in get_datatables_query(request).columns
+    )
+    return OrderedDict(
+        (data, names.get(data) or data.replace('.', '__')) for data in panes
+    )
+
+
+def get_search_pane_options(queryset, filtered_queryset, panes,
+                            filtered=True):
+    """
+    Return the SearchPanes options of the ``panes`` (see
+    ``get_search_panes()``): for each column, the list of its values with
+    their number of rows in ``queryset`` (``total``) and in
+    ``filtered_queryset`` (``count``).
+
+    Each pane is counted by a single ``GROUP BY`` query over ``queryset``,
+    the filtered rows being selected by a subquery shared by all panes. If
+    ``filtered`` is ``False``, the rows of both querysets are the same and
+    the filtered counts are not computed.
+    """
+    queryset = queryset.order_by()
+    if filtered:
+        pks = filtered_queryset.order_by().values('pk')
+    options = OrderedDict()
+    for data, path in panes.items():
+        annotations = {'total': Count('pk', distinct=True)}
+        if filtered:
+            annotations['count'] = Count(
+                Case(When(pk__in=pks, then='pk')), distinct=True
+            )
+        rows = queryset.values(path).annotate(**annotations).order_by(path)
+        options[data] = [
+            OrderedDict([
+                ('label', row[path]),
+                ('value', row[path]),
+                ('total', row['total']),
+                ('count', row['count'] if filtered else row['total']),
+            ])
+            for row in rows if row[path] is not None
+        ]
+    return options
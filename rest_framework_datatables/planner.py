@@ -0,0 +1,228 @@
+from django.db.models.query import ModelIterable
+
+from rest_framework import serializers
+
+from .query import get_datatables_query
+from .utils import (
+    get_force_serialize, get_model_field, get_serializer_class
+)
+
+
+def get_field_sources(serializer):
+    """
+    Return the ``datatables_field_sources`` Meta option of ``serializer``: a
+    dict mapping field names to the model lookup paths read by fields that
+    have no source, like ``SerializerMethodField``.
+    """
+    meta = getattr(serializer, 'Meta', None)
+    return getattr(meta, 'datatables_field_sources', {})
+
+
+def get_serializer_paths(serializer, requested=None, prefix=''):
+    """
+    Yield ``(path, load)`` tuples for the model lookup paths read by the
+    fields of ``serializer`` (restricted to the ``requested`` field names if
+    given); ``load`` is ``True`` when the related object itself is needed,
+    and not only its primary key. The path is ``None`` for fields reading
+    unknown attributes.
+    """
+    sources = get_field_sources(serializer)
+    for name, field in serializer.fields.items():
+        if requested is not None and name not in requested:
+            continue
+        if getattr(field, 'write_only', False):
+            continue
+        if name in sources:
+            for path in sources[name]:
+                yield prefix + path.replace('.', '__'), True
+            continue
+        if field.source == '*':
+            if isinstance(field, serializers.Serializer):
+                for path in get_serializer_paths(field, None, prefix):
+                    yield path
+            else:
+                yield None, True
+            continue
+        path = prefix + field.source.replace('.', '__')
+        if isinstance(field, serializers.ListSerializer):
+            yield path, True
+            if isinstance(field.child, serializers.Serializer):
+                for child_path in get_serializer_paths(
+                        field.child, None, path + '__'
+                ):
+                    yield child_path
+        elif isinstance(field, serializers.Serializer):
+            yield path, True
+            for child_path in get_serializer_paths(field, None, path + '__'):
+                yield child_path
+        elif isinstance(field, serializers.ManyRelatedField):
+            yield path, not field.child_relation.use_pk_only_optimization()
+        elif isinstance(field, serializers.RelatedField):
+            yield path, not field.use_pk_only_optimization()
+        else:
+            yield path, True
+
+
+def plan_relations(model, paths):
+    """
+    Return the ``(select_related, prefetch_related)`` lookups needed to load
+    the ``(path, load)`` tuples of ``paths`` from ``model`` without extra
+    queries per row.
+    """
+    select_related = set()
+    prefetch_related = set()
+    for path, load in paths:
+        if path is None:
+            continue
+        parts = path.split('__')
+        current = model
+        multivalued = False
+        for i, part in enumerate(parts):
+            field = get_model_field(current, part) if current else None
+            if field is None or not field.is_relation:
+                break
+            if field.many_to_many or field.one_to_many:
+                multivalued = True
+            elif i == len(parts) - 1 and not load:
+                # only the foreign key value is needed
+                break
+            lookup = '__'.join(parts[:i + 1])
+            if field.related_model is None:
+                # generic foreign keys can only be prefetched
+                prefetch_related.add(lookup)
+                break
+            if multivalued:
+                prefetch_related.add(lookup)
+            else:
+                select_related.add(lookup)
+            current = field.related_model
+    return sorted(select_related), sorted(prefetch_related)
+
+
+def get_select_related(queryset):
+    """
+    Return the set of ``select_related`` lookups of ``queryset``, or ``None``
+    if it follows all the non-null foreign keys.
+    """
+    select_related = queryset.query.select_related
+    if select_related is True:
+        return None
+    lookups = set()
+    stack = [('', select_related or {})]
+    while stack:
+        prefix, related = stack.pop()
+        for name, children in related.items():
+            lookups.add(prefix + name)
+            stack.append((prefix + name + '__', children))
+    return lookups
+
+
+def plan_projection(model, paths, select_related=()):
+    """
+    Return the field names to pass to ``only()`` to load the ``(path,
+    load)`` tuples of ``paths`` from ``model``, or ``None`` if some of them
+    are not model fields. Fields of related models are only restricted for
+    the ``select_related`` relations.
+    """
+    names = set()
+    for path, load in paths:
+        if path is None:
+            return None
+        parts = path.split('__')
+        current = model
+        for i, part in enumerate(parts):
+            field = get_model_field(current, part)
+            if field is None:
+                return None
+            if not field.is_relation:
+                names.add('__'.join(parts[:i] + [field.name]))
+                break
+            if not field.concrete or field.many_to_many:
+                # reverse and many-to-many relations are loaded by separate
+                # queries that only need the primary key
+                break
+            lookup = '__'.join(parts[:i + 1])
+            names.add(lookup)
+            if lookup not in select_related:
+                break
+            current = field.related_model
+    return sorted(names)
+
+
+class QueryPlanner(object):
+    """
+    Optimize the page queryset of a datatables request.
+
+    ``plan_relations`` adds ``select_related`` and ``prefetch_related``
+    lookups for the relations used by the requested columns and the
+    serializer fields they display. ``project`` restricts the selected
+    columns with ``only()`` to the ones read by the serializer.
+    """
+    def __init__(self, plan_relations=True, project=False):
+        self.plan_relations = plan_relations
+        self.project = project
+
+    def get_serializer(self, view):
+        if hasattr(view, 'get_serializer'):
+            return view.get_serializer()
+        serializer_class = get_serializer_class(view)
+        if serializer_class is None:
+            return None
+        return serializer_class()
+
+    def get_paths(self, request, serializer):
+        query = get_datatables_query(request)
+        paths = [(name, False) for col in query.columns for name in col.name]
+        if serializer is not None:
+            force_serialize = get_force_serialize(serializer.__class__)
+            requested = set(
+                name for name in serializer.fields
+                if query.is_requested(name, force_serialize)
+            )
+            paths.extend(get_serializer_paths(serializer, requested))
+        return paths
+
+    def plan(self, queryset, request, view):
+        if queryset._iterable_class is not ModelIterable:
+            # values() querysets have no related objects to load
+            return queryset
+        serializer = self.get_serializer(view)
+        if self.plan_relations:
+            select_related, prefetch_related = plan_relations(
+                queryset.model, self.get_paths(request, serializer)
+            )
+            if select_related:
+                queryset = queryset.select_related(*select_related)
+            if prefetch_related:
+                queryset = queryset.prefetch_related(*prefetch_related)
+        if self.project and serializer is not None:
+            queryset = self.project_queryset(queryset, serializer)
+        return queryset
+
+    def project_queryset(self, queryset, serializer):
+        select_related = get_select_related(queryset)
+        if select_related is None:
+            # select_related() without arguments follows unknown relations
+            return queryset
+        # unless the serializer uses DatatablesFieldsMixin, it reads all
+        # its fields, even the ones removed from the response afterwards.
+        only = plan_projection(
+            queryset.model, get_serializer_paths(serializer), select_related
+        )
+        if only is None:
+            return queryset
+        return queryset.only(*only)
+
+
+def plan_queryset(queryset, request, view):
+    """
+    Return ``queryset`` with the related objects used by the requested
+    columns loaded in bulk (``datatables_plan_relations``) and the selected
+    columns restricted to the serialized ones (``datatables_project_columns``)
+    if ``view`` enables it.
+    """
+    relations = getattr(view, 'datatables_plan_relations', False)
+    project = getattr(view, 'datatables_project_columns', False)
+    if not relations and not project:
+        return queryset
+    return QueryPlanner(relations, project).plan(queryset, request, view)
@@ -0,0 +1,192 @@
+import re
+
+from .context import get_datatables_context
+
+
+_param_re = re.compile(
+    r'^(columns|order)\[(\d+)\]\[(\w+)\](?:\[(\w+)\])?$'
+)
+_pane_re = re.compile(r'^searchPanes\[(.+)\]\[(\d+)\]$')
+_params = (
+    'draw', 'start', 'length', 'search[value]', 'search[regex]', 'keep',
+    'extra_json', 'count_only',
+)
+
+
+def _to_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class DatatablesColumn(object):
+    """
+    A column of a Datatables request.
+
+    ``name`` is the list of lookup paths built from the ``name`` parameter
+    (or ``data`` if ``name`` is empty), with dot notation replaced by
+    double-underscores and split along the commas.
+    """
+    __slots__ = (
+        'data', 'name', 'searchable', 'orderable', 'search_value',
+        'search_regex',
+    )
+
+    def __init__(self, params):
+        self.data = params['data']
+        name = params.get('name') or self.data
+        self.name = [n.lstrip() for n in name.replace('.', '__').split(',')]
+        self.searchable = params.get('searchable') == 'true'
+        self.orderable = params.get('orderable') == 'true'
+        self.search_value = params.get('search][value')
+        self.search_regex = params.get('search][regex') == 'true'
+
+
+class DatatablesQuery(object):
+    """
+    The parameters of a Datatables server-side processing request, parsed
+    in a single pass over the query parameters.
+    """
+    __slots__ = (
+        'draw', 'start', 'length', 'search_value', 'search_regex',
+        'columns', 'order', 'keep', 'extra_json', 'count_only',
+        'search_panes', '_column_keys',
+    )
+
+    def __init__(self, query_params):
+        self.draw = 1
+        self.start = 0
+        self.length = None
+        self.search_value = None
+        self.search_regex = False
+        self.keep = ()
+        self.extra_json = ()
+        self.count_only = False
+        columns = {}
+        order = {}
+        panes = {}
+        for key, value in query_params.items():
+            match = _param_re.match(key) if key[:1] in ('c', 'o') else None
+            if match is not None:
+                kind, index, attr, sub = match.groups()
+                params = (columns if kind == 'columns' else order).setdefault(
+                    int(index), {}
+                )
+                params[attr if sub is None else '%s][%s' % (attr, sub)] = value
+            elif key == 'draw':
+                self.draw = _to_int(value, 1)
+            elif key == 'start':
+                self.start = _to_int(value, 0)
+            elif key == 'length':
+                self.length = _to_int(value, 0)
+            elif key == 'search[value]':
+                self.search_value = value
+            elif key == 'search[regex]':
+                self.search_regex = value == 'true'
+            elif key == 'keep':
+                self.keep = tuple(k.strip() for k in value.split(','))
+            elif key == 'extra_json':
+                self.extra_json = tuple(k.strip() for k in value.split(','))
+            elif key == 'count_only':
+                self.count_only = value == 'true'
+            elif key.startswith('searchPanes['):
+                match = _pane_re.match(key)
+                if match is not None:
+                    panes.setdefault(match.group(1), {})[
+                        int(match.group(2))
+                    ] = value
+
+        # like Datatables, stop at the first missing index
+        self.columns = []
+        i = 0
+        while 'data' in columns.get(i, ()):
+            self.columns.append(DatatablesColumn(columns[i]))
+            i += 1
+        self.order = []
+        i = 0
+        while 'column' in order.get(i, ()):
+            self.order.append((
+                _to_int(order[i]['column'], -1),
+                order[i].get('dir', 'asc')
+            ))
+            i += 1
+
+        # the selected values of each SearchPanes column, in index order
+        self.search_panes = dict(
+            (data, [values[i] for i in sorted(values)])
+            for data, values in panes.items()
+        )
+
+        self._column_keys = None
+
+    @property
+    def column_keys(self):
+        """
+        The top level keys of the serialized data requested by the columns.
+        """
+        if self._column_keys is None:
+            self._column_keys = set(
+                col.data.split('.')[0] for col in self.columns
+            )
+        return self._column_keys
+
+    def normalize(self):
+        """
+        Return a hashable representation of the parameters, ``draw``
+        excepted, that is equal for equivalent requests.
+        """
+        return (
+            self.start, self.length, self.search_value, self.search_regex,
+            tuple(
+                (col.data, tuple(col.name), col.searchable, col.orderable,
+                 col.search_value, col.search_regex)
+                for col in self.columns
+            ),
+            tuple(self.order),
+            tuple(sorted(self.keep)),
+            tuple(sorted(self.extra_json)),
+            self.count_only,
+            tuple(sorted(
+                (data, tuple(sorted(values)))
+                for data, values in self.search_panes.items()
+            )),
+        )
+
+    def is_requested(self, key, force_serialize=()):
+        """
+        Return ``True`` if the serialized ``key`` must be part of the
+        response: it is used by a column, is a ``DT_Row*`` key, is forced
+        by ``datatables_always_serialize`` (``force_serialize``) or by the
+        ``keep`` parameter. All keys are requested when there is no column.
+        """
+        return (
+            not self.columns
+            or key in self.column_keys
+            or key.startswith('DT_Row')
+            or key in force_serialize
+            or key in self.keep
+        )
+
+
+def is_datatables_param(key):
+    """
+    Return ``True`` if the query parameter ``key`` is a Datatables
+    parameter.
+    """
+    return (
+        key in _params
+        or _param_re.match(key) is not None
+        or _pane_re.match(key) is not None
+    )
+
+
+def get_datatables_query(request):
+    """
+    Return the parsed Datatables parameters of ``request``, they are only
+    parsed once per request.
+    """
+    context = get_datatables_context(request)
+    if context.query is None:
+        context.query = DatatablesQuery(request.query_params)
+    return context.query
@@ -1,5 +1,26 @@
+from collections import OrderedDict
+
 from rest_framework.renderers import JSONRenderer
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+try:
+    from asyncio import iscoroutinefunction
+    from asgiref.sync import async_to_sync
+except ImportError:  # pragma: no cover
+    async_to_sync = None
+
+    def iscoroutinefunction(func):
+        return False
+
+from .budget import check_query_budget
+from .context import get_datatables_context
+from .query import get_datatables_query
+from .timing import finish_timings, get_timings, timed
+from .utils import get_force_serialize, get_serializer_class
+
 
 class DatatablesRenderer(JSONRenderer):
     media_type = 'application/json'
@@ -16,6 +37,11 @@ class DatatablesRenderer(JSONRenderer):
         new_data = {}
 
         view = renderer_context.get('view')
+        timings = get_timings(request, view)
+        if timings is not None:
+            # the view serialized the page since the end of the pagination
+            timings.add_gap('serialize')
+            check_query_budget(view, timings)
 
         if 'recordsTotal' not in data:
             # pagination was not used, let's fix the data dict
@@ -26,10 +52,11 @@ class DatatablesRenderer(JSONRenderer):
                 results = data
                 count = len(results)
             new_data['data'] = results
-            if view and hasattr(view, '_datatables_filtered_count'):
-                count = view._datatables_filtered_count
-            if view and hasattr(view, '_datatables_total_count'):
-                total_count = view._datatables_total_count
+            context = get_datatables_context(request)
+            if context.filtered_count is not None:
+                count = context.filtered_count
+            if context.total_count is not None:
+                total_count = context.total_count
             else:
                 total_count = count
             new_data['recordsFiltered'] = count
@@ -37,66 +64,196 @@ class DatatablesRenderer(JSONRenderer):
         else:
             new_data = data
         # add datatables "draw" parameter
-        new_data['draw'] = int(request.query_params.get('draw', '1'))
+        new_data['draw'] = get_datatables_query(request).draw
+        search_panes = get_datatables_context(request).search_panes
+        if search_panes is not None:
+            new_data['searchPanes'] = {'options': search_panes}
 
-        serializer_class = None
-        if hasattr(view, 'get_serializer_class'):
-            serializer_class = view.get_serializer_class()
-        elif hasattr(view, 'serializer_class'):
-            serializer_class = view.serializer_class
+        force_serialize = get_force_serialize(get_serializer_class(view))
 
-        if serializer_class is not None and hasattr(serializer_class, 'Meta'):
-            force_serialize = getattr(
-                serializer_class.Meta, 'datatables_always_serialize', ()
+        with timed(request, view, 'prune'):
+            self._filter_unused_fields(request, new_data, force_serialize)
+
+        extra_json_funcs = self._get_extra_json_funcs(view)
+
+        with timed(request, view, 'extra_json'):
+            self._filter_extra_json(
+                view, new_data, extra_json_funcs,
+                get_datatables_context(request).extra_json
             )
-        else:
-            force_serialize = ()
 
-        self._filter_unused_fields(request, new_data, force_serialize)
+        with timed(request, view, 'encode'):
+            ret = self._encode_response(
+                new_data, accepted_media_type, renderer_context
+            )
+        finish_timings(request, view, renderer_context.get('response'))
+        return ret
 
-        if hasattr(view.__class__, 'Meta'):
-            extra_json_funcs = getattr(
-                view.__class__.Meta, 'datatables_extra_json', ()
+    def render_stream(self, rows, renderer_context, chunk_size=100):
+        """
+        Return an iterator over the response for the serialized ``rows``
+        as JSON encoded chunks of ``chunk_size`` rows, without holding all
+        of them in memory. ``recordsFiltered`` (and ``recordsTotal`` if it
+        is not known) are written after the rows, counting them if needed.
+
+        The other keys, like the extra JSON, are computed and checked
+        before returning, so that errors are raised before the response
+        starts; only the rows are fetched while iterating.
+        """
+        request = renderer_context['request']
+        view = renderer_context.get('view')
+        context = get_datatables_context(request)
+        query = get_datatables_query(request)
+
+        header = OrderedDict([('draw', query.draw)])
+        if context.total_count is not None:
+            header['recordsTotal'] = context.total_count
+        if context.search_panes is not None:
+            header['searchPanes'] = {'options': context.search_panes}
+        reserved = set(header.keys())
+        with timed(request, view, 'extra_json'):
+            self._filter_extra_json(
+                view, header, self._get_extra_json_funcs(view),
+                context.extra_json
             )
-        else:
-            extra_json_funcs = ()
+        for key in ('data', 'recordsFiltered', 'recordsTotal'):
+            if key in header and key not in reserved:
+                raise ValueError("Duplicate key found: {key}".format(key=key))
+        # the header object is left open to append the rows to it
+        head = self._encode(header, renderer_context)[:-1] + b',"data":['
+        return self._stream_rows(head, rows, renderer_context, chunk_size)
+
+    def _stream_rows(self, head, rows, renderer_context, chunk_size):
+        request = renderer_context['request']
+        view = renderer_context.get('view')
+        context = get_datatables_context(request)
+        query = get_datatables_query(request)
+        force_serialize = get_force_serialize(get_serializer_class(view))
+
+        yield head
+        count = 0
+        chunk = []
+        requested = {}
+        # the rows are fetched, serialized and encoded as they are sent
+        with timed(request, view, 'stream'):
+            for row in rows:
+                self._filter_unused_row(
+                    query, row, force_serialize, requested
+                )
+                chunk.append(self._encode(row, renderer_context))
+                count += 1
+                if len(chunk) == chunk_size:
+                    yield (
+                        (b',' if count > chunk_size else b'')
+                        + b','.join(chunk)
+                    )
+                    chunk = []
+            if chunk:
+                yield (b',' if count > len(chunk) else b'') + b','.join(chunk)
 
-        self._filter_extra_json(view, new_data, extra_json_funcs)
+        trailer = OrderedDict([(
+            'recordsFiltered',
+            count if context.filtered_count is None
+            else context.filtered_count
+        )])
+        if context.total_count is None:
+            trailer['recordsTotal'] = trailer['recordsFiltered']
+        # the headers are already sent, there is no Server-Timing
+        finish_timings(request, view)
+        yield b'],' + self._encode(trailer, renderer_context)[1:]
 
+    def _encode_response(self, data, accepted_media_type, renderer_context):
         return super(DatatablesRenderer, self).render(
-            new_data, accepted_media_type, renderer_context
+            data, accepted_media_type, renderer_context
         )
 
+    def _encode(self, data, renderer_context):
+        return self._encode_response(data, None, renderer_context)
+
+    def _get_extra_json_funcs(self, view):
+        if hasattr(view.__class__, 'Meta'):
+            return getattr(view.__class__.Meta, 'datatables_extra_json', ())
+        return ()
+
     def _filter_unused_fields(self, request, result, force_serialize):
-        # list of params to keep, triggered by ?keep= and can be comma
-        # separated.
-        keep = request.query_params.get('keep', [])
-        cols = []
-        i = 0
-        while True:
-            col = request.query_params.get('columns[%d][data]' % i)
-            if col is None:
-                break
-            cols.append(col.split('.').pop(0))
-            i += 1
-        if len(cols):
-            data = result['data']
-            for i, item in enumerate(data):
-                try:
-                    keys = set(item.keys())
-                except AttributeError:
-                    continue
-                for k in keys:
-                    if (
-                            k not in cols
-                            and not k.startswith('DT_Row')
-                            and k not in force_serialize
-                            and k not in keep
-                    ):
-                        result['data'][i].pop(k)
-
-    def _filter_extra_json(self, view, result, extra_json_funcs):
+        query = get_datatables_query(request)
+        if len(query.columns):
+            requested = {}
+            for item in result['data']:
+                self._filter_unused_row(
+                    query, item, force_serialize, requested
+                )
+
+    def _filter_unused_row(self, query, item, force_serialize,
+                           requested=None):
+        """
+        Remove the keys of ``item`` that were not requested, remembering
+        the decision for each key in the ``requested`` dict if given, as
+        the rows usually all have the same keys.
+        """
+        if not len(query.columns):
+            return
+        try:
+            keys = list(item.keys())
+        except AttributeError:
+            return
+        for k in keys:
+            if requested is None:
+                keep = query.is_requested(k, force_serialize)
+            else:
+                keep = requested.get(k)
+                if keep is None:
+                    keep = requested[k] = query.is_requested(
+                        k, force_serialize
+                    )
+            if not keep:
+                item.pop(k)
+
+    def _filter_extra_json(self, view, result, extra_json_funcs,
+                           extra_json=None):
+        """
+        Add the ``(key, value)`` pairs returned by the ``extra_json_funcs``
+        view methods to ``result``, or the ``extra_json`` pairs if they
+        were already computed (by an async view).
+        """
         read_only_keys = result.keys()  # don't alter anything
+        if extra_json is None:
+            extra_json = [
+                call() for call in self._get_extra_json_calls(
+                    view, extra_json_funcs
+                )
+            ]
+        for key, val in extra_json:
+            if key in read_only_keys:
+                raise ValueError("Duplicate key found: {key}".format(key=key))
+            result[key] = val
+
+    def _get_extra_json_calls(self, view, extra_json_funcs):
+        """
+        Return the ``extra_json_funcs`` view methods as functions that can
+        be called from synchronous code, even if they are coroutines.
+        """
+        return [
+            async_to_sync(method) if iscoroutinefunction(method) else method
+            for method in self._get_extra_json_methods(view, extra_json_funcs)
+        ]
+
+    def _get_extra_json_methods(self, view, extra_json_funcs):
+        """
+        Return the ``extra_json_funcs`` view methods to call for this draw,
+        skipping the ``datatables_extra_json_on_demand`` ones unless it is
+        the first draw or the client asks for them with the ``extra_json``
+        parameter (and all of them if only the counts are requested), and
+        reading the ``datatables_extra_json_cache`` ones from the cache.
+        """
+        request = getattr(view, 'request', None)
+        query = None if request is None else get_datatables_query(request)
+        if query is not None and query.count_only:
+            return []
+        meta = getattr(view.__class__, 'Meta', None)
+        on_demand = getattr(meta, 'datatables_extra_json_on_demand', ())
+        extra_json_cache = getattr(meta, 'datatables_extra_json_cache', {})
+        methods = []
         for func in extra_json_funcs:
             if not hasattr(view, func):
                 raise TypeError(
@@ -107,7 +264,70 @@ class DatatablesRenderer(JSONRenderer):
                 raise TypeError(
                     "extra_json_funcs: {0} not callable.".format(func)
                 )
-            key, val = method()
-            if key in read_only_keys:
-                raise ValueError("Duplicate key found: {key}".format(key=key))
-            result[key] = val
+            if func in on_demand and query is not None:
+                if query.draw != 1 and func not in query.extra_json:
+                    # the client kept the result of the first draw
+                    continue
+            cache = extra_json_cache.get(func)
+            if cache is not None:
+                if iscoroutinefunction(method):
+                    method = async_to_sync(method)
+                method = cache.wrap(view, func, method)
+            methods.append(method)
+        return methods
+
+
+class DatatablesORJSONRenderer(DatatablesRenderer):
+    """
+    Datatables renderer encoding the response with orjson if it is
+    installed, and like ``DatatablesRenderer`` otherwise.
+
+    The values orjson does not handle natively, including dates and times,
+    are converted by the encoder of the JSON renderer, so that both
+    renderers return the same JSON. Indented, ASCII only or non compact
+    responses (see the ``UNICODE_JSON`` and ``COMPACT_JSON`` settings) are
+    left to the JSON renderer.
+    """
+    def _filter_unused_fields(self, request, result, force_serialize):
+        query = get_datatables_query(request)
+        if orjson is None or not len(query.columns):
+            return super(DatatablesORJSONRenderer, self)._filter_unused_fields(
+                request, result, force_serialize
+            )
+        # the rows are rebuilt with the requested keys only, which is
+        # faster than removing the others, the keys to keep being computed
+        # once per set of keys as the rows usually all have the same.
+        kept = {}
+        rows = []
+        for item in result['data']:
+            if not isinstance(item, dict):
+                return
+            keys = tuple(item)
+            requested = kept.get(keys)
+            if requested is None:
+                requested = kept[keys] = [
+                    k for k in keys if query.is_requested(k, force_serialize)
+                ]
+            rows.append({k: item[k] for k in requested})
+        result['data'] = rows
+
+    def _encode_response(self, data, accepted_media_type, renderer_context):
+        if (
+                orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super(DatatablesORJSONRenderer, self)._encode_response(
+                data, accepted_media_type, renderer_context
+            )
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+        # like the JSON renderer, escape the characters that are valid in
+        # JSON but not in javascript, without copying the output if there
+        # are none
+        if b'\xe2\x80\xa8' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028')
+        if b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,140 @@
+import re
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+
+class BaseSearchEngine(object):
+    """
+    Base class for the engines handling the global Datatables search box.
+
+    Engines only handle plain (non-regex) searches, regex searches always
+    use the per-column lookups of the filter backend.
+    """
+    def filter_queryset(self, queryset, search_value, search_fields):
+        """
+        Return ``queryset`` filtered by ``search_value`` over the
+        ``search_fields`` lookup paths.
+        """
+        raise NotImplementedError(  # pragma: no cover
+            '%s must implement filter_queryset()' % self.__class__.__name__
+        )
+
+
+class PostgresFullTextSearch(BaseSearchEngine):
+    """
+    Full text search with PostgreSQL ``SearchVector``/``SearchQuery``.
+
+    If ``vector_field`` is given, it must be the name of a stored
+    ``SearchVectorField`` (ideally indexed with GIN) used instead of
+    computing the document from the search fields on every request.
+    """
+    def __init__(self, config=None, vector_field=None, search_type='plain'):
+        self.config = config
+        self.vector_field = vector_field
+        self.search_type = search_type
+
+    def get_search_query(self, search_value):
+        from django.contrib.postgres.search import SearchQuery
+
+        kwargs = {'config': self.config}
+        if self.search_type != 'plain':
+            kwargs['search_type'] = self.search_type
+        return SearchQuery(search_value, **kwargs)
+
+    def filter_queryset(self, queryset, search_value, search_fields):
+        from django.contrib.postgres.search import SearchVector
+
+        search_query = self.get_search_query(search_value)
+        if self.vector_field:
+            return queryset.filter(**{self.vector_field: search_query})
+        # the document is computed in a subquery: selected by ``queryset``,
+        # it would differ for each row joined through a multi-valued search
+        # field, and the rows could not be made distinct anymore.
+        matching = queryset.model._base_manager.annotate(
+            _datatables_document=SearchVector(
+                *search_fields, config=self.config
+            )
+        ).filter(_datatables_document=search_query)
+        return queryset.filter(pk__in=matching.values('pk'))
+
+
+class SQLiteFTS5Search(BaseSearchEngine):
+    """
+    Full text search with a SQLite FTS5 table, for local and development
+    setups.
+
+    The FTS5 table stores one row per model instance, with the instance
+    primary key as ``rowid``; it must be created with ``create_table()``
+    and filled with ``rebuild()``.
+    """
+    def __init__(self, table=None, prefix=True):
+        self.table = table
+        self.prefix = prefix
+
+    def get_table(self, model):
+        return self.table or '%s_fts' % model._meta.db_table
+
+    def get_column(self, search_field):
+        return search_field.replace('__', '_')
+
+    def create_table(self, model, search_fields, using='default'):
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5(%s)' % (
+                    qn(self.get_table(model)),
+                    ', '.join(
+                        qn(self.get_column(f)) for f in search_fields
+                    )
+                )
+            )
+
+    def rebuild(self, queryset, search_fields):
+        connection = connections[queryset.db]
+        qn = connection.ops.quote_name
+        table = qn(self.get_table(queryset.model))
+        insert = 'INSERT INTO %s (rowid, %s) VALUES (%s)' % (
+            table,
+            ', '.join(qn(self.get_column(f)) for f in search_fields),
+            ', '.join(['%s'] * (len(search_fields) + 1))
+        )
+        # multi-valued relations return one row per related object, their
+        # values are concatenated into a single document.
+        documents = OrderedDict()
+        rows = queryset.order_by().values_list('pk', *search_fields)
+        for row in rows.iterator():
+            document = documents.setdefault(
+                row[0], [[] for f in search_fields]
+            )
+            for values, value in zip(document, row[1:]):
+                if value is not None and '%s' % value not in values:
+                    values.append('%s' % value)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % table)
+            cursor.executemany(insert, [
+                [pk] + [' '.join(values) for values in document]
+                for pk, document in documents.items()
+            ])
+
+    def get_match_query(self, search_value):
+        # every word must match, as a quoted FTS5 string so that the user
+        # input is never interpreted as FTS5 query syntax.
+        terms = []
+        for word in re.findall(r'\w+', search_value, re.UNICODE):
+            terms.append('"%s"%s' % (word, '*' if self.prefix else ''))
+        return ' '.join(terms)
+
+    def filter_queryset(self, queryset, search_value, search_fields):
+        match = self.get_match_query(search_value)
+        if not match:
+            return queryset
+        table = connections[queryset.db].ops.quote_name(
+            self.get_table(queryset.model)
+        )
+        return queryset.filter(pk__in=RawSQL(
+            'SELECT rowid FROM %s WHERE %s MATCH %%s' % (table, table),
+            [match]
+        ))
@@ -0,0 +1,38 @@
+from collections import OrderedDict
+
+from rest_framework import serializers
+
+from .query import get_datatables_query
+from .utils import get_force_serialize
+
+
+class DatatablesFieldsMixin(object):
+    """
+    Serializer mixin removing the fields that are not requested by a
+    datatables request (columns, ``keep`` parameter,
+    ``datatables_always_serialize`` and ``DT_Row*`` fields) before
+    serialization, so that they are never evaluated.
+
+    Only the top level serializer is restricted, nested serializers are
+    serialized as a whole.
+    """
+    def get_fields(self):
+        fields = super(DatatablesFieldsMixin, self).get_fields()
+        request = self.context.get('request')
+        if request is None or not self.is_datatables_root():
+            return fields
+        renderer = getattr(request, 'accepted_renderer', None)
+        if getattr(renderer, 'format', None) != 'datatables':
+            return fields
+        query = get_datatables_query(request)
+        force_serialize = get_force_serialize(self.__class__)
+        return OrderedDict(
+            (name, field) for name, field in fields.items()
+            if query.is_requested(name, force_serialize)
+        )
+
+    def is_datatables_root(self):
+        parent = getattr(self, 'parent', None)
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
@@ -0,0 +1,73 @@
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+
+from .planner import plan_queryset
+
+
+class DatatablesStreamingMixin(object):
+    """
+    View mixin streaming the unpaginated responses of datatables draws,
+    like the ones requested with ``length=-1``.
+
+    Rows are read from the database with ``iterator()`` in chunks of
+    ``datatables_stream_chunk_size`` rows, serialized and pruned one at a
+    time and written as incremental JSON by the renderer, so that the
+    memory used does not grow with the number of rows.
+    """
+    datatables_stream_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if (
+                renderer.format != 'datatables'
+                or not hasattr(renderer, 'render_stream')
+        ):
+            return super(DatatablesStreamingMixin, self).list(
+                request, *args, **kwargs
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        rows = self.iter_datatables_rows(
+            plan_queryset(queryset, request, self), serializer
+        )
+        return StreamingHttpResponse(
+            renderer.render_stream(rows, self.get_renderer_context()),
+            content_type=renderer.media_type
+        )
+
+    def iter_datatables_rows(self, queryset, serializer):
+        """
+        Yield the serialized rows of ``queryset``.
+        """
+        chunk_size = self.datatables_stream_chunk_size
+        child = getattr(serializer, 'child', serializer)
+        lookups = queryset._prefetch_related_lookups
+        if lookups:
+            # iterator() ignores prefetch_related() before Django 4.1, the
+            # lookups are prefetched for each chunk instead.
+            queryset = queryset.prefetch_related(None)
+        try:
+            instances = queryset.iterator(chunk_size=chunk_size)
+        except TypeError:  # pragma: no cover
+            # Django < 2.0
+            instances = queryset.iterator()
+        chunk = []
+        for instance in instances:
+            chunk.append(instance)
+            if len(chunk) == chunk_size:
+                for row in self._serialize_chunk(chunk, child, lookups):
+                    yield row
+                chunk = []
+        for row in self._serialize_chunk(chunk, child, lookups):
+            yield row
+
+    def _serialize_chunk(self, chunk, child, lookups):
+        if lookups:
+            prefetch_related_objects(chunk, *lookups)
+        for instance in chunk:
+            yield child.to_representation(instance)
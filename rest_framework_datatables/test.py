@@ -0,0 +1,58 @@
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIRequestFactory
+
+from .budget import get_query_shape
+
+
+class DatatablesTestCaseMixin(object):
+    """
+    ``TestCase`` mixin with assertions on the queries of datatables draws.
+    """
+    def get_draw_view(self, view, **initkwargs):
+        if not hasattr(view, 'as_view'):
+            return view
+        if hasattr(view, 'get_extra_actions'):
+            # viewsets need their actions
+            return view.as_view({'get': 'list'}, **initkwargs)
+        return view.as_view(**initkwargs)
+
+    def draw(self, view, query='', **initkwargs):
+        """
+        Return the rendered response of the datatables draw of ``view`` (a
+        view class or function) for the ``query`` string.
+        """
+        request = APIRequestFactory().get(
+            '/?format=datatables&' + query.lstrip('?&')
+        )
+        response = self.get_draw_view(view, **initkwargs)(request)
+        if hasattr(response, 'render'):
+            response.render()
+        elif getattr(response, 'streaming', False):
+            response.streaming_content = [b''.join(response)]
+        return response
+
+    def assertDrawQueries(self, num, view, query='', using=DEFAULT_DB_ALIAS,
+                          **initkwargs):
+        """
+        Assert that the datatables draw of ``view`` for the ``query``
+        string runs ``num`` queries, listing the repeated query shapes if
+        it does not. Return the response.
+        """
+        with CaptureQueriesContext(connections[using]) as context:
+            response = self.draw(view, query, **initkwargs)
+        statements = [q['sql'] for q in context.captured_queries]
+        if len(statements) != num:
+            shapes = Counter(get_query_shape(sql) for sql in statements)
+            self.fail('%d queries executed, %d expected\n%s' % (
+                len(statements), num, '\n'.join(
+                    '%d. %s%s' % (
+                        i, sql, '' if shapes[get_query_shape(sql)] == 1
+                        else ' (%d similar)' % shapes[get_query_shape(sql)]
+                    ) for i, sql in enumerate(statements, start=1)
+                )
+            ))
+        return response
@@ -0,0 +1,213 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import local
+
+try:
+    from time import monotonic
+except ImportError:  # pragma: no cover
+    from time import time as monotonic
+
+from django.core.signals import request_finished
+from django.db import connections
+from django.dispatch import Signal
+
+from .context import get_datatables_context
+
+
+#: Sent when a timed datatables draw is rendered, with the ``request``,
+#: the ``view`` and its ``timings`` (a ``DrawTimings``).
+draw_timed = Signal()
+
+
+class _QueryCounter(object):
+    """
+    Database execute wrapper counting the queries of a draw.
+    """
+    def __init__(self, timings):
+        self.timings = timings
+
+    def __call__(self, execute, sql, params, many, context):
+        self.timings.queries += 1
+        if self.timings.statements is not None:
+            self.timings.statements.append(sql)
+        return execute(sql, params, many, context)
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_null_phase = _NullPhase()
+
+# the timings whose counters wrap the connections of the thread
+_active = local()
+
+
+class DrawTimings(object):
+    """
+    The duration and the number of queries of the phases of a datatables
+    draw, measured with a monotonic clock.
+
+    ``phases`` maps the phase names, in the order they ran, to
+    ``(milliseconds, queries)`` tuples; ``queries`` is ``None`` if they
+    cannot be counted. The time spent by the view between the pagination
+    and the rendering is recorded as the ``serialize`` phase.
+
+    With ``record_statements``, the SQL of the queries of each phase is
+    also kept, see ``get_statements()``.
+    """
+    def __init__(self, record_statements=False):
+        self.phases = OrderedDict()
+        self.statements = [] if record_statements else None
+        self.phase_statements = {}
+        self.queries = 0
+        self.start = self.last = monotonic()
+        self.last_queries = 0
+        self.total = None
+        self.counter = _QueryCounter(self)
+        self.wrapped = []
+        for connection in connections.all():
+            wrappers = getattr(connection, 'execute_wrappers', None)
+            if wrappers is None:  # pragma: no cover
+                # Django < 2.0
+                continue
+            # counters left by draws that did not finish
+            wrappers[:] = [
+                w for w in wrappers if not isinstance(w, _QueryCounter)
+            ]
+            wrappers.append(self.counter)
+            self.wrapped.append(wrappers)
+        _active.timings = self
+
+    def add(self, name, seconds, first_query):
+        """
+        Record the ``name`` phase, that lasted ``seconds`` and ran the
+        queries from the ``first_query`` index.
+        """
+        queries = self.queries - first_query
+        if not self.wrapped:  # pragma: no cover
+            queries = None
+        if self.statements is not None:
+            self.phase_statements.setdefault(name, []).extend(
+                self.statements[first_query:]
+            )
+        ms, count = self.phases.get(name, (0, 0))
+        self.phases[name] = (
+            ms + seconds * 1000,
+            None if queries is None else count + queries
+        )
+        self.last = monotonic()
+        self.last_queries = self.queries
+
+    @contextmanager
+    def phase(self, name):
+        start, queries = monotonic(), self.queries
+        try:
+            yield
+        finally:
+            self.add(name, monotonic() - start, queries)
+
+    def add_gap(self, name):
+        """
+        Record the time and the queries since the end of the last phase as
+        the ``name`` phase.
+        """
+        self.add(name, monotonic() - self.last, self.last_queries)
+
+    def get_statements(self, name):
+        """
+        Return the SQL of the queries of the ``name`` phase, if they are
+        recorded.
+        """
+        return self.phase_statements.get(name, [])
+
+    def finish(self):
+        if self.total is None:
+            self.total = (monotonic() - self.start) * 1000
+            for wrappers in self.wrapped:
+                if self.counter in wrappers:
+                    wrappers.remove(self.counter)
+            if getattr(_active, 'timings', None) is self:
+                _active.timings = None
+
+    def server_timing(self):
+        """
+        Return the value of the ``Server-Timing`` header.
+        """
+        metrics = []
+        for name, (ms, queries) in self.phases.items():
+            metric = '%s;dur=%.2f' % (name, ms)
+            if queries:
+                metric += ';desc="%d %s"' % (
+                    queries, 'query' if queries == 1 else 'queries'
+                )
+            metrics.append(metric)
+        metrics.append('total;dur=%.2f' % self.total)
+        return ', '.join(metrics)
+
+
+def get_timings(request, view):
+    """
+    Return the timings of the draw of ``request``, starting them if the
+    ``datatables_timing`` or ``datatables_query_budget`` options of
+    ``view`` are set, or ``None``.
+    """
+    context = get_datatables_context(request)
+    if context.timings is None:
+        budget = getattr(view, 'datatables_query_budget', None)
+        if budget is not None or getattr(view, 'datatables_timing', False):
+            context.timings = DrawTimings(record_statements=budget is not None)
+    return context.timings
+
+
+def timed(request, view, name):
+    """
+    Return a context manager timing the ``name`` phase of the draw of
+    ``request`` if the view is timed, doing nothing otherwise.
+    """
+    timings = get_timings(request, view)
+    if timings is None:
+        return _null_phase
+    return timings.phase(name)
+
+
+def release_timings(**kwargs):
+    """
+    Stop the timings of the draw run by the current thread if it did not
+    finish, like a draw that raised an exception, so that its counters do
+    not count the next queries. It runs at the end of each request.
+    """
+    timings = getattr(_active, 'timings', None)
+    if timings is not None:
+        timings.finish()
+
+
+request_finished.connect(
+    release_timings, dispatch_uid='rest_framework_datatables_timings'
+)
+
+
+def finish_timings(request, view, response=None):
+    """
+    Stop the timings of the draw of ``request``, send ``draw_timed`` and
+    add the ``Server-Timing`` header to ``response`` if the
+    ``datatables_server_timing`` option of ``view`` is set.
+    """
+    timings = get_datatables_context(request).timings
+    if timings is None or timings.total is not None:
+        return
+    timings.finish()
+    if not getattr(view, 'datatables_timing', False):
+        return
+    draw_timed.send(
+        sender=view.__class__, request=request, view=view, timings=timings
+    )
+    if (
+            response is not None
+            and getattr(view, 'datatables_server_timing', False)
+    ):
+        response['Server-Timing'] = timings.server_timing()
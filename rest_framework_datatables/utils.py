@@ -0,0 +1,98 @@
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.encoding import force_bytes
+
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:  # pragma: no cover
+    from django.db.models.sql.datastructures import EmptyResultSet
+
+
+def get_model_field(model, name):
+    """
+    Return the field ``name`` of ``model``, or ``None`` if it does not exist.
+    """
+    if name == 'pk':
+        return model._meta.pk
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def get_lookup_fields(model, path):
+    """
+    Return the list of model fields traversed by the ``__`` separated
+    lookup ``path``, or ``None`` if the path does not only consist of model
+    fields (annotations, transforms...).
+    """
+    fields = []
+    for part in path.split('__'):
+        field = get_model_field(model, part) if model is not None else None
+        if field is None:
+            return None
+        fields.append(field)
+        model = field.related_model if field.is_relation else None
+    return fields
+
+
+def is_multivalued(model, path):
+    """
+    Return ``True`` if the lookup ``path`` traverses a many-to-many or a
+    reverse foreign key relation, and may thus duplicate rows.
+    """
+    return any(
+        field.many_to_many or field.one_to_many
+        for field in get_lookup_fields(model, path) or ()
+    )
+
+
+def get_serializer_class(view):
+    """
+    Return the serializer class of ``view``, or ``None``.
+    """
+    if hasattr(view, 'get_serializer_class'):
+        return view.get_serializer_class()
+    return getattr(view, 'serializer_class', None)
+
+
+def get_force_serialize(serializer_class):
+    """
+    Return the ``datatables_always_serialize`` Meta option of
+    ``serializer_class``.
+    """
+    if serializer_class is not None and hasattr(serializer_class, 'Meta'):
+        return getattr(
+            serializer_class.Meta, 'datatables_always_serialize', ()
+        )
+    return ()
+
+
+def get_column_lookups(serializer_class):
+    """
+    Return the ``datatables_column_lookups`` Meta option of
+    ``serializer_class``: a dict mapping column ``data`` keys to the lookup
+    used to search them.
+    """
+    if serializer_class is not None and hasattr(serializer_class, 'Meta'):
+        return getattr(
+            serializer_class.Meta, 'datatables_column_lookups', {}
+        )
+    return {}
+
+
+def queryset_fingerprint(queryset):
+    """
+    Return a hash of the SQL of ``queryset``, or ``None`` if the queryset
+    cannot match anything.
+    """
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return None
+    return hashlib.md5(force_bytes(sql)).hexdigest()
+
+
+def view_name(view):
+    return '%s.%s' % (view.__class__.__module__, view.__class__.__name__)
@@ -0,0 +1,190 @@
+from collections import OrderedDict
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .query import get_datatables_query
+from .utils import get_force_serialize, get_model_field
+
+
+def _is_single_valued(field):
+    # forward foreign keys and one-to-one relations that cannot be null, a
+    # null relation would need the serializer to handle the missing object
+    return (
+        field.concrete and (field.many_to_one or field.one_to_one)
+        and not field.null
+    )
+
+
+def _resolve(model, source_attrs):
+    """
+    Return the ``values()`` lookup of the model field read through
+    ``source_attrs``, and the field itself, or ``(None, None)`` if it does
+    not only traverse non-null forward relations.
+    """
+    field = None
+    for i, attr in enumerate(source_attrs):
+        if model is None:
+            return None, None
+        field = get_model_field(model, attr)
+        if field is None:
+            return None, None
+        if i < len(source_attrs) - 1:
+            if not _is_single_valued(field):
+                return None, None
+            model = field.related_model
+        else:
+            model = None
+    return '__'.join(source_attrs), field
+
+
+def _identity(value):
+    return value
+
+
+def _has_default_representation(serializer):
+    # unbound methods are created on each access on Python 2
+    method = type(serializer).to_representation
+    return getattr(method, '__func__', method) is getattr(
+        serializers.Serializer.to_representation, '__func__',
+        serializers.Serializer.to_representation
+    )
+
+
+def get_values_fields(serializer, model, fields=None):
+    """
+    Return an ``OrderedDict`` mapping the keys of the representation of
+    ``serializer`` (restricted to the ``fields`` names if given) to
+    ``[to_representation, lookup]`` pairs, or to nested ``OrderedDict``
+    for nested serializers. Return ``None`` if one of the fields needs the
+    model instance, like method fields or many-valued relations, or if
+    ``serializer`` overrides ``to_representation()``.
+    """
+    if not _has_default_representation(serializer):
+        return None
+    result = OrderedDict()
+    for name, field in serializer.fields.items():
+        if fields is not None and name not in fields:
+            continue
+        if field.write_only:
+            continue
+        if (
+                field.source == '*'
+                or isinstance(field, (
+                    serializers.ListSerializer,
+                    serializers.ManyRelatedField,
+                    serializers.SerializerMethodField,
+                ))
+        ):
+            return None
+        lookup, model_field = _resolve(model, field.source_attrs)
+        if lookup is None:
+            return None
+        if isinstance(field, serializers.Serializer):
+            if not _is_single_valued(model_field):
+                return None
+            nested = get_values_fields(field, model_field.related_model)
+            if nested is None:
+                return None
+            for item in nested.values():
+                _prefix_lookups(item, lookup + '__')
+            result[name] = nested
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            if not model_field.is_relation:
+                return None
+            pk_field = getattr(field, 'pk_field', None)
+            result[name] = [
+                pk_field.to_representation if pk_field else _identity,
+                lookup
+            ]
+        elif isinstance(field, serializers.RelatedField):
+            return None
+        elif model_field.is_relation:
+            return None
+        else:
+            result[name] = [field.to_representation, lookup]
+    return result
+
+
+def _prefix_lookups(item, prefix):
+    if isinstance(item, OrderedDict):
+        for child in item.values():
+            _prefix_lookups(child, prefix)
+    else:
+        item[1] = prefix + item[1]
+
+
+def get_lookups(values_fields):
+    """
+    Return the ``values()`` lookups needed by ``values_fields``.
+    """
+    lookups = set()
+    for item in values_fields.values():
+        if isinstance(item, OrderedDict):
+            lookups.update(get_lookups(item))
+        else:
+            lookups.add(item[1])
+    return lookups
+
+
+def build_row(values, values_fields):
+    """
+    Return the representation of the ``values()`` dict ``values``.
+    """
+    row = OrderedDict()
+    for key, item in values_fields.items():
+        if isinstance(item, OrderedDict):
+            row[key] = build_row(values, item)
+        else:
+            value = values[item[1]]
+            row[key] = None if value is None else item[0](value)
+    return row
+
+
+class DatatablesValuesMixin(object):
+    """
+    View mixin fetching the rows of datatables requests with ``values()``
+    and building their representation without instantiating models, when
+    all the requested serializer fields read plain model fields, possibly
+    through non-null foreign keys (``artist.name``).
+
+    The requests needing the model instances (method fields, many-valued
+    relations, properties...) use the serializer as usual.
+    """
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == 'datatables':
+            values_fields = self.get_datatables_values_fields(
+                request, self.get_queryset().model
+            )
+            if values_fields is not None:
+                return self.list_datatables_values(
+                    self.filter_queryset(self.get_queryset()), values_fields
+                )
+        return super(DatatablesValuesMixin, self).list(
+            request, *args, **kwargs
+        )
+
+    def get_datatables_values_fields(self, request, model):
+        serializer = self.get_serializer()
+        query = get_datatables_query(request)
+        force_serialize = get_force_serialize(serializer.__class__)
+        fields = [
+            name for name in serializer.fields
+            if query.is_requested(name, force_serialize)
+        ]
+        return get_values_fields(serializer, model, fields)
+
+    def list_datatables_values(self, queryset, values_fields):
+        # the primary key keeps the rows of a distinct queryset apart when
+        # they have the same values, build_row() does not output it
+        queryset = queryset.values(
+            'pk', *sorted(get_lookups(values_fields))
+        )
+        page = self.paginate_queryset(queryset)
+        rows = [
+            build_row(values, values_fields)
+            for values in (queryset if page is None else page)
+        ]
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
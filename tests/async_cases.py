@@ -0,0 +1,98 @@
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+
+from asgiref.sync import sync_to_async
+
+from django.conf.urls import url
+from django.test import AsyncClient, TestCase
+from django.test.utils import override_settings
+
+from rest_framework.generics import ListAPIView
+from rest_framework.test import APIClient
+
+from rest_framework_datatables.asynchronous import (
+    AsyncDatatablesFilterBackend, AsyncDatatablesLimitOffsetPagination,
+    AsyncDatatablesListMixin, AsyncDatatablesPageNumberPagination
+)
+from rest_framework_datatables.filters import DatatablesFilterBackend
+from rest_framework_datatables.pagination import (
+    DatatablesPageNumberPagination
+)
+
+
+class TestAsyncTestCase(TestCase):
+    class SyncView(ListAPIView):
+        serializer_class = AlbumSerializer
+        filter_backends = [DatatablesFilterBackend]
+        pagination_class = DatatablesPageNumberPagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+        def get_extra_json(self):
+            return 'extra', 'value'
+
+        class Meta:
+            datatables_extra_json = ('get_extra_json', )
+
+    class AsyncView(AsyncDatatablesListMixin, SyncView):
+        filter_backends = [AsyncDatatablesFilterBackend]
+        pagination_class = AsyncDatatablesPageNumberPagination
+
+        async def get_extra_json(self):
+            return 'extra', 'value'
+
+    class AsyncLimitOffsetView(AsyncView):
+        pagination_class = AsyncDatatablesLimitOffsetPagination
+
+    class AsyncSyncBackendView(AsyncDatatablesListMixin, SyncView):
+        pass
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=rank&columns[0][orderable]=true&columns[1][data]=artist_name&columns[1][name]=artist.name&columns[1][searchable]=true&columns[2][data]=name&columns[2][searchable]=true'
+
+    @sync_to_async
+    def get(self, url):
+        return APIClient().get(url).json()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_same_response(self):
+        client = AsyncClient()
+        for prefix in ('/api/async/', '/api/asynclimit/', '/api/asyncsync/'):
+            for query in (
+                    '&length=5&start=5&order[0][column]=0&order[0][dir]=desc',
+                    '&length=10&search[value]=the',
+                    '&length=-1&columns[1][search][value]=beatles',
+            ):
+                response = await client.get(
+                    prefix + '?format=datatables&draw=1' + self.columns + query
+                )
+                self.assertEquals(response.status_code, 200)
+                self.assertEquals(response.json(), await self.get(
+                    '/api/sync/?format=datatables&draw=1' + self.columns + query
+                ))
+        self.assertEquals(response.json()['extra'], 'value')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_json_format(self):
+        response = await AsyncClient().get('/api/async/?format=json')
+        result = await self.get('/api/sync/?format=json')
+        self.assertEquals(response.json()['results'], result['results'])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_errors(self):
+        response = await AsyncClient().get(
+            '/api/async/?format=datatables&draw=1&length=10&start=500'
+        )
+        self.assertEquals(response.status_code, 404)
+        response = await AsyncClient().post('/api/async/')
+        self.assertEquals(response.status_code, 405)
+
+
+urlpatterns = [
+    url('^api/sync', TestAsyncTestCase.SyncView.as_view()),
+    url('^api/async/', TestAsyncTestCase.AsyncView.as_async_view()),
+    url('^api/asynclimit', TestAsyncTestCase.AsyncLimitOffsetView.as_async_view()),
+    url('^api/asyncsync', TestAsyncTestCase.AsyncSyncBackendView.as_async_view()),
+]
@@ -0,0 +1,18 @@
+import sys
+import unittest
+
+from django.test import TestCase
+
+try:
+    from django.test import AsyncClient  # noqa
+    has_async_client = sys.version_info >= (3, 6)
+except ImportError:
+    has_async_client = False
+
+if has_async_client:
+    # the async syntax cannot be parsed by older versions of Python
+    from .async_cases import TestAsyncTestCase  # noqa
+else:
+    @unittest.skip('AsyncClient is not available')
+    class TestAsyncTestCase(TestCase):
+        pass
@@ -0,0 +1,182 @@
+import threading
+
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+from albums.views import AlbumViewSet
+
+from django.conf.urls import url
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+
+from rest_framework.generics import ListAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.test import APIClient
+from rest_framework_datatables.batch import DatatablesBatchView
+from rest_framework_datatables.executor import QueryExecutor
+
+
+class PrivateAlbumView(ListAPIView):
+    serializer_class = AlbumSerializer
+    permission_classes = (IsAuthenticated, )
+
+    def get_queryset(self):
+        return Album.objects.filter(artist__name__startswith='The')
+
+    def get_thread(self):
+        return 'thread', threading.current_thread().name
+
+    class Meta:
+        datatables_extra_json = ('get_thread', )
+
+
+class BatchView(DatatablesBatchView):
+    datatables_views = {
+        'albums': AlbumViewSet,
+        'private': PrivateAlbumView,
+    }
+    datatables_batch_max_draws = 3
+
+
+class ConcurrentBatchView(BatchView):
+    datatables_executor = QueryExecutor(max_workers=2)
+
+
+class TestBatchViewTestCase(TestCase):
+    fixtures = ['test_data']
+
+    query = 'draw=%d&start=%d&length=5&columns[0][data]=name&columns[0][searchable]=true&columns[0][orderable]=true&columns[1][data]=year&order[0][column]=0'
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def get(self, prefix, query):
+        return self.client.get(prefix + '?format=datatables&' + query).json()
+
+    def batch(self, draws, prefix='/api/batch/'):
+        return self.client.post(prefix, draws, format='json')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_batch(self):
+        user = User.objects.create_user('user')
+        self.client.force_authenticate(user)
+        response = self.batch({
+            'first': {'view': 'albums', 'query': self.query % (1, 0)},
+            'second': {'view': 'albums', 'query': self.query % (2, 5)},
+            'private': self.query % (3, 0),
+        })
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response['Content-Type'], 'application/json')
+        result = response.json()
+        self.assertEquals(
+            list(result.keys()), ['first', 'second', 'private']
+        )
+        self.assertEquals(
+            result['first'], self.get('/api/albums/', self.query % (1, 0))
+        )
+        self.assertEquals(
+            result['second'], self.get('/api/albums/', self.query % (2, 5))
+        )
+        self.assertEquals(result['second']['draw'], 2)
+        expected = self.get('/api/private/', self.query % (3, 0))
+        self.assertEquals(result['private'], expected)
+        self.assertEquals(expected['recordsTotal'], 10)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_nested_params(self):
+        # the parameters as returned by the ajax.params() method
+        params = {
+            'draw': 4, 'start': 0, 'length': 3,
+            'search': {'value': 'the', 'regex': False},
+            'columns': [
+                {
+                    'data': 'name', 'name': '', 'searchable': True,
+                    'orderable': True,
+                    'search': {'value': '', 'regex': False},
+                },
+                {
+                    'data': 'year', 'name': '', 'searchable': False,
+                    'orderable': True,
+                    'search': {'value': '', 'regex': False},
+                },
+            ],
+            'order': [{'column': 1, 'dir': 'desc'}],
+        }
+        result = self.batch({'albums': {'query': params}}).json()['albums']
+        self.assertEquals(result, self.get(
+            '/api/albums/',
+            'draw=4&start=0&length=3&search[value]=the&search[regex]=false'
+            '&columns[0][data]=name&columns[0][searchable]=true'
+            '&columns[0][orderable]=true&columns[1][data]=year'
+            '&columns[1][orderable]=true&order[0][column]=1'
+            '&order[0][dir]=desc'
+        ))
+        self.assertEquals(result['draw'], 4)
+        self.assertEquals(result['recordsFiltered'], 3)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_errors(self):
+        # the draws of the views that the user cannot see fail alone
+        result = self.batch({
+            'albums': self.query % (1, 0),
+            'private': self.query % (1, 0),
+        }).json()
+        self.assertEquals(result['albums']['recordsTotal'], 15)
+        self.assertEquals(result['private']['status'], 403)
+        self.assertIn('detail', result['private']['error'])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_invalid(self):
+        self.assertEquals(self.batch({'foo': ''}).status_code, 400)
+        self.assertEquals(self.batch({'albums': 1}).status_code, 400)
+        self.assertEquals(self.batch(['albums']).status_code, 400)
+        self.assertEquals(
+            self.batch({'albums': {'view': ['albums']}}).status_code, 400
+        )
+        self.assertEquals(
+            self.batch({'albums': {'view': {'name': 'albums'}}}).status_code,
+            400
+        )
+        response = self.batch(dict(
+            ('albums%d' % i, {'view': 'albums'}) for i in range(4)
+        ))
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(
+            self.client.get('/api/batch/').status_code, 405
+        )
+
+
+class TestConcurrentBatchViewTestCase(TransactionTestCase):
+    fixtures = ['test_data']
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_concurrent(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('user'))
+        query = TestBatchViewTestCase.query
+        draws = dict(
+            ('table%d' % i, {'view': 'private', 'query': query % (i, i)})
+            for i in range(3)
+        )
+        result = client.post(
+            '/api/concurrentbatch/', draws, format='json'
+        ).json()
+        sequential = client.post('/api/batch/', draws, format='json').json()
+        threads = set()
+        for i in range(3):
+            table = result['table%d' % i]
+            threads.add(table.pop('thread'))
+            sequential['table%d' % i].pop('thread')
+            self.assertEquals(table['draw'], i)
+            self.assertEquals(table, sequential['table%d' % i])
+        self.assertNotIn(threading.current_thread().name, threads)
+
+
+urlpatterns = [
+    url('^api/batch', BatchView.as_view()),
+    url('^api/concurrentbatch', ConcurrentBatchView.as_view()),
+    url('^api/albums', AlbumViewSet.as_view({'get': 'list'})),
+    url('^api/private', PrivateAlbumView.as_view()),
+]
@@ -0,0 +1,88 @@
+import warnings
+
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+from albums.views import AlbumViewSet
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from rest_framework.generics import ListAPIView
+from rest_framework_datatables.budget import (
+    QueryBudget, QueryBudgetExceeded, QueryBudgetWarning, get_query_shape
+)
+from rest_framework_datatables.pagination import (
+    DatatablesPageNumberPagination
+)
+from rest_framework_datatables.test import DatatablesTestCaseMixin
+
+
+class TestQueryBudgetTestCase(DatatablesTestCaseMixin, TestCase):
+    class AlbumView(ListAPIView):
+        serializer_class = AlbumSerializer
+        pagination_class = DatatablesPageNumberPagination
+        datatables_query_budget = QueryBudget(action='raise')
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class PlannedView(AlbumView):
+        datatables_plan_relations = True
+
+    class UncheckedView(AlbumView):
+        datatables_query_budget = None
+
+    class WarningView(AlbumView):
+        datatables_query_budget = QueryBudget(max_queries=2, max_repeats=10)
+
+    fixtures = ['test_data']
+
+    columns = 'draw=1&length=5&columns[0][data]=name&columns[0][searchable]=true&columns[1][data]=genres'
+
+    def setUp(self):
+        cache.clear()
+
+    def test_query_shape(self):
+        self.assertEquals(
+            get_query_shape(
+                "SELECT * FROM \"t\" WHERE \"t\".\"id\" IN (%s, %s, %s) "
+                "AND \"t\".\"name\" = 'it''s' AND \"t\".\"rank\" > 12"
+            ),
+            "SELECT * FROM \"t\" WHERE \"t\".\"id\" IN (%s) "
+            "AND \"t\".\"name\" = %s AND \"t\".\"rank\" > %s"
+        )
+
+    def test_repeated_queries(self):
+        with self.assertRaises(QueryBudgetExceeded) as cm:
+            self.draw(self.AlbumView, self.columns)
+        self.assertIn('5 queries like: SELECT', str(cm.exception))
+        self.assertIn('albums_genre', str(cm.exception))
+        # the genres are prefetched
+        self.assertDrawQueries(3, self.PlannedView, self.columns)
+
+    def test_max_queries(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.draw(self.WarningView, self.columns)
+            self.draw(self.WarningView, 'draw=1&length=2&columns[0][data]=name')
+        self.assertEquals(len(caught), 1)
+        self.assertEquals(caught[0].category, QueryBudgetWarning)
+        self.assertIn(
+            'WarningView ran 5 queries while serializing a page: '
+            '5 queries, the budget is 2', str(caught[0].message)
+        )
+
+    def test_invalid_action(self):
+        with self.assertRaises(ValueError):
+            QueryBudget(action='ignore')
+
+    def test_assert_draw_queries(self):
+        # the counts, the page, the genres and the extra JSON
+        response = self.assertDrawQueries(
+            5, AlbumViewSet, self.columns + '&start=5'
+        )
+        self.assertEquals(len(response.data['data']), 5)
+        with self.assertRaises(AssertionError) as cm:
+            self.assertDrawQueries(2, self.UncheckedView, self.columns)
+        self.assertIn('7 queries executed, 2 expected', str(cm.exception))
+        self.assertIn('(5 similar)', str(cm.exception))
@@ -0,0 +1,305 @@
+from albums.models import Album, Artist, Genre
+from albums.serializers import AlbumSerializer
+
+from django.apps import apps
+from django.conf.urls import url
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.test import TestCase
+
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient, APIRequestFactory
+)
+from rest_framework_datatables.cache import (
+    DatatablesCacheMixin, ExtraJSONCache, TotalCountCache, _watched_models,
+    get_generations, invalidate_model, watch_model
+)
+from rest_framework_datatables.pagination import (
+    DatatablesLimitOffsetPagination
+)
+
+
+class TestTotalCountCacheTestCase(TestCase):
+    class TestAPIView(ListAPIView):
+        serializer_class = AlbumSerializer
+        datatables_total_count_cache = TotalCountCache(timeout=60)
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    fixtures = ['test_data']
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def get_total(self):
+        response = self.client.get('/api/cachedalbums/?format=datatables&length=1&columns[0][data]=name')
+        return response.json()['recordsTotal']
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_total_count_is_cached(self):
+        self.assertEquals(self.get_total(), 15)
+        # raw SQL sends no signal, so the cached count is kept
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM albums_album_genres WHERE album_id = %s', [1]
+            )
+            cursor.execute('DELETE FROM albums_album WHERE id = %s', [1])
+        self.assertEquals(self.get_total(), 15)
+        invalidate_model(Album)
+        self.assertEquals(self.get_total(), 14)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_total_count_saves_a_query(self):
+        with CaptureQueriesContext(connection) as first:
+            self.get_total()
+        with CaptureQueriesContext(connection) as second:
+            self.get_total()
+        self.assertEquals(len(first) - 1, len(second))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_invalidation_on_save(self):
+        self.assertEquals(self.get_total(), 15)
+        Album.objects.create(
+            name='Blonde on Blonde', rank=9, year=1966,
+            artist=Artist.objects.first()
+        )
+        self.assertEquals(self.get_total(), 16)
+
+    def test_invalidation_without_cache_key(self):
+        # a process that never built a cache key, like a worker saving
+        # albums, invalidates the entries of the other processes
+        watch_model(Album, key_prefix='worker')
+        generations = get_generations([Album], key_prefix='worker')
+        Album.objects.create(
+            name='Blonde on Blonde', rank=9, year=1966,
+            artist=Artist.objects.first()
+        )
+        self.assertNotEqual(
+            get_generations([Album], key_prefix='worker'), generations
+        )
+
+    def test_unwatched_models(self):
+        Group.objects.create(name='editors')
+        self.assertIsNone(cache.get('drf_datatables:generation:auth.group'))
+
+    @override_settings(DATATABLES_CACHE_MODELS=['auth.Group'])
+    def test_watched_models_setting(self):
+        apps.get_app_config('rest_framework_datatables').ready()
+        try:
+            Group.objects.create(name='editors')
+            self.assertIsNotNone(
+                cache.get('drf_datatables:generation:auth.group')
+            )
+        finally:
+            _watched_models.pop('auth.group')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_invalidation_on_delete(self):
+        self.assertEquals(self.get_total(), 15)
+        Album.objects.first().delete()
+        self.assertEquals(self.get_total(), 14)
+
+    def test_invalidation_on_m2m_change(self):
+        count_cache = TotalCountCache(timeout=60)
+        view = self.TestAPIView()
+        queryset = Album.objects.filter(genres__name='Rock & Roll')
+        key = count_cache.get_cache_key(view, queryset)
+        self.assertEquals(key, count_cache.get_cache_key(view, queryset))
+        album = Album.objects.first()
+        album.genres.add(Genre.objects.create(name='Ambient'))
+        self.assertNotEquals(key, count_cache.get_cache_key(view, queryset))
+
+    def test_key_per_view_and_queryset(self):
+        class OtherView(self.TestAPIView):
+            pass
+
+        count_cache = TotalCountCache(timeout=60)
+        queryset = Album.objects.all()
+        key = count_cache.get_cache_key(self.TestAPIView(), queryset)
+        self.assertNotEquals(key, count_cache.get_cache_key(OtherView(), queryset))
+        self.assertNotEquals(key, count_cache.get_cache_key(
+            self.TestAPIView(), queryset.filter(year=1967)
+        ))
+        self.assertEquals(count_cache.get_total_count(
+            self.TestAPIView(), queryset.none()
+        ), 0)
+
+
+class TestResponseCacheTestCase(TestCase):
+    class TestAPIView(DatatablesCacheMixin, ListAPIView):
+        serializer_class = AlbumSerializer
+        datatables_cache_models = (Artist,)
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class TestLimitOffsetView(TestAPIView):
+        pagination_class = DatatablesLimitOffsetPagination
+
+    fixtures = ['test_data']
+
+    query = '?format=datatables&length=5&columns[0][data]=name&columns[0][searchable]=true&columns[1][data]=artist_name&columns[1][name]=artist.name&columns[1][searchable]=true&order[0][column]=0'
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def get(self, query='', prefix='/api/cachedresponse/'):
+        return self.client.get(prefix + self.query + query).json()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_draws_are_cached(self):
+        first = self.get('&draw=1')
+        with self.assertNumQueries(0):
+            second = self.get('&draw=2&_=1234')
+        self.assertEquals(second['draw'], 2)
+        first['draw'] = 2
+        self.assertEquals(first, second)
+        self.assertEquals(self.get('&draw=3', '/api/cachedlimitoffset/')['data'], first['data'])
+        with self.assertNumQueries(0):
+            self.get('&draw=4', '/api/cachedlimitoffset/')
+        self.get('&draw=2&start=5')
+        with self.assertNumQueries(0):
+            self.get('&draw=3&start=5')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_parameters_are_normalized(self):
+        self.get('&draw=1')
+        with self.assertNumQueries(0):
+            # same parameters, other order and irrelevant extras
+            response = self.client.get('/api/cachedresponse/?order[0][column]=0&columns[1][searchable]=true&columns[1][name]=artist.name&columns[1][data]=artist_name&columns[0][searchable]=true&columns[0][data]=name&length=5&format=datatables&draw=4&columns[0][foo]=bar')
+        self.assertEquals(response.json()['draw'], 4)
+        with CaptureQueriesContext(connection) as queries:
+            result = self.get('&draw=5&search[value]=beatles')
+        self.assertTrue(queries.captured_queries)
+        self.assertEquals(result['recordsFiltered'], 5)
+        self.assertEquals(result['recordsTotal'], 15)
+        with CaptureQueriesContext(connection) as queries:
+            self.get('&draw=6&year=1967')
+        self.assertTrue(queries.captured_queries)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_invalidation(self):
+        self.get('&draw=1&start=5')
+        album = Album.objects.get(name='Revolver')
+        album.name = 'Revolver (Remastered)'
+        album.save()
+        names = [row['name'] for row in self.get('&draw=2&start=5')['data']]
+        self.assertIn('Revolver (Remastered)', names)
+        self.get('&draw=1')
+        Artist.objects.filter(name='The Beatles').get().save()
+        with CaptureQueriesContext(connection) as queries:
+            self.get('&draw=2')
+        self.assertTrue(queries.captured_queries)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_user_scope(self):
+        view = self.TestAPIView()
+        view.kwargs = {}
+        anonymous = view.initialize_request(APIRequestFactory().get('/api/cachedresponse/' + self.query))
+        request = view.initialize_request(APIRequestFactory().get('/api/cachedresponse/' + self.query))
+        request.user = User(pk=1, username='john')
+        self.assertNotEquals(
+            view.get_datatables_cache_key(anonymous),
+            view.get_datatables_cache_key(request)
+        )
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_other_formats_are_not_cached(self):
+        self.client.get('/api/cachedresponse/?format=json')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/cachedresponse/?format=json')
+        self.assertTrue(queries.captured_queries)
+
+
+class TestExtraJSONCacheTestCase(TestCase):
+    class TestAPIView(ListAPIView):
+        serializer_class = AlbumSerializer
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+        def get_artists(self):
+            return 'artists', [a.name for a in Artist.objects.all()]
+
+        def get_genres(self):
+            return 'genres', [g.name for g in Genre.objects.all()]
+
+        def get_user(self):
+            return 'user', self.request.user.username
+
+        class Meta:
+            datatables_extra_json = ('get_artists', 'get_genres', 'get_user')
+            datatables_extra_json_cache = {
+                'get_artists': ExtraJSONCache(timeout=60, models=(Artist,)),
+                'get_user': ExtraJSONCache(per_user=True),
+            }
+            datatables_extra_json_on_demand = ('get_genres', )
+
+    fixtures = ['test_data']
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def get(self, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/cachedextra/?format=datatables&length=1'
+                '&columns[0][data]=name' + query
+            )
+        return response.json(), [
+            q['sql'] for q in queries.captured_queries
+            if 'albums_album' not in q['sql']
+        ]
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_cache(self):
+        result, queries = self.get('&draw=1')
+        self.assertEquals(len(result['artists']), 10)
+        self.assertEquals(len(queries), 2)
+        # the artists come from the cache, the genres are not computed
+        result, queries = self.get('&draw=2')
+        self.assertEquals(len(result['artists']), 10)
+        self.assertNotIn('genres', result)
+        self.assertEquals(queries, [])
+        # a change of the artists invalidates the cache
+        Artist.objects.create(name='New artist')
+        result, queries = self.get('&draw=3')
+        self.assertEquals(len(result['artists']), 11)
+        self.assertEquals(len(queries), 1)
+        # a change of the genres does not
+        Genre.objects.create(name='New genre')
+        self.assertEquals(self.get('&draw=4')[1], [])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_on_demand(self):
+        result, queries = self.get()
+        self.assertIn('genres', result)
+        result, queries = self.get('&draw=5&extra_json=get_genres')
+        self.assertEquals(result['genres'], sorted(result['genres']))
+        self.assertEquals(len(queries), 1)
+        result, queries = self.get('&draw=5&extra_json=get_artists')
+        self.assertNotIn('genres', result)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_per_user(self):
+        self.assertEquals(self.get()[0]['user'], '')
+        user = User.objects.create_user('someone', password='secret')
+        self.client.force_authenticate(user)
+        self.assertEquals(self.get()[0]['user'], 'someone')
+        self.client.force_authenticate(None)
+        self.assertEquals(self.get()[0]['user'], '')
+
+
+urlpatterns = [
+    url('^api/cachedalbums', TestTotalCountCacheTestCase.TestAPIView.as_view()),
+    url('^api/cachedresponse', TestResponseCacheTestCase.TestAPIView.as_view()),
+    url('^api/cachedextra', TestExtraJSONCacheTestCase.TestAPIView.as_view()),
+    url('^api/cachedlimitoffset', TestResponseCacheTestCase.TestLimitOffsetView.as_view()),
+]
@@ -0,0 +1,101 @@
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+
+from django.conf.urls import url
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.test import TestCase
+
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient,
+)
+from rest_framework_datatables.counts import (
+    CappedCount, EstimatedCount, ExactCount
+)
+
+
+class TestCountStrategiesTestCase(TestCase):
+    fixtures = ['test_data']
+
+    def test_exact_count(self):
+        self.assertEquals(ExactCount().count(Album.objects.all()), 15)
+
+    def test_capped_count(self):
+        self.assertEquals(CappedCount(5).count(Album.objects.all()), 6)
+        self.assertEquals(CappedCount(20).count(Album.objects.all()), 15)
+        self.assertEquals(
+            CappedCount(2).count(Album.objects.filter(year=1968)), 1
+        )
+
+    def test_estimated_count_without_statistics(self):
+        strategy = EstimatedCount(threshold=0)
+        self.assertEquals(strategy.count(Album.objects.all()), 15)
+
+    def test_estimated_count_sqlite(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute(
+                "UPDATE sqlite_stat1 SET stat = '1000000 1' "
+                "WHERE tbl = 'albums_album'"
+            )
+        strategy = EstimatedCount(threshold=0)
+        self.assertEquals(strategy.count(Album.objects.all()), 1000000)
+        # filtered querysets are counted exactly on SQLite
+        self.assertEquals(strategy.count(Album.objects.filter(year=1968)), 1)
+        # estimates under the threshold are counted exactly
+        self.assertEquals(
+            EstimatedCount(threshold=10 ** 7).count(Album.objects.all()), 15
+        )
+
+    def test_estimate_error(self):
+        class FailingCount(EstimatedCount):
+            def sqlite_estimate(self, connection, queryset):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT * FROM missing_table')
+
+        with CaptureQueriesContext(connection) as queries:
+            count = FailingCount(threshold=0).count(Album.objects.all())
+        self.assertEquals(count, 15)
+        # the failed query is rolled back to a savepoint
+        self.assertIn('ROLLBACK TO SAVEPOINT', ' '.join(
+            q['sql'] for q in queries.captured_queries
+        ))
+
+
+class TestCountStrategyViewTestCase(TestCase):
+    class TestAPIView(ListAPIView):
+        serializer_class = AlbumSerializer
+        datatables_count_strategy = CappedCount(5)
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class TestTotalAPIView(TestAPIView):
+        datatables_total_count_strategy = ExactCount()
+
+    fixtures = ['test_data']
+
+    def setUp(self):
+        self.client = APIClient()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_count_strategy(self):
+        response = self.client.get('/api/cappedalbums/?format=datatables&length=5&columns[0][data]=name&columns[0][searchable]=true')
+        result = response.json()
+        self.assertEquals((result['recordsFiltered'], result['recordsTotal']), (6, 6))
+        response = self.client.get('/api/cappedalbums/?format=datatables&length=5&columns[0][data]=name&columns[0][searchable]=true&search[value]=highway')
+        result = response.json()
+        self.assertEquals((result['recordsFiltered'], result['recordsTotal']), (1, 6))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_total_count_strategy(self):
+        response = self.client.get('/api/cappedtotalalbums/?format=datatables&length=5&columns[0][data]=name')
+        result = response.json()
+        self.assertEquals((result['recordsFiltered'], result['recordsTotal']), (6, 15))
+
+
+urlpatterns = [
+    url('^api/cappedalbums', TestCountStrategyViewTestCase.TestAPIView.as_view()),
+    url('^api/cappedtotalalbums', TestCountStrategyViewTestCase.TestTotalAPIView.as_view()),
+]
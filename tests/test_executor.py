@@ -0,0 +1,107 @@
+import threading
+
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+
+from django.conf.urls import url
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient,
+)
+from rest_framework_datatables.executor import QueryExecutor
+from rest_framework_datatables.pagination import (
+    DatatablesLimitOffsetPagination, DatatablesPageNumberPagination
+)
+
+
+executor = QueryExecutor(max_workers=3)
+
+
+class AlbumView(ListAPIView):
+    serializer_class = AlbumSerializer
+    pagination_class = DatatablesPageNumberPagination
+    datatables_plan_relations = True
+
+    def get_queryset(self):
+        return Album.objects.all()
+
+    def get_thread(self):
+        return 'thread', threading.current_thread().name
+
+    class Meta:
+        datatables_extra_json = ('get_thread', )
+
+
+class LimitOffsetView(AlbumView):
+    pagination_class = DatatablesLimitOffsetPagination
+
+
+class ConcurrentView(AlbumView):
+    datatables_executor = executor
+
+
+class ConcurrentLimitOffsetView(ConcurrentView):
+    pagination_class = DatatablesLimitOffsetPagination
+
+
+class TestQueryExecutorTestCase(TransactionTestCase):
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=rank&columns[0][orderable]=true&columns[1][data]=artist_name&columns[1][name]=artist.name&columns[1][searchable]=true&columns[2][data]=genres&columns[2][name]=genres.name&columns[2][searchable]=true'
+
+    def get(self, prefix, query):
+        return APIClient().get(
+            prefix + '?format=datatables&draw=1' + self.columns + query
+        ).json()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_same_response(self):
+        for prefix, sequential in (
+                ('/api/concurrent/', '/api/sequential/'),
+                ('/api/concurrentlimit/', '/api/limit/'),
+        ):
+            for query in (
+                    '&length=5&start=5&order[0][column]=0&order[0][dir]=desc',
+                    '&length=10&search[value]=rock',
+                    '&length=10&start=10&columns[1][search][value]=the',
+                    '&length=10&start=1000',
+            ):
+                # all the queries run on the connections of the workers
+                with self.assertNumQueries(0):
+                    result = self.get(prefix, query)
+                expected = self.get(sequential, query)
+                self.assertNotEqual(result.pop('thread'), expected['thread'])
+                expected.pop('thread')
+                self.assertEquals(result, expected)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_other_formats(self):
+        response = APIClient().get('/api/concurrent/?format=json')
+        self.assertEquals(len(response.json()['results']), 10)
+
+
+class TestQueryExecutorTransactionTestCase(TestCase):
+    fixtures = ['test_data']
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_sequential_in_transaction(self):
+        # the other connections would not see the changes of the transaction
+        Album.objects.filter(rank=1).update(name='A renamed album')
+        with self.assertNumQueries(2):
+            result = APIClient().get(
+                '/api/concurrent/?format=datatables&draw=1&length=1'
+                '&columns[0][data]=name&order[0][column]=0'
+            ).json()
+        self.assertEquals(result['data'][0]['name'], 'A renamed album')
+        self.assertEquals(result['thread'], threading.current_thread().name)
+
+
+urlpatterns = [
+    url('^api/sequential', AlbumView.as_view()),
+    url('^api/limit', LimitOffsetView.as_view()),
+    url('^api/concurrent/', ConcurrentView.as_view()),
+    url('^api/concurrentlimit', ConcurrentLimitOffsetView.as_view()),
+]
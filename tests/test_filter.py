@@ -1,17 +1,22 @@
-from albums.models import Album
-from albums.serializers import AlbumSerializer
+from albums.models import Album, Artist
+from albums.serializers import AlbumSerializer, ArtistSerializer
 
 from django.conf.urls import url
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
 from django.test.utils import override_settings
 from django.test import TestCase
 
 from rest_framework.generics import ListAPIView
 from rest_framework.test import (
-    APIClient,
+    APIClient, APIRequestFactory
 )
+from rest_framework_datatables.filters import DatatablesFilterBackend
 from rest_framework_datatables.pagination import (
     DatatablesLimitOffsetPagination,
 )
+from rest_framework_datatables.renderers import DatatablesRenderer
 
 class TestFilterTestCase(TestCase):
     class TestAPIView(ListAPIView):
@@ -36,6 +41,239 @@ class TestFilterTestCase(TestCase):
         self.assertEquals((result['recordsFiltered'], result['recordsTotal'], result['data'][0]['name']), expected)
 
 
+class TestExistsSubqueriesTestCase(TestCase):
+    class TestArtistView(ListAPIView):
+        serializer_class = ArtistSerializer
+        pagination_class = DatatablesLimitOffsetPagination
+        datatables_exists_subqueries = True
+
+        def get_queryset(self):
+            return Artist.objects.all()
+
+    class TestAlbumView(ListAPIView):
+        serializer_class = AlbumSerializer
+        pagination_class = DatatablesLimitOffsetPagination
+        datatables_exists_subqueries = True
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    fixtures = ['test_data']
+
+    def setUp(self):
+        self.client = APIClient()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_reverse_foreign_key(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/existsartists/?format=datatables&length=10&columns[0][data]=name&columns[0][searchable]=true&columns[1][data]=albums&columns[1][name]=albums.name&columns[1][searchable]=true&search[value]=the')
+        result = response.json()
+        # artists with several matching albums must be listed only once.
+        expected = Artist.objects.filter(
+            Q(name__icontains='the') | Q(albums__name__icontains='the')
+        ).distinct().count()
+        self.assertEquals(result['recordsFiltered'], expected)
+        names = [artist['name'] for artist in result['data']]
+        self.assertEquals(len(names), len(set(names)))
+        sql = ' '.join(q['sql'] for q in queries.captured_queries)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_many_to_many_column_search(self):
+        response = self.client.get('/api/existsalbums/?format=datatables&length=10&columns[0][data]=name&columns[0][searchable]=true&columns[1][data]=genres&columns[1][name]=genres.name&columns[1][searchable]=true&columns[1][search][value]=rock')
+        result = response.json()
+        self.assertEquals(result['recordsFiltered'], Album.objects.filter(genres__name__icontains='rock').distinct().count())
+        names = [album['name'] for album in result['data']]
+        self.assertEquals(len(names), len(set(names)))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_single_valued_paths(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/existsalbums/?format=datatables&length=10&columns[0][data]=artist_name&columns[0][name]=artist.name&columns[0][searchable]=true&search[value]=Jimi')
+        result = response.json()
+        self.assertEquals((result['recordsFiltered'], result['data'][0]['artist_name']), (1, 'The Jimi Hendrix Experience'))
+        sql = ' '.join(q['sql'] for q in queries.captured_queries)
+        self.assertNotIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+
+class LookupAlbumSerializer(AlbumSerializer):
+    class Meta(AlbumSerializer.Meta):
+        datatables_column_lookups = {
+            'rank': 'numeric',
+            'year': 'range',
+            'name': 'istartswith',
+            'artist_name': 'iexact',
+            'genres': 'in',
+        }
+
+
+class TestColumnLookupsTestCase(TestCase):
+    class TestAPIView(ListAPIView):
+        serializer_class = LookupAlbumSerializer
+        pagination_class = DatatablesLimitOffsetPagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=rank&columns[0][searchable]=true&columns[1][data]=year&columns[1][searchable]=true&columns[2][data]=name&columns[2][searchable]=true&columns[3][data]=artist_name&columns[3][name]=artist.name&columns[3][searchable]=true'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/lookups/?format=datatables&length=20' + self.columns + query)
+        self.sql = ' '.join(q['sql'] for q in queries.captured_queries)
+        return response.json()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_numeric_and_range(self):
+        result = self.get('&columns[0][search][value]=3')
+        self.assertEquals([album['rank'] for album in result['data']], [3])
+        result = self.get('&columns[1][search][value]=1965,1967')
+        self.assertEquals(result['recordsFiltered'], Album.objects.filter(year__range=(1965, 1967)).count())
+        result = self.get('&columns[1][search][value]=1970,')
+        self.assertEquals(result['recordsFiltered'], Album.objects.filter(year__gte=1970).count())
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_global_search_range(self):
+        # the global search compares the range and in columns for equality
+        result = self.get('&search[value]=1966')
+        self.assertEquals(result['recordsFiltered'], Album.objects.filter(year=1966).count())
+        result = self.get('&search[value]=3')
+        self.assertEquals([album['rank'] for album in result['data']], [3])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_out_of_range_integer(self):
+        result = self.get('&columns[0][search][value]=99999999999999999999999')
+        self.assertEquals(result['recordsFiltered'], 0)
+        result = self.get('&columns[1][search][value]=,99999999999999999999999')
+        self.assertEquals(result['recordsFiltered'], 0)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_text_lookups(self):
+        result = self.get('&columns[2][search][value]=the')
+        self.assertEquals(result['recordsFiltered'], Album.objects.filter(name__istartswith='the').count())
+        result = self.get('&columns[3][search][value]=the beatles')
+        self.assertEquals(result['recordsFiltered'], Album.objects.filter(artist__name__iexact='the beatles').count())
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_in(self):
+        response = self.client.get('/api/lookups/?format=datatables&length=20&columns[0][data]=genres&columns[0][name]=genres.name&columns[0][searchable]=true&columns[0][search][value]=Rock, Blues')
+        result = response.json()
+        expected = Album.objects.filter(genres__name__in=['Rock', 'Blues']).distinct().count()
+        self.assertEquals(result['recordsFiltered'], expected)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_type_mismatch(self):
+        # the global search skips the columns that cannot match
+        result = self.get('&search[value]=the')
+        self.assertEquals(result['recordsFiltered'], Album.objects.filter(Q(name__istartswith='the') | Q(artist__name__iexact='the')).count())
+        where = self.sql.split('WHERE')[1].split(' subquery')[0]
+        self.assertNotIn('"rank"', where)
+        self.assertNotIn('"year"', where)
+        # a column search that cannot match returns nothing
+        result = self.get('&columns[0][search][value]=foo')
+        self.assertEquals(result['recordsFiltered'], 0)
+        result = self.get('&columns[1][search][value]=foo,bar')
+        self.assertEquals(result['recordsFiltered'], 0)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_numeric_text_search(self):
+        response = self.client.get('/api/additionalorderby/?format=datatables&length=20&columns[0][data]=rank&columns[0][searchable]=true&columns[1][data]=name&columns[1][searchable]=true&search[value]=1')
+        result = response.json()
+        self.assertEquals(result['recordsFiltered'], Album.objects.filter(Q(rank__icontains='1') | Q(name__icontains='1')).count())
+        response = self.client.get('/api/additionalorderby/?format=datatables&length=20&columns[0][data]=rank&columns[0][searchable]=true&columns[0][search][value]=foo')
+        self.assertEquals(response.json()['recordsFiltered'], 0)
+
+
+class TestTokenizedSearchTestCase(TestCase):
+    class TestAPIView(ListAPIView):
+        serializer_class = AlbumSerializer
+        pagination_class = DatatablesLimitOffsetPagination
+        datatables_tokenize_search = True
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=name&columns[0][searchable]=true&columns[1][data]=year&columns[1][searchable]=true&columns[2][data]=artist_name&columns[2][name]=artist.name&columns[2][searchable]=true&columns[3][data]=genres&columns[3][name]=genres.name&columns[3][searchable]=true'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get_names(self, prefix, search):
+        response = self.client.get(prefix + '?format=datatables&length=20' + self.columns + '&search[value]=' + search)
+        return sorted(album['name'] for album in response.json()['data'])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_terms(self):
+        self.assertEquals(self.get_names('/api/tokenized/', 'beatles 1966'), ['Revolver'])
+        self.assertEquals(self.get_names('/api/tokenized/', 'soul rubber'), ['Rubber Soul'])
+        self.assertEquals(self.get_names('/api/additionalorderby/', 'soul rubber'), [])
+        self.assertEquals(self.get_names('/api/tokenized/', '"rubber soul" beatles'), ['Rubber Soul'])
+        self.assertEquals(self.get_names('/api/tokenized/', '"soul rubber"'), [])
+        self.assertEquals(self.get_names('/api/tokenized/', 'beatles unknown'), [])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_terms_match_different_related_rows(self):
+        self.assertEquals(self.get_names('/api/tokenized/', 'folk blues'), ['Blonde on Blonde', 'Highway 61 Revisited'])
+
+    def get_joins(self, view, query):
+        request = view.initialize_request(APIRequestFactory().get(
+            '/?format=datatables' + self.columns + query
+        ))
+        request.accepted_renderer = DatatablesRenderer()
+        queryset, filtered = DatatablesFilterBackend().search_queryset(
+            request, Album.objects.all(), view
+        )
+        return [
+            join.table_name for join in queryset.query.alias_map.values()
+        ]
+
+    def test_joins_are_bounded(self):
+        view = self.TestAPIView()
+        # one join per relation, the terms search the genres in EXISTS
+        # subqueries
+        self.assertEquals(
+            sorted(self.get_joins(view, '&search[value]=rock pop soul')),
+            ['albums_album', 'albums_artist']
+        )
+        view.datatables_tokenize_search = False
+        # the global and the column searches share the joins of the genres
+        self.assertEquals(sorted(self.get_joins(
+            view, '&search[value]=rock&columns[3][search][value]=pop'
+        )), [
+            'albums_album', 'albums_album_genres', 'albums_artist',
+            'albums_genre'
+        ])
+
+    def test_search_terms(self):
+        class Backend(DatatablesFilterBackend):
+            max_search_terms = 3
+            max_search_term_length = 5
+
+        view = self.TestAPIView()
+        backend = Backend()
+        self.assertEquals(
+            backend.get_search_terms(view, ' pink  "Dark Side" PINK floyd 1973'),
+            ['pink', 'Dark', 'floyd']
+        )
+        self.assertEquals(backend.get_search_terms(view, '"the moon'), ['the m'])
+        self.assertEquals(backend.get_search_terms(view, '"" '), [])
+        view.datatables_tokenize_search = False
+        self.assertEquals(backend.get_search_terms(view, 'pink floyd'), ['pink floyd'])
+
+
 urlpatterns = [
     url('^api/additionalorderby', TestFilterTestCase.TestAPIView.as_view()),
+    url('^api/existsartists', TestExistsSubqueriesTestCase.TestArtistView.as_view()),
+    url('^api/existsalbums', TestExistsSubqueriesTestCase.TestAlbumView.as_view()),
+    url('^api/lookups', TestColumnLookupsTestCase.TestAPIView.as_view()),
+    url('^api/tokenized', TestTokenizedSearchTestCase.TestAPIView.as_view()),
 ]
@@ -0,0 +1,242 @@
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+
+from django.conf.urls import url
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.test import TestCase
+
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient,
+)
+from rest_framework_datatables.pagination import (
+    DatatablesHasMorePagination, DatatablesKeysetPagination,
+    DatatablesLimitOffsetPagination
+)
+
+
+class TestKeysetPaginationTestCase(TestCase):
+    class KeysetView(ListAPIView):
+        serializer_class = AlbumSerializer
+        pagination_class = DatatablesKeysetPagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class OffsetView(KeysetView):
+        pagination_class = DatatablesLimitOffsetPagination
+
+    class NullableKeysetView(KeysetView):
+        def get_queryset(self):
+            # the year of the last three albums is unknown
+            return Album.objects.annotate(nullable_year=Case(
+                When(rank__gt=12, then=Value(None)), default=F('year'),
+                output_field=IntegerField()
+            ))
+
+    class NullableOffsetView(NullableKeysetView):
+        pagination_class = DatatablesLimitOffsetPagination
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=name&columns[0][orderable]=true&columns[1][data]=year&columns[1][orderable]=true&columns[2][data]=artist_name&columns[2][name]=artist.name&columns[2][orderable]=true&columns[2][searchable]=true'
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def get_names(self, prefix, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                prefix + '?format=datatables&draw=1' + self.columns + query
+            )
+        result = response.json()
+        page_sql = [
+            q['sql'] for q in queries.captured_queries
+            if 'FROM "albums_album"' in q['sql'] and 'LIMIT' in q['sql']
+        ][0]
+        return [row['name'] for row in result['data']], page_sql
+
+    def assertSamePages(self, query, starts, seek=True):
+        for start in starts:
+            page = '%s&length=4&start=%d' % (query, start)
+            names, sql = self.get_names('/api/keyset/', page)
+            expected, offset_sql = self.get_names('/api/offset/', page)
+            self.assertEquals(names, expected)
+            if start and seek:
+                self.assertNotIn('OFFSET', sql)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_forward(self):
+        self.assertSamePages('&order[0][column]=0', [0, 4, 8, 12])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_backward(self):
+        self.assertSamePages('&order[0][column]=0', [12], seek=False)
+        self.assertSamePages('&order[0][column]=0', [8, 4])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_mixed_directions_with_ties(self):
+        query = '&order[0][column]=1&order[0][dir]=desc&order[1][column]=2'
+        self.assertSamePages(query, [0, 4, 8, 12])
+        self.assertSamePages(query, [4, 0])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_search(self):
+        query = '&order[0][column]=0&search[value]=the'
+        self.assertSamePages(query, [0, 4])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_jump_uses_offset(self):
+        names, sql = self.get_names('/api/keyset/', '&order[0][column]=0&length=4&start=8')
+        self.assertIn('OFFSET', sql)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_default_ordering(self):
+        self.assertSamePages('', [0, 4, 8])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_null_values(self):
+        columns = self.columns
+        self.columns = '&columns[0][data]=name&columns[1][data]=nullable_year&columns[1][orderable]=true'
+        for direction in ('asc', 'desc'):
+            query = '&order[0][column]=1&order[0][dir]=%s&length=5' % direction
+            pages = {}
+            for start in (0, 5, 10, 5, 0):
+                page = '%s&start=%d' % (query, start)
+                names, sql = self.get_names('/api/nullablekeyset/', page)
+                expected, offset_sql = self.get_names('/api/nullableoffset/', page)
+                self.assertEquals(names, expected)
+                if start:
+                    self.assertNotIn('OFFSET', sql)
+                pages[start] = names
+            self.assertEquals(
+                sorted(sum(pages.values(), [])),
+                sorted(Album.objects.values_list('name', flat=True))
+            )
+        self.columns = columns
+
+    def test_seek_q_null_ordering(self):
+        paginator = DatatablesKeysetPagination()
+        queryset = Album.objects.annotate(nullable_year=Case(
+            When(rank__gt=12, then=Value(None)), default=F('year'),
+            output_field=IntegerField()
+        ))
+        for nulls_largest in (True, False):
+            for ordering in (['nullable_year', 'pk'], ['-nullable_year', 'pk']):
+                nulls_last = nulls_largest != ordering[0].startswith('-')
+                # after a non-null value, NULL rows only follow if last
+                after = queryset.filter(paginator.get_seek_q(
+                    ordering, [1966, 3], nulls_largest
+                ))
+                self.assertEquals(
+                    after.filter(nullable_year__isnull=True).count(),
+                    3 if nulls_last else 0
+                )
+                # after a NULL value, non-null rows only follow if first
+                after = queryset.filter(paginator.get_seek_q(
+                    ordering, [None, 13], nulls_largest
+                ))
+                self.assertEquals(
+                    sorted(after.filter(nullable_year__isnull=True).values_list('pk', flat=True)),
+                    [14, 15]
+                )
+                self.assertEquals(
+                    after.filter(nullable_year__isnull=False).count(),
+                    0 if nulls_last else 12
+                )
+
+    def test_ordering_on_relation_is_not_seekable(self):
+        paginator = DatatablesKeysetPagination()
+        self.assertIsNone(paginator.get_keyset_ordering(
+            Album.objects.order_by('artist')
+        ))
+        self.assertEquals(paginator.get_keyset_ordering(
+            Album.objects.order_by('-artist__name')
+        ), ['-artist__name', 'pk'])
+        self.assertEquals(paginator.get_keyset_ordering(
+            Album.objects.order_by('year', '-id')
+        ), ['year', '-id'])
+
+
+class TestHasMorePaginationTestCase(TestCase):
+    class HasMoreView(ListAPIView):
+        serializer_class = AlbumSerializer
+        pagination_class = DatatablesHasMorePagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=name&columns[0][orderable]=true&columns[0][searchable]=true&columns[1][data]=year&order[0][column]=0'
+
+    def get(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(
+                '/api/hasmore/?format=datatables&draw=1' + self.columns + query
+            )
+        return response.json(), [q['sql'] for q in queries.captured_queries]
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_filtered(self):
+        names = list(
+            Album.objects.filter(name__icontains='e')
+            .order_by('name').values_list('name', flat=True)
+        )
+        self.assertGreater(len(names), 4)
+        result, queries = self.get('&search[value]=e&length=3&start=0')
+        # the total count and the page, without the filtered count
+        self.assertEquals(len(queries), 2)
+        self.assertIn('LIMIT 4', queries[1])
+        self.assertEquals([r['name'] for r in result['data']], names[:3])
+        self.assertEquals(result['recordsFiltered'], 4)
+        self.assertEquals(result['recordsTotal'], 15)
+        self.assertTrue(result['hasMore'])
+        # the last page is exact
+        start = (len(names) - 1) // 3 * 3
+        result, queries = self.get('&search[value]=e&length=3&start=%d' % start)
+        self.assertEquals([r['name'] for r in result['data']], names[start:])
+        self.assertEquals(result['recordsFiltered'], len(names))
+        self.assertFalse(result['hasMore'])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_unfiltered(self):
+        result, queries = self.get('&length=5&start=5')
+        self.assertEquals(len(queries), 2)
+        self.assertEquals(result['recordsFiltered'], 15)
+        self.assertTrue(result['hasMore'])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_count_only(self):
+        result, queries = self.get('&search[value]=the&length=3&count_only=true')
+        self.assertEquals(len(queries), 2)
+        self.assertEquals(result['data'], [])
+        self.assertEquals(
+            result['recordsFiltered'],
+            Album.objects.filter(name__icontains='the').count()
+        )
+        self.assertEquals(result['recordsTotal'], 15)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_other_formats(self):
+        response = APIClient().get('/api/hasmore/?format=json&limit=2')
+        self.assertEquals(response.json()['count'], 15)
+
+
+urlpatterns = [
+    url('^api/keyset', TestKeysetPaginationTestCase.KeysetView.as_view()),
+    url('^api/hasmore', TestHasMorePaginationTestCase.HasMoreView.as_view()),
+    url('^api/offset', TestKeysetPaginationTestCase.OffsetView.as_view()),
+    url(
+        '^api/nullablekeyset',
+        TestKeysetPaginationTestCase.NullableKeysetView.as_view()
+    ),
+    url(
+        '^api/nullableoffset',
+        TestKeysetPaginationTestCase.NullableOffsetView.as_view()
+    ),
+]
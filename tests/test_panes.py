@@ -0,0 +1,149 @@
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+
+from django.conf.urls import url
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.test import TestCase
+
+from rest_framework.generics import ListAPIView
+from rest_framework.test import APIClient
+from rest_framework_datatables.cache import SearchPanesCache, invalidate_model
+
+
+class TestSearchPanesTestCase(TestCase):
+    class SearchPanesView(ListAPIView):
+        serializer_class = AlbumSerializer
+        datatables_search_panes = ('year', 'artist_name')
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class GenresPaneView(SearchPanesView):
+        datatables_search_panes = {'genres': 'genres__name'}
+
+    class CachedPanesView(SearchPanesView):
+        datatables_search_panes_cache = SearchPanesCache(timeout=60)
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=name&columns[0][searchable]=true&columns[1][data]=artist_name&columns[1][name]=artist.name&columns[1][searchable]=true&columns[2][data]=year'
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def get(self, prefix, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/%s/?format=datatables&draw=1&length=5' % prefix
+                + self.columns + query
+            )
+        grouped = [
+            q['sql'] for q in queries.captured_queries
+            if 'GROUP BY' in q['sql']
+        ]
+        return response.json(), grouped
+
+    def get_option(self, result, data, value):
+        for option in result['searchPanes']['options'][data]:
+            if option['value'] == value:
+                return option
+        self.fail('%s not in the %s pane' % (value, data))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_options(self):
+        result, grouped = self.get('panes')
+        # one query per pane
+        self.assertEquals(len(grouped), 2)
+        years = result['searchPanes']['options']['year']
+        self.assertEquals(
+            [option['value'] for option in years],
+            sorted(set(Album.objects.values_list('year', flat=True)))
+        )
+        self.assertEquals(
+            self.get_option(result, 'year', 1967),
+            {'label': 1967, 'value': 1967, 'total': 3, 'count': 3}
+        )
+        self.assertEquals(
+            self.get_option(result, 'artist_name', 'The Beatles'),
+            {
+                'label': 'The Beatles', 'value': 'The Beatles',
+                'total': 5, 'count': 5
+            }
+        )
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_selection(self):
+        result, grouped = self.get(
+            'panes', '&searchPanes[year][0]=1966&searchPanes[year][1]=1967'
+        )
+        self.assertEquals(len(grouped), 2)
+        self.assertEquals(result['recordsFiltered'], 6)
+        self.assertEquals(result['recordsTotal'], 15)
+        self.assertEquals(self.get_option(result, 'year', 1966)['count'], 3)
+        option = self.get_option(result, 'year', 1965)
+        self.assertEquals((option['total'], option['count']), (2, 0))
+        option = self.get_option(result, 'artist_name', 'The Beatles')
+        self.assertEquals((option['total'], option['count']), (5, 2))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_selection_and_search(self):
+        result, grouped = self.get(
+            'panes', '&searchPanes[artist_name][0]=The Beatles'
+            '&search[value]=road'
+        )
+        self.assertEquals(result['recordsFiltered'], 1)
+        self.assertEquals(result['data'][0]['name'], 'Abbey Road')
+        self.assertEquals(self.get_option(result, 'year', 1969)['count'], 1)
+        self.assertEquals(self.get_option(result, 'year', 1967)['count'], 0)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_invalid_selection(self):
+        result, grouped = self.get('panes', '&searchPanes[year][0]=foo')
+        self.assertEquals(result['recordsFiltered'], 0)
+        self.assertEquals(self.get_option(result, 'year', 1967)['count'], 0)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_multivalued_pane(self):
+        result, grouped = self.get(
+            'genres', '&searchPanes[genres][0]=Pop Rock'
+        )
+        self.assertEquals(len(grouped), 1)
+        self.assertEquals(result['recordsFiltered'], 5)
+        option = self.get_option(result, 'genres', 'Psychedelic Rock')
+        self.assertEquals((option['total'], option['count']), (6, 4))
+        option = self.get_option(result, 'genres', 'Pop Rock')
+        self.assertEquals((option['total'], option['count']), (5, 5))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_other_formats(self):
+        response = self.client.get('/api/panes/?format=json')
+        self.assertNotIn('searchPanes', response.json())
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_cache(self):
+        query = '&searchPanes[year][0]=1966'
+        result, grouped = self.get('cachedpanes', query)
+        self.assertEquals(len(grouped), 2)
+        cached, grouped = self.get('cachedpanes', query)
+        self.assertEquals(len(grouped), 0)
+        self.assertEquals(
+            cached['searchPanes'], result['searchPanes']
+        )
+        # another selection is another entry
+        result, grouped = self.get('cachedpanes', '&searchPanes[year][0]=1967')
+        self.assertEquals(len(grouped), 2)
+        invalidate_model(Album)
+        result, grouped = self.get('cachedpanes', query)
+        self.assertEquals(len(grouped), 2)
+
+
+urlpatterns = [
+    url('^api/panes', TestSearchPanesTestCase.SearchPanesView.as_view()),
+    url('^api/genres', TestSearchPanesTestCase.GenresPaneView.as_view()),
+    url(
+        '^api/cachedpanes', TestSearchPanesTestCase.CachedPanesView.as_view()
+    ),
+]
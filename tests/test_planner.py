@@ -0,0 +1,150 @@
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+
+from django.conf.urls import url
+from django.test.utils import override_settings
+from django.test import TestCase
+
+from rest_framework import serializers
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient, APIRequestFactory
+)
+from rest_framework_datatables.pagination import (
+    DatatablesLimitOffsetPagination
+)
+from rest_framework_datatables.planner import (
+    QueryPlanner, get_serializer_paths, plan_projection, plan_relations
+)
+
+
+class AlbumIdsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Album
+        fields = ('name', 'artist', 'genres')
+
+
+class TestQueryPlannerTestCase(TestCase):
+    class PlannedView(ListAPIView):
+        serializer_class = AlbumSerializer
+        datatables_plan_relations = True
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class PlannedLimitOffsetView(PlannedView):
+        pagination_class = DatatablesLimitOffsetPagination
+
+    class UnplannedView(PlannedView):
+        datatables_plan_relations = False
+
+    class ProjectedView(PlannedView):
+        serializer_class = AlbumIdsSerializer
+        datatables_project_columns = True
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=name&columns[1][data]=artist.name&columns[1][name]=artist.name&columns[1][searchable]=true&columns[2][data]=genres'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, prefix, query):
+        response = self.client.get(
+            prefix + '?format=datatables&draw=1' + self.columns + query
+        )
+        return response.json()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_planned_queries(self):
+        # total count, page with the artist joined and genres prefetch
+        with self.assertNumQueries(3):
+            planned = self.get('/api/planned/', '&length=10')
+        with self.assertNumQueries(3):
+            self.get('/api/plannedlimitoffset/', '&length=10')
+        with self.assertNumQueries(22):
+            unplanned = self.get('/api/unplanned/', '&length=10')
+        self.assertEquals(planned, unplanned)
+
+    def get_view(self, query):
+        view = self.PlannedView()
+        view.request = view.initialize_request(
+            APIRequestFactory().get('/api/planned/?format=datatables' + query)
+        )
+        view.format_kwarg = None
+        return view.request, view
+
+    def plan(self, query):
+        return QueryPlanner().plan(Album.objects.all(), *self.get_view(query))
+
+    def test_unrequested_relations_are_not_loaded(self):
+        queryset = self.plan('&columns[0][data]=name&columns[1][data]=year')
+        self.assertEquals(queryset.query.select_related, False)
+        self.assertEquals(queryset._prefetch_related_lookups, ())
+        queryset = self.plan('&columns[0][data]=name&keep=genres')
+        self.assertEquals(queryset.query.select_related, False)
+        self.assertEquals(queryset._prefetch_related_lookups, ('genres',))
+        queryset = self.plan('&columns[0][data]=artist_name')
+        self.assertEquals(queryset.query.select_related, {'artist': {}})
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_projected_queries(self):
+        with self.assertNumQueries(3) as queries:
+            projected = self.get('/api/projected/', '&length=10')
+        page_sql = queries.captured_queries[1]['sql']
+        self.assertNotIn('"albums_album"."year"', page_sql)
+        self.assertNotIn('"albums_album"."rank"', page_sql)
+        self.assertIn('"albums_album"."artist_id"', page_sql)
+        self.assertEquals(len(projected['data']), 10)
+
+    def test_projection(self):
+        queryset = QueryPlanner(project=True).plan(
+            Album.objects.all(), *self.get_view('&columns[0][data]=name')
+        )
+        self.assertEquals(
+            queryset.query.deferred_loading,
+            (set(['name', 'rank', 'year', 'artist', 'id']), False)
+        )
+
+    def test_plan_projection(self):
+        self.assertEquals(plan_projection(Album, [
+            ('name', True), ('artist__name', True), ('genres', True),
+            ('pk', True),
+        ]), ['artist', 'id', 'name'])
+        self.assertEquals(plan_projection(Album, [
+            ('artist__name', True), ('genres__name', True),
+        ], set(['artist'])), ['artist', 'artist__name'])
+        self.assertIsNone(plan_projection(Album, [('name', True), (None, True)]))
+        self.assertIsNone(plan_projection(Album, [('unknown', True)]))
+
+    def test_serializer_paths(self):
+        paths = set(get_serializer_paths(AlbumSerializer(), set([
+            'name', 'artist', 'artist_name', 'genres'
+        ])))
+        self.assertEquals(paths, set([
+            ('name', True), ('artist', True), ('artist__id', True),
+            ('artist__name', True), ('genres', True),
+        ]))
+        paths = set(get_serializer_paths(AlbumIdsSerializer()))
+        self.assertEquals(paths, set([
+            ('name', True), ('artist', False), ('genres', False),
+        ]))
+
+    def test_plan_relations(self):
+        self.assertEquals(plan_relations(Album, [
+            ('name', True), ('artist__name', False), ('genres', True)
+        ]), (['artist'], ['genres']))
+        self.assertEquals(plan_relations(Album, [
+            ('artist', False), ('genres', False)
+        ]), ([], ['genres']))
+        self.assertEquals(plan_relations(Album, [
+            ('artist__albums__genres__name', False), ('unknown__name', True)
+        ]), (['artist'], ['artist__albums', 'artist__albums__genres']))
+
+
+urlpatterns = [
+    url('^api/planned/', TestQueryPlannerTestCase.PlannedView.as_view()),
+    url('^api/plannedlimitoffset/', TestQueryPlannerTestCase.PlannedLimitOffsetView.as_view()),
+    url('^api/unplanned/', TestQueryPlannerTestCase.UnplannedView.as_view()),
+    url('^api/projected/', TestQueryPlannerTestCase.ProjectedView.as_view()),
+]
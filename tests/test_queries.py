@@ -0,0 +1,84 @@
+from albums.models import Album
+
+from django.conf.urls import url
+from django.test.utils import override_settings
+from django.test import TestCase
+
+from rest_framework import serializers
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient,
+)
+from rest_framework_datatables.pagination import (
+    DatatablesLimitOffsetPagination, DatatablesPageNumberPagination
+)
+
+
+class FlatAlbumSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Album
+        fields = ('rank', 'name', 'year')
+
+
+class TestQueryCountTestCase(TestCase):
+    """
+    A draw must run at most one total count, one filtered count and the
+    page query.
+    """
+    class PageNumberView(ListAPIView):
+        serializer_class = FlatAlbumSerializer
+        pagination_class = DatatablesPageNumberPagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class LimitOffsetView(PageNumberView):
+        pagination_class = DatatablesLimitOffsetPagination
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=name&columns[0][searchable]=true&columns[1][data]=year&columns[1][searchable]=true'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def assertDrawQueries(self, num, query):
+        for prefix in ('/api/pagenumber/', '/api/limitoffset/'):
+            with self.assertNumQueries(num):
+                response = self.client.get(
+                    prefix + '?format=datatables&draw=1' + self.columns + query
+                )
+            self.assertEquals(response.status_code, 200)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_unfiltered(self):
+        # total count and page
+        self.assertDrawQueries(2, '&length=10&start=10')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_global_search(self):
+        # total count, filtered count and page
+        self.assertDrawQueries(3, '&length=10&search[value]=the')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_column_search(self):
+        self.assertDrawQueries(3, '&length=10&columns[1][search][value]=1968')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_no_length(self):
+        with self.assertNumQueries(2):
+            self.client.get('/api/pagenumber/?format=datatables&length=-1' + self.columns)
+        with self.assertNumQueries(2):
+            self.client.get('/api/limitoffset/?format=datatables' + self.columns)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_empty_result(self):
+        # no page query when nothing matches
+        with self.assertNumQueries(2):
+            self.client.get('/api/limitoffset/?format=datatables&length=10&search[value]=nothing' + self.columns)
+
+
+urlpatterns = [
+    url('^api/pagenumber', TestQueryCountTestCase.PageNumberView.as_view()),
+    url('^api/limitoffset', TestQueryCountTestCase.LimitOffsetView.as_view()),
+]
@@ -0,0 +1,68 @@
+from django.http import QueryDict
+from django.test import TestCase
+
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_datatables.query import (
+    DatatablesQuery, get_datatables_query
+)
+
+
+class DatatablesQueryTestCase(TestCase):
+    def test_parse(self):
+        query = DatatablesQuery(QueryDict(
+            'draw=3&start=20&length=10&search[value]=foo&search[regex]=false'
+            '&columns[0][data]=artist.name&columns[0][name]=artist.name, year'
+            '&columns[0][searchable]=true&columns[0][orderable]=true'
+            '&columns[0][search][value]=bar&columns[0][search][regex]=true'
+            '&columns[1][data]=rank&columns[1][name]='
+            '&order[0][column]=1&order[0][dir]=desc&order[1][column]=0'
+            '&keep=id, year&extra_json=get_options&count_only=true'
+            '&searchPanes[artist.name][1]=b&searchPanes[artist.name][0]=a'
+        ))
+        self.assertEquals((query.draw, query.start, query.length), (3, 20, 10))
+        self.assertEquals((query.search_value, query.search_regex), ('foo', False))
+        self.assertEquals(len(query.columns), 2)
+        column = query.columns[0]
+        self.assertEquals(column.data, 'artist.name')
+        self.assertEquals(column.name, ['artist__name', 'year'])
+        self.assertEquals((column.searchable, column.orderable), (True, True))
+        self.assertEquals((column.search_value, column.search_regex), ('bar', True))
+        column = query.columns[1]
+        self.assertEquals(column.name, ['rank'])
+        self.assertEquals((column.searchable, column.orderable), (False, False))
+        self.assertEquals(query.order, [(1, 'desc'), (0, 'asc')])
+        self.assertEquals(query.keep, ('id', 'year'))
+        self.assertEquals(query.extra_json, ('get_options',))
+        self.assertTrue(query.count_only)
+        self.assertEquals(query.search_panes, {'artist.name': ['a', 'b']})
+        self.assertEquals(query.column_keys, set(['artist', 'rank']))
+
+    def test_parse_stops_at_missing_index(self):
+        query = DatatablesQuery(QueryDict(
+            'columns[0][data]=name&columns[2][data]=rank'
+            '&order[1][column]=0&draw=x&start=y'
+        ))
+        self.assertEquals([c.data for c in query.columns], ['name'])
+        self.assertEquals(query.order, [])
+        self.assertEquals((query.draw, query.start, query.length), (1, 0, None))
+
+    def test_empty_parameter_name(self):
+        query = DatatablesQuery(QueryDict('=x&draw=2'))
+        self.assertEquals(query.draw, 2)
+
+    def test_slots(self):
+        query = DatatablesQuery(QueryDict('columns[0][data]=name'))
+        with self.assertRaises(AttributeError):
+            query.foo = 'bar'
+        with self.assertRaises(AttributeError):
+            query.columns[0].foo = 'bar'
+
+    def test_parsed_once_per_request(self):
+        view = APIView()
+        request = view.initialize_request(
+            APIRequestFactory().get('/api/foo/?format=datatables&draw=2')
+        )
+        query = get_datatables_query(request)
+        self.assertEquals(query.draw, 2)
+        self.assertIs(get_datatables_query(request), query)
@@ -1,11 +1,17 @@
+import datetime
+import decimal
 import unittest
 import json
+from collections import OrderedDict
 
 from django.test import TestCase
 
 from rest_framework.test import APIRequestFactory
 from rest_framework.views import APIView
-from rest_framework_datatables.renderers import DatatablesRenderer
+from rest_framework_datatables.context import get_datatables_context
+from rest_framework_datatables.renderers import (
+    DatatablesORJSONRenderer, DatatablesRenderer, orjson
+)
 
 
 class DatatablesRendererTestCase(TestCase):
@@ -69,11 +75,12 @@ class DatatablesRendererTestCase(TestCase):
         obj = {'results': [{'foo': 'bar'}, {'spam': 'eggs'}]}
         renderer = DatatablesRenderer()
         view = APIView()
-        view._datatables_total_count = 4
-        view._datatables_filtered_count = 2
         request = view.initialize_request(
             self.factory.get('/api/foo/?format=datatables&draw=1')
         )
+        context = get_datatables_context(request)
+        context.total_count = 4
+        context.filtered_count = 2
         content = renderer.render(obj, 'application/json', {'request': request, 'view': view})
         expected = {
             'recordsTotal': 4,
@@ -176,3 +183,114 @@ class DatatablesRendererTestCase(TestCase):
             self.assertEqual(True, False, "Value expected; did not occur.")
         except ValueError as e:
             self.assertEqual(e.__str__(), "Duplicate key found: recordsTotal")
+
+    def test_render_stream(self):
+        class TestAPIView(APIView):
+            def test_callback(self):
+                return "key", "value"
+
+            class Meta:
+                datatables_extra_json = ('test_callback', )
+
+        renderer = DatatablesRenderer()
+        view = TestAPIView()
+        request = view.initialize_request(
+            self.factory.get('/api/foo/?format=datatables&draw=3&columns[0][data]=foo')
+        )
+        rows = ({'foo': i, 'spam': 'eggs'} for i in range(5))
+        chunks = list(renderer.render_stream(rows, {'request': request, 'view': view}, chunk_size=2))
+        self.assertEquals(len(chunks), 5)
+        expected = {
+            'draw': 3,
+            'key': 'value',
+            'data': [{'foo': i} for i in range(5)],
+            'recordsFiltered': 5,
+            'recordsTotal': 5,
+        }
+        self.assertEquals(json.loads(b''.join(chunks).decode('utf-8')), expected)
+
+        get_datatables_context(request).total_count = 10
+        get_datatables_context(request).filtered_count = 0
+        content = b''.join(renderer.render_stream(iter([]), {'request': request, 'view': view}))
+        self.assertEquals(json.loads(content.decode('utf-8')), {
+            'draw': 3, 'key': 'value', 'data': [], 'recordsFiltered': 0, 'recordsTotal': 10
+        })
+
+    def test_render_stream_extra_json_clashes(self):
+        class TestAPIView(APIView):
+            def test_callback(self):
+                return "recordsTotal", "this could be bad"
+
+            class Meta:
+                datatables_extra_json = ('test_callback', )
+
+        renderer = DatatablesRenderer()
+        view = TestAPIView()
+        request = view.initialize_request(
+            self.factory.get('/api/foo/?format=datatables&draw=2')
+        )
+        with self.assertRaises(ValueError):
+            renderer.render_stream([], {'request': request, 'view': view})
+
+
+class DatatablesORJSONRendererTestCase(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def render(self, renderer, query):
+        class TestAPIView(APIView):
+            def test_callback(self):
+                return "options", {'count': decimal.Decimal('1.50')}
+
+            class Meta:
+                datatables_extra_json = ('test_callback', )
+
+        view = TestAPIView()
+        request = view.initialize_request(
+            self.factory.get('/api/foo/?format=datatables&draw=2' + query)
+        )
+        data = OrderedDict([
+            ('recordsTotal', 4),
+            ('recordsFiltered', 2),
+            ('data', [
+                OrderedDict([
+                    ('DT_RowId', 'row_%d' % i),
+                    ('name', u'caf\xe9 \u2028 %d' % i),
+                    ('price', decimal.Decimal('9.99')),
+                    ('created', datetime.datetime(2020, 1, 13, 10, 30, 0, 123456)),
+                    ('day', datetime.date(2020, 1, 13)),
+                    ('extra', [1, 2]),
+                ]) for i in range(3)
+            ]),
+        ])
+        return renderer.render(data, 'application/json', {'request': request, 'view': view})
+
+    def test_same_output(self):
+        for query in ('', '&columns[0][data]=name', '&columns[0][data]=name&keep=price'):
+            expected = self.render(DatatablesRenderer(), query)
+            content = self.render(DatatablesORJSONRenderer(), query)
+            self.assertEquals(content, expected)
+        content = json.loads(content.decode('utf-8'))
+        self.assertEquals(set(content['data'][0].keys()), set(['DT_RowId', 'name', 'price']))
+        self.assertEquals(content['options'], {'count': 1.5})
+
+    def test_line_separators(self):
+        content = self.render(DatatablesORJSONRenderer(), '&columns[0][data]=name')
+        self.assertIn(b'\\u2028', content)
+        self.assertNotIn(u'\u2028'.encode('utf-8'), content)
+
+    @unittest.skipIf(orjson is None, 'orjson is not installed')
+    def test_encoded_by_orjson(self):
+        original = orjson.dumps
+        calls = []
+
+        def dumps(*args, **kwargs):
+            calls.append(args)
+            return original(*args, **kwargs)
+
+        orjson.dumps = dumps
+        try:
+            self.render(DatatablesORJSONRenderer(), '')
+        finally:
+            orjson.dumps = original
+        self.assertEquals(len(calls), 1)
@@ -0,0 +1,109 @@
+import unittest
+
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+
+from django.conf.urls import url
+from django.test.utils import override_settings
+from django.test import TestCase
+
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient,
+)
+from rest_framework_datatables.search import (
+    PostgresFullTextSearch, SQLiteFTS5Search
+)
+
+
+try:
+    import django.contrib.postgres.search  # noqa
+    has_postgres_search = True
+except ImportError:
+    has_postgres_search = False
+
+SEARCH_FIELDS = ('name', 'artist__name', 'genres__name')
+
+
+class TestSearchEngineTestCase(TestCase):
+    class TestAPIView(ListAPIView):
+        serializer_class = AlbumSerializer
+        datatables_search_engine = SQLiteFTS5Search()
+        datatables_search_fields = SEARCH_FIELDS
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    fixtures = ['test_data']
+
+    def setUp(self):
+        self.client = APIClient()
+        engine = self.TestAPIView.datatables_search_engine
+        engine.create_table(Album, SEARCH_FIELDS)
+        engine.rebuild(Album.objects.all(), SEARCH_FIELDS)
+
+    def search(self, value, regex='false'):
+        response = self.client.get('/api/ftsalbums/?format=datatables&length=10&columns[0][data]=name&columns[0][searchable]=true&search[regex]=%s&search[value]=%s' % (regex, value))
+        return response.json()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_fts5_search(self):
+        # words may come from different fields of the document
+        result = self.search('hendrix experienced')
+        self.assertEquals((result['recordsFiltered'], result['recordsTotal'], result['data'][0]['name']), (1, 15, 'Are You Experienced'))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_fts5_search_many_to_many(self):
+        result = self.search('beatles psychedelic')
+        self.assertEquals(result['recordsFiltered'], 4)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_fts5_search_prefix(self):
+        result = self.search('revis')
+        self.assertEquals((result['recordsFiltered'], result['data'][0]['name']), (1, 'Highway 61 Revisited'))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_fts5_search_syntax_is_escaped(self):
+        result = self.search('"abbey" (road')
+        self.assertEquals((result['recordsFiltered'], result['data'][0]['name']), (1, 'Abbey Road'))
+        result = self.search('"*')
+        self.assertEquals(result['recordsFiltered'], 15)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_regex_search_does_not_use_engine(self):
+        result = self.search('^Highway [0-9]{2} Revisited$', regex='true')
+        self.assertEquals((result['recordsFiltered'], result['data'][0]['name']), (1, 'Highway 61 Revisited'))
+
+    @unittest.skipUnless(has_postgres_search, 'psycopg2 is not installed')
+    def test_postgres_search_vector(self):
+        engine = PostgresFullTextSearch(config='english')
+        queryset = engine.filter_queryset(
+            Album.objects.all(), 'pink floyd', ['name', 'artist__name']
+        )
+        sql = str(queryset.query)
+        self.assertIn('to_tsvector', sql)
+        self.assertIn('plainto_tsquery', sql)
+
+    @unittest.skipUnless(has_postgres_search, 'psycopg2 is not installed')
+    def test_postgres_search_vector_many_to_many(self):
+        engine = PostgresFullTextSearch(config='english')
+        queryset = engine.filter_queryset(
+            Album.objects.all(), 'beatles psychedelic', list(SEARCH_FIELDS)
+        )
+        # the document of each joined genre is not selected, the rows are
+        # not duplicated by the genres
+        self.assertNotIn('_datatables_document', queryset.query.annotations)
+        self.assertEquals(list(queryset.query.alias_map), ['albums_album'])
+
+    @unittest.skipUnless(has_postgres_search, 'psycopg2 is not installed')
+    def test_postgres_stored_vector(self):
+        engine = PostgresFullTextSearch(vector_field='name')
+        queryset = engine.filter_queryset(
+            Album.objects.all(), 'pink floyd', ['name']
+        )
+        self.assertNotIn('to_tsvector', str(queryset.query))
+
+
+urlpatterns = [
+    url('^api/ftsalbums', TestSearchEngineTestCase.TestAPIView.as_view()),
+]
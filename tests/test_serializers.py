@@ -0,0 +1,91 @@
+from albums.models import Album
+from albums.serializers import AlbumSerializer, ArtistSerializer
+
+from django.conf.urls import url
+from django.test.utils import override_settings
+from django.test import TestCase
+
+from rest_framework import serializers
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient,
+)
+from rest_framework_datatables.pagination import (
+    DatatablesPageNumberPagination
+)
+from rest_framework_datatables.serializers import DatatablesFieldsMixin
+
+
+class UnprunedAlbumSerializer(serializers.ModelSerializer):
+    artist = ArtistSerializer()
+    genres = serializers.SerializerMethodField()
+
+    def get_genres(self, album):
+        return ', '.join([str(genre) for genre in album.genres.all()])
+
+    class Meta:
+        model = Album
+        fields = ('rank', 'name', 'year', 'genres', 'artist')
+
+
+class PrunedAlbumSerializer(DatatablesFieldsMixin, UnprunedAlbumSerializer):
+    class Meta(UnprunedAlbumSerializer.Meta):
+        datatables_always_serialize = ('rank',)
+
+
+class TestDatatablesFieldsMixinTestCase(TestCase):
+    class PrunedView(ListAPIView):
+        serializer_class = PrunedAlbumSerializer
+        pagination_class = DatatablesPageNumberPagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class UnprunedView(PrunedView):
+        serializer_class = UnprunedAlbumSerializer
+
+    fixtures = ['test_data']
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, prefix, query):
+        response = self.client.get(prefix + '?format=datatables&draw=1&length=10' + query)
+        return response.json()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_unrequested_fields_are_not_evaluated(self):
+        # total count and page, genres and artist are never read
+        with self.assertNumQueries(2):
+            pruned = self.get('/api/pruned/', '&columns[0][data]=name&columns[1][data]=year')
+        with self.assertNumQueries(22):
+            unpruned = self.get('/api/unpruned/', '&columns[0][data]=name&columns[1][data]=year')
+        self.assertEquals(set(pruned['data'][0].keys()), set(['rank', 'name', 'year']))
+        for row in pruned['data']:
+            del row['rank']
+        self.assertEquals(pruned, unpruned)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_keep_and_nested_fields(self):
+        result = self.get('/api/pruned/', '&columns[0][data]=artist.name&keep=genres')
+        self.assertEquals(set(result['data'][0].keys()), set(['rank', 'artist', 'genres']))
+        self.assertEquals(set(result['data'][0]['artist'].keys()), set(['id', 'name']))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_other_formats_are_not_pruned(self):
+        response = self.client.get('/api/pruned/?format=json&columns[0][data]=name')
+        self.assertEquals(
+            set(response.json()['results'][0].keys()),
+            set(['rank', 'name', 'year', 'genres', 'artist'])
+        )
+
+    def test_without_request(self):
+        album = Album.objects.get(name='Revolver')
+        self.assertIn('genres', PrunedAlbumSerializer(album).data)
+        self.assertIn('DT_RowId', AlbumSerializer(album).data)
+
+
+urlpatterns = [
+    url('^api/pruned', TestDatatablesFieldsMixinTestCase.PrunedView.as_view()),
+    url('^api/unpruned', TestDatatablesFieldsMixinTestCase.UnprunedView.as_view()),
+]
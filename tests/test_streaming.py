@@ -0,0 +1,92 @@
+import json
+
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+
+from django.conf.urls import url
+from django.test.utils import override_settings
+from django.test import TestCase
+
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient,
+)
+from rest_framework_datatables.pagination import (
+    DatatablesPageNumberPagination
+)
+from rest_framework_datatables.streaming import DatatablesStreamingMixin
+
+
+class TestStreamingTestCase(TestCase):
+    class StreamingView(DatatablesStreamingMixin, ListAPIView):
+        serializer_class = AlbumSerializer
+        pagination_class = DatatablesPageNumberPagination
+        datatables_plan_relations = True
+        datatables_stream_chunk_size = 4
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class ClashingView(StreamingView):
+        def get_extra_json(self):
+            return 'recordsTotal', 0
+
+        class Meta:
+            datatables_extra_json = ('get_extra_json', )
+
+    class BufferedView(ListAPIView):
+        serializer_class = AlbumSerializer
+        pagination_class = DatatablesPageNumberPagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    fixtures = ['test_data']
+
+    query = '?format=datatables&draw=2&columns[0][data]=name&columns[0][searchable]=true&columns[0][orderable]=true&columns[1][data]=genres&columns[2][data]=artist_name&columns[2][name]=artist.name&columns[3][data]=artist&order[0][column]=0&order[0][dir]=desc'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get_streamed(self, query):
+        response = self.client.get('/api/streaming/' + self.query + query)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content).decode('utf-8'))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_streamed_response(self):
+        # total count, rows and one genres prefetch per chunk of 4 rows
+        with self.assertNumQueries(6):
+            streamed = self.get_streamed('&length=-1')
+        buffered = self.client.get('/api/buffered/' + self.query + '&length=-1').json()
+        self.assertEquals(streamed, buffered)
+        self.assertEquals(len(streamed['data']), 15)
+        self.assertEquals(streamed['recordsTotal'], 15)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_streamed_search(self):
+        streamed = self.get_streamed('&length=-1&search[value]=the')
+        buffered = self.client.get('/api/buffered/' + self.query + '&length=-1&search[value]=the').json()
+        self.assertEquals(streamed, buffered)
+        self.assertEquals(streamed['recordsTotal'], 15)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_extra_json_clashes(self):
+        # the error is raised before the response starts
+        with self.assertRaises(ValueError):
+            self.client.get('/api/clashing/' + self.query + '&length=-1')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_paginated_response(self):
+        response = self.client.get('/api/streaming/' + self.query + '&length=5')
+        self.assertFalse(response.streaming)
+        self.assertEquals(len(response.json()['data']), 5)
+        response = self.client.get('/api/streaming/?format=json')
+        self.assertFalse(response.streaming)
+
+
+urlpatterns = [
+    url('^api/streaming', TestStreamingTestCase.StreamingView.as_view()),
+    url('^api/clashing', TestStreamingTestCase.ClashingView.as_view()),
+    url('^api/buffered', TestStreamingTestCase.BufferedView.as_view()),
+]
@@ -0,0 +1,138 @@
+from albums.models import Album
+from albums.serializers import AlbumSerializer
+
+from django.conf.urls import url
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient,
+)
+from rest_framework_datatables.budget import QueryBudget
+from rest_framework_datatables.pagination import (
+    DatatablesPageNumberPagination
+)
+from rest_framework_datatables.streaming import DatatablesStreamingMixin
+from rest_framework_datatables.timing import _QueryCounter, draw_timed
+
+
+class TestTimingTestCase(TestCase):
+    class AlbumView(ListAPIView):
+        serializer_class = AlbumSerializer
+        pagination_class = DatatablesPageNumberPagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+        def get_options(self):
+            return 'options', list(Album.objects.values_list('year', flat=True))
+
+        class Meta:
+            datatables_extra_json = ('get_options', )
+
+    class TimedView(AlbumView):
+        datatables_timing = True
+        datatables_server_timing = True
+
+    class StreamingView(DatatablesStreamingMixin, TimedView):
+        pass
+
+    class FailingView(AlbumView):
+        datatables_query_budget = QueryBudget(max_queries=10)
+
+        def get_options(self):
+            raise RuntimeError('failed draw')
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=rank&columns[0][orderable]=true&columns[1][data]=artist_name&columns[1][name]=artist.name&columns[1][searchable]=true'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.signals = []
+        draw_timed.connect(self.receiver)
+
+    def tearDown(self):
+        draw_timed.disconnect(self.receiver)
+
+    def receiver(self, sender, request, view, timings, **kwargs):
+        self.signals.append((sender, timings))
+
+    def get(self, prefix, query):
+        return self.client.get(
+            prefix + '?format=datatables&draw=1' + self.columns + query
+        )
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_phases(self):
+        response = self.get('/api/timed/', '&length=5&search[value]=the')
+        self.assertEquals(len(self.signals), 1)
+        sender, timings = self.signals[0]
+        self.assertEquals(sender, self.TimedView)
+        self.assertEquals(list(timings.phases), [
+            'parse', 'total_count', 'filter', 'filtered_count', 'order',
+            'page', 'serialize', 'prune', 'extra_json', 'encode',
+        ])
+        queries = dict(
+            (name, count) for name, (ms, count) in timings.phases.items()
+        )
+        self.assertEquals(queries['total_count'], 1)
+        self.assertEquals(queries['filtered_count'], 1)
+        self.assertEquals(queries['page'], 1)
+        # the artist of each row, the genres are not requested
+        self.assertEquals(queries['serialize'], 5)
+        self.assertEquals(queries['extra_json'], 1)
+        self.assertEquals(sum(queries.values()), timings.queries)
+        self.assertTrue(all(ms >= 0 for ms, count in timings.phases.values()))
+        self.assertGreaterEqual(
+            timings.total, sum(ms for ms, count in timings.phases.values())
+        )
+        header = response['Server-Timing']
+        self.assertTrue(header.startswith('parse;dur='))
+        self.assertIn('total_count;dur=', header)
+        self.assertIn(';desc="5 queries"', header)
+        self.assertIn(';desc="1 query"', header)
+        self.assertIn('total;dur=', header)
+        self.assertEquals(connection.execute_wrappers, [])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_disabled(self):
+        response = self.get('/api/untimed/', '&length=5')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEquals(self.signals, [])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_other_formats(self):
+        response = self.client.get('/api/timed/?format=json')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEquals(self.signals, [])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_streaming(self):
+        response = self.get('/api/streaming/', '&length=-1')
+        b''.join(response.streaming_content)
+        self.assertNotIn('Server-Timing', response)
+        timings = self.signals[0][1]
+        self.assertIn('stream', timings.phases)
+        self.assertEquals(connection.execute_wrappers, [])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_failed_draw(self):
+        # the counters of a draw raising an exception are removed at the
+        # end of the request
+        with self.assertRaises(RuntimeError):
+            self.get('/api/failing/', '&length=5')
+        self.assertFalse([
+            w for w in connection.execute_wrappers
+            if isinstance(w, _QueryCounter)
+        ])
+
+
+urlpatterns = [
+    url('^api/failing', TestTimingTestCase.FailingView.as_view()),
+    url('^api/timed', TestTimingTestCase.TimedView.as_view()),
+    url('^api/untimed', TestTimingTestCase.AlbumView.as_view()),
+    url('^api/streaming', TestTimingTestCase.StreamingView.as_view()),
+]
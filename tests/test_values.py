@@ -0,0 +1,161 @@
+from albums.models import Album
+from albums.serializers import AlbumSerializer, ArtistSerializer
+
+from django.conf.urls import url
+from django.core.cache import cache
+from django.test.utils import override_settings
+from django.test import TestCase
+
+from rest_framework import serializers
+from rest_framework.generics import ListAPIView
+from rest_framework.test import (
+    APIClient,
+)
+from rest_framework_datatables.pagination import (
+    DatatablesKeysetPagination, DatatablesPageNumberPagination
+)
+from rest_framework_datatables.values import (
+    DatatablesValuesMixin, get_values_fields
+)
+
+
+class ValuesAlbumSerializer(serializers.ModelSerializer):
+    artist_name = serializers.ReadOnlyField(source='artist.name')
+    artist = ArtistSerializer()
+    artist_id = serializers.PrimaryKeyRelatedField(source='artist', read_only=True)
+    genres = serializers.SerializerMethodField()
+
+    def get_genres(self, album):
+        return ', '.join([str(genre) for genre in album.genres.all()])
+
+    class Meta:
+        model = Album
+        fields = (
+            'id', 'rank', 'name', 'year', 'artist_name', 'artist', 'artist_id',
+            'genres',
+        )
+
+
+class UpperArtistSerializer(ArtistSerializer):
+    def to_representation(self, instance):
+        data = super(UpperArtistSerializer, self).to_representation(instance)
+        data['name'] = data['name'].upper()
+        return data
+
+
+class UpperAlbumSerializer(ValuesAlbumSerializer):
+    def to_representation(self, instance):
+        data = super(UpperAlbumSerializer, self).to_representation(instance)
+        data['name'] = data['name'].upper()
+        return data
+
+
+class NestedUpperAlbumSerializer(ValuesAlbumSerializer):
+    artist = UpperArtistSerializer()
+
+
+class TestValuesTestCase(TestCase):
+    class ValuesView(DatatablesValuesMixin, ListAPIView):
+        serializer_class = ValuesAlbumSerializer
+        pagination_class = DatatablesPageNumberPagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class SerializerView(ListAPIView):
+        serializer_class = ValuesAlbumSerializer
+        pagination_class = DatatablesPageNumberPagination
+
+        def get_queryset(self):
+            return Album.objects.all()
+
+    class UpperValuesView(ValuesView):
+        serializer_class = UpperAlbumSerializer
+
+    class KeysetValuesView(ValuesView):
+        pagination_class = DatatablesKeysetPagination
+
+    fixtures = ['test_data']
+
+    columns = '&columns[0][data]=rank&columns[0][orderable]=true&columns[1][data]=name&columns[1][searchable]=true&columns[2][data]=artist_name&columns[2][name]=artist.name&columns[2][searchable]=true&columns[3][data]=artist.name&columns[4][data]=artist_id'
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def get(self, prefix, query):
+        return self.client.get(prefix + '?format=datatables&draw=1' + self.columns + query).json()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_same_response(self):
+        # the counts and the page, without any query per row
+        for query, num in (
+                ('&length=5&start=5&order[0][column]=0', 2),
+                ('&length=10&search[value]=the', 3),
+                ('&length=-1', 2),
+        ):
+            with self.assertNumQueries(num):
+                values = self.get('/api/values/', query)
+            self.assertEquals(values, self.get('/api/serializer/', query))
+        self.assertEquals(values['data'][0], {
+            'rank': 14,
+            'name': 'Abbey Road',
+            'artist_name': 'The Beatles',
+            'artist': {'id': 2, 'name': 'The Beatles'},
+            'artist_id': 2,
+        })
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_distinct_rows(self):
+        # a search makes the queryset distinct, the albums of the same
+        # artist must not be merged
+        query = '&columns[0][data]=artist_name&columns[0][name]=artist.name&columns[0][searchable]=true&columns[0][orderable]=true&order[0][column]=0&search[value]=e&length=-1'
+        values = self.client.get('/api/values/?format=datatables&draw=1' + query).json()
+        serializer = self.client.get('/api/serializer/?format=datatables&draw=1' + query).json()
+        self.assertEquals(values['recordsFiltered'], serializer['recordsFiltered'])
+        self.assertEquals(len(values['data']), values['recordsFiltered'])
+        self.assertEquals(
+            [row['artist_name'] for row in values['data']],
+            [row['artist_name'] for row in serializer['data']]
+        )
+        self.assertEquals(list(values['data'][0].keys()), ['artist_name'])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_fallback(self):
+        query = '&length=5&columns[5][data]=genres'
+        values = self.get('/api/values/', query)
+        self.assertEquals(values, self.get('/api/serializer/', query))
+        self.assertIn('genres', values['data'][0])
+        response = self.client.get('/api/values/?format=json')
+        self.assertEquals(len(response.json()['results']), 10)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_representation_override(self):
+        result = self.get('/api/uppervalues/', '&length=5&order[0][column]=1')
+        self.assertEquals(result['data'][0]['name'], 'ABBEY ROAD')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_keyset_pagination(self):
+        names = []
+        for start in (0, 5, 10):
+            result = self.get('/api/keysetvalues/', '&length=5&order[0][column]=1&start=%d' % start)
+            names.extend(row['name'] for row in result['data'])
+        self.assertEquals(names, list(Album.objects.order_by('name').values_list('name', flat=True)))
+
+    def test_values_fields(self):
+        fields = get_values_fields(ValuesAlbumSerializer(), Album, ['rank', 'artist'])
+        self.assertEquals(list(fields.keys()), ['rank', 'artist'])
+        self.assertEquals(fields['rank'][1], 'rank')
+        self.assertEquals([f[1] for f in fields['artist'].values()], ['artist__id', 'artist__name'])
+        self.assertIsNone(get_values_fields(ValuesAlbumSerializer(), Album, ['genres']))
+        self.assertIsNone(get_values_fields(AlbumSerializer(), Album))
+        self.assertIsNone(get_values_fields(UpperAlbumSerializer(), Album, ['rank']))
+        self.assertIsNone(get_values_fields(NestedUpperAlbumSerializer(), Album, ['artist']))
+
+
+urlpatterns = [
+    url('^api/values', TestValuesTestCase.ValuesView.as_view()),
+    url('^api/serializer', TestValuesTestCase.SerializerView.as_view()),
+    url('^api/uppervalues', TestValuesTestCase.UpperValuesView.as_view()),
+    url('^api/keysetvalues', TestValuesTestCase.KeysetValuesView.as_view()),
+]